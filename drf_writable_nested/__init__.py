@@ -9,4 +9,5 @@ VERSION = __version__
 
 
 from .mixins import NestedUpdateMixin, NestedCreateMixin, UniqueFieldsMixin
+from .mixins import RetryPolicy  # noqa: E402,F401
 from .serializers import WritableNestedModelSerializer
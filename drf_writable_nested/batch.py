@@ -0,0 +1,737 @@
+# -*- coding: utf-8 -*-
+import bisect
+from collections import OrderedDict, defaultdict
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connections, router
+from django.db.models import Model, ProtectedError
+from django.db.models import signals
+from django.db.models.fields.related import ForeignObjectRel
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.relations import ManyRelatedField
+
+from .signals import _get_signal_log, _record_deleted, _record_saved
+from .utils import (
+    _get_content_hash, _get_content_hash_field_name, _get_content_type,
+    _get_method_owner, _is_generic_relation)
+
+
+class BatchValidationError(ValidationError):
+    """Errors of nested serializers saved together, one item per serializer"""
+
+
+def _get_minimal_positions(positions, lower_bound=None):
+    """
+    Returns new positions for items in the given order, `positions` are
+    their current positions (`None` for new items). The most items keep
+    their positions: items `i < j` can both keep them if there is room for
+    the items between them, i.e. `p[i] - i <= p[j] - j`, so the kept items
+    are the longest non-decreasing subsequence of `p[i] - i`.
+    """
+    tails = []
+    tail_indexes = []
+    previous = {}
+    for index, position in enumerate(positions):
+        if position is None:
+            continue
+        key = position - index
+        if lower_bound is not None and key < lower_bound:
+            # No room for the items before it
+            continue
+        length = bisect.bisect_right(tails, key)
+        if length == len(tails):
+            tails.append(key)
+            tail_indexes.append(index)
+        else:
+            tails[length] = key
+            tail_indexes[length] = index
+        previous[index] = tail_indexes[length - 1] if length else None
+
+    kept = []
+    index = tail_indexes[-1] if tail_indexes else None
+    while index is not None:
+        kept.append(index)
+        index = previous[index]
+    kept.reverse()
+
+    new_positions = list(positions)
+    if not kept:
+        start = lower_bound or 0
+        return [start + index for index in range(len(positions))]
+    first = kept[0]
+    for index in range(first):
+        new_positions[index] = positions[first] - (first - index)
+    for anchor, next_anchor in zip(kept, kept[1:] + [len(positions)]):
+        for index in range(anchor + 1, next_anchor):
+            new_positions[index] = positions[anchor] + (index - anchor)
+    return new_positions
+
+
+class WriteStrategy(object):
+    """
+    How children of a nested field are written: `bulk` (bulk queries),
+    `batch` (nested serializers saved together level by level) or
+    `per_row` (every child saved by its serializer). `reason` explains why
+    bulk queries aren't used.
+    """
+    def __init__(self, name, reason=None):
+        self.name = name
+        self.reason = reason
+
+    def __eq__(self, other):
+        return isinstance(other, WriteStrategy) and \
+            (self.name, self.reason) == (other.name, other.reason)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        if self.reason is None:
+            return '<WriteStrategy {0}>'.format(self.name)
+        return '<WriteStrategy {0}: {1}>'.format(self.name, self.reason)
+
+
+_bulk_save_blockers = {}
+
+
+def _get_receivers_key():
+    # Receivers can be connected at any time, so they are a part of the
+    # cache key
+    return tuple(
+        key for signal in (signals.pre_save, signals.post_save)
+        for key, receiver in signal.receivers
+    )
+
+
+def _get_bulk_save_blocker(serializer):
+    """
+    Returns why children of `serializer` can't be saved with bulk queries
+    or `None`. Plain model serializers of models without custom `save()`,
+    save signal receivers, `auto_now` fields and multi-table inheritance can
+    be. The result is cached per serializer class, model and receivers.
+    """
+    model_class = serializer.Meta.model
+    key = (type(serializer), model_class, _get_receivers_key(),
+           _get_signal_log() is not None)
+    if key not in _bulk_save_blockers:
+        _bulk_save_blockers[key] = _find_serializer_bulk_save_blocker(
+            serializer) or _get_model_bulk_save_blocker(model_class)
+    return _bulk_save_blockers[key]
+
+
+def _find_serializer_bulk_save_blocker(serializer):
+    # mixins.py builds its serializers on this module
+    from .mixins import RelatedSaveMixin
+    if isinstance(serializer, (BatchSaveMixin, RelatedSaveMixin)):
+        return 'nested serializer'
+    for name in ('save', 'create', 'update'):
+        if _get_method_owner(type(serializer), name) not in (
+                serializers.BaseSerializer, serializers.Serializer,
+                serializers.ModelSerializer):
+            return 'custom {0}() of the serializer'.format(name)
+    for field in serializer.fields.values():
+        if not field.read_only and isinstance(
+                field, (serializers.BaseSerializer, ManyRelatedField)):
+            return 'writable nested fields'
+    return None
+
+
+def _get_model_bulk_save_blocker(model_class):
+    if model_class._meta.parents:
+        return 'multi-table inheritance'
+    if model_class.save is not Model.save:
+        return 'custom save() of the model'
+    # Bulk writes are reported by `nested_bulk_saved` instead
+    if _get_signal_log() is None and (
+            signals.pre_save.has_listeners(model_class) or
+            signals.post_save.has_listeners(model_class)):
+        return 'save signal receivers'
+    if any(getattr(model_field, 'auto_now', False)
+           for model_field in model_class._meta.concrete_fields):
+        return 'auto_now fields'
+    return None
+
+
+def _can_bulk_write(model_class, instance, attrs):
+    # Bulk inserts are possible only if pks are known after them
+    pk_field = model_class._meta.pk
+    if instance is not None or pk_field.has_default() or \
+            attrs.get(pk_field.name) is not None:
+        return True
+    features = connections[router.db_for_write(model_class)].features
+    return getattr(features, 'can_return_rows_from_bulk_insert', False) or \
+        getattr(features, 'can_return_ids_from_bulk_insert', False)
+
+
+def _bulk_save(model_class, new_instances, updated_instances, update_fields):
+    manager = model_class._default_manager
+    log = _get_signal_log()
+    if new_instances:
+        manager.bulk_create(new_instances)
+        if log is not None:
+            log.add_saved(model_class, new_instances, True)
+
+    update_fields = [
+        name for name in update_fields if name != model_class._meta.pk.name]
+    if updated_instances and update_fields:
+        if hasattr(manager, 'bulk_update'):
+            manager.bulk_update(updated_instances, update_fields)
+        else:
+            for instance in updated_instances:
+                instance.save(update_fields=update_fields)
+        if log is not None:
+            log.add_saved(model_class, updated_instances, False)
+
+
+class BatchSaveMixin(serializers.ModelSerializer):
+    """
+    Saves nested data of many parents together: every nested level is
+    validated and written for all parents at once, with bulk queries for
+    plain child serializers (see `WriteStrategy`).
+    """
+    def _update_or_create_reverse_relations_in_batch(self, parents):
+        """
+        Saves reverse relations of many parents field by field. `parents` is
+        a list of `(serializer, instance, reverse_relations)`. Returns the
+        errors of every parent.
+        """
+        errors = [{} for _ in parents]
+        field_names = OrderedDict()
+        for parent, instance, reverse_relations in parents:
+            parent._saved_reverse_relations = OrderedDict()
+            field_names.update((name, None) for name in reverse_relations)
+
+        for field_name in field_names:
+            items = []
+            owners = []
+            for index, (parent, instance, reverse_relations) in \
+                    enumerate(parents):
+                if field_name not in reverse_relations or errors[index]:
+                    continue
+                related_field, field, field_source = \
+                    reverse_relations[field_name]
+
+                # Skip processing for empty data or not-specified field.
+                # The field can be defined in validated_data but isn't
+                # defined in initial_data (for example, if multipart form
+                # data used)
+                related_data = parent.get_initial().get(field_name, None)
+                if related_data is None:
+                    continue
+
+                if related_field.one_to_one:
+                    # If an object already exists, fill in the pk so
+                    # we don't try to duplicate it
+                    pk_name = field.Meta.model._meta.pk.attname
+                    if pk_name not in related_data and 'pk' in related_data:
+                        pk_name = 'pk'
+                    if pk_name not in related_data:
+                        related_instance = getattr(
+                            instance, field_source, None)
+                        if related_instance:
+                            related_data[pk_name] = related_instance.pk
+
+                    # Expand to array of one item for one-to-one for
+                    # uniformity
+                    related_data = [related_data]
+
+                save_kwargs = dict(parent._get_save_kwargs(field_name))
+                if _is_generic_relation(related_field):
+                    save_kwargs.update(
+                        parent._get_generic_lookup(instance, related_field),
+                    )
+                elif not related_field.many_to_many:
+                    save_kwargs[related_field.name] = instance
+
+                items.append((parent, related_data, save_kwargs))
+                owners.append(index)
+
+            if not items:
+                continue
+
+            saved, write_results, item_errors = self._save_related_in_batch(
+                field_name, field, items)
+
+            ordered = []
+            for index, related_instances, results, detail in zip(
+                    owners, saved, write_results, item_errors):
+                parent, instance, reverse_relations = parents[index]
+                related_field, field, field_source = \
+                    reverse_relations[field_name]
+                if any(detail):
+                    if related_field.one_to_one:
+                        errors[index] = {field_name: detail[0]}
+                    elif parent._get_error_budget(field_name):
+                        errors[index] = {
+                            field_name: parent._truncate_item_errors(
+                                field_name, detail,
+                                truncated=None in detail)}
+                    else:
+                        errors[index] = {field_name: detail}
+                    continue
+
+                if related_field.one_to_one:
+                    parent._write_results[field_name] = results[0]
+                else:
+                    parent._write_results[field_name] = results
+
+                if related_field.many_to_many:
+                    # Add m2m instances to through model via add
+                    m2m_manager = getattr(instance, field_source)
+                    m2m_manager.add(*related_instances)
+
+                parent._saved_reverse_relations[field_name] = (
+                    related_field, field_source, related_instances)
+                if parent._get_position_field_name(field_name):
+                    ordered.append((parent, related_instances, results))
+
+            self._save_positions(field_name, field, ordered)
+
+        return errors
+
+    def _save_positions(self, field_name, field, ordered):
+        """
+        Saves positions of reverse related instances from the payload order
+        for many parents with one bulk update. Only instances which can't
+        keep their positions are written.
+        """
+        if not ordered:
+            return
+
+        model_class = field.Meta.model
+        position_field = model_class._meta.get_field(
+            ordered[0][0]._get_position_field_name(field_name))
+        lower_bound = self._get_position_lower_bound(position_field)
+
+        updated_instances = []
+        for parent, related_instances, results in ordered:
+            # New instances don't have a position yet
+            current_positions = [
+                None if result['status'] == 'created'
+                else getattr(instance, position_field.attname)
+                for instance, result in zip(related_instances, results)
+            ]
+            positions = _get_minimal_positions(current_positions, lower_bound)
+            for instance, result, position in zip(
+                    related_instances, results, positions):
+                if getattr(instance, position_field.attname) == position:
+                    continue
+                setattr(instance, position_field.attname, position)
+                updated_instances.append(instance)
+                if result['status'] == 'unchanged':
+                    result['status'] = 'updated'
+
+        _bulk_save(model_class, [], updated_instances, [position_field.name])
+
+    def _save_related_in_batch(self, field_name, field, items,
+                               instances=None, partial=None):
+        """
+        Validates and saves nested data of one field for many parents.
+        `items` is a list of `(parent_serializer, related_data, save_kwargs)`.
+        Returns saved instances, write results and errors for every item.
+
+        Existing instances are fetched with one query unless `instances`
+        are given. Plain child serializers are written with bulk queries and
+        nested child serializers are saved together level by level.
+        """
+        model_class = field.Meta.model
+        if instances is None:
+            instances = self._prefetch_related_instances(field, [
+                data for _, related_data, _ in items for data in related_data
+            ])
+
+        saved = [[None] * len(related_data) for _, related_data, _ in items]
+        write_results = [
+            [None] * len(related_data) for _, related_data, _ in items]
+        errors = [
+            [{} for _ in related_data] for _, related_data, _ in items]
+
+        children = self._validate_related_in_batch(
+            field_name, field, items, instances, partial, saved,
+            write_results, errors)
+        if any(any(item_errors) for item_errors in errors):
+            return saved, write_results, errors
+
+        strategy = self._get_write_strategy(field, len(children))
+        self._write_strategies['{0}.{1}'.format(
+            type(items[0][0]).__name__, field_name)] = strategy
+        can_bulk_save = strategy.name == 'bulk'
+        can_save_in_batch = strategy.name == 'batch'
+        new_instances = []
+        updated_instances = []
+        update_fields = set()
+        bulk_saved = []
+        nodes = []
+        for index, position, serializer, pk, save_kwargs in children:
+            identity_data = dict(serializer.validated_data, **save_kwargs)
+            try:
+                instance = None
+                if pk:
+                    instance = self._identity_map.get(
+                        model_class, pk, identity_data)
+                if instance is not None:
+                    saved[index][position] = instance
+                    write_results[index][position] = OrderedDict([
+                        ('pk', instance.pk), ('status', 'unchanged')])
+                    continue
+
+                if can_bulk_save and _can_bulk_write(
+                        model_class, serializer.instance, identity_data):
+                    status = self._get_write_status(
+                        serializer.instance, identity_data)
+                    instance = serializer.instance
+                    if instance is None:
+                        instance = model_class(**identity_data)
+                        new_instances.append(instance)
+                    elif status == 'updated':
+                        # Only changed columns are written, e.g. generic
+                        # relation columns are kept unless a child moves
+                        changed_fields = self._get_changed_fields(
+                            instance, identity_data)
+                        for attr in changed_fields:
+                            setattr(instance, attr, identity_data[attr])
+                        updated_instances.append(instance)
+                        update_fields.update(changed_fields)
+                    if instance.pk is not None:
+                        self._identity_map.add(
+                            model_class, instance.pk, instance, identity_data)
+                    bulk_saved.append(
+                        (index, position, instance, status, identity_data))
+                elif can_save_in_batch:
+                    serializer._prepare_save(save_kwargs)
+                    nodes.append((index, position, serializer, identity_data))
+                else:
+                    instance, write_result = self._save_serializer_once(
+                        serializer, pk, save_kwargs)
+                    saved[index][position] = instance
+                    write_results[index][position] = write_result
+            except ValidationError as exc:
+                errors[index][position] = exc.detail
+
+        _bulk_save(model_class, new_instances, updated_instances,
+                   update_fields)
+        for index, position, instance, status, identity_data in bulk_saved:
+            self._identity_map.add(
+                model_class, instance.pk, instance, identity_data)
+            saved[index][position] = instance
+            write_results[index][position] = OrderedDict([
+                ('pk', instance.pk), ('status', status)])
+
+        if nodes:
+            try:
+                self._save_nodes_in_batch(
+                    [serializer for _, _, serializer, _ in nodes])
+            except BatchValidationError as exc:
+                for node, detail in zip(nodes, exc.detail):
+                    errors[node[0]][node[1]] = detail
+            else:
+                for index, position, serializer, identity_data in nodes:
+                    self._identity_map.add(
+                        model_class, serializer.instance.pk,
+                        serializer.instance, identity_data)
+                    saved[index][position] = serializer.instance
+                    write_results[index][position] = serializer.write_result
+
+        for index, (parent, related_data, save_kwargs) in enumerate(items):
+            for position, data in enumerate(related_data):
+                if saved[index][position] is not None:
+                    data['pk'] = saved[index][position].pk
+                    write_results[index][position]['pk'] = data['pk']
+
+        if _get_content_hash_field_name(field) is not None:
+            self._save_content_hashes(field, [
+                (saved[index][position], serializer.initial_data,
+                 serializer.partial)
+                for index, position, serializer, _, _ in children
+                if saved[index][position] is not None
+            ])
+
+        return saved, write_results, errors
+
+    def _save_content_hashes(self, field, items):
+        """
+        Stores content hashes of saved nodes of `field` with one bulk
+        update. `items` is a list of `(instance, data, partial)`, hashes of
+        partial updates are cleared.
+        """
+        hash_field_name = _get_content_hash_field_name(field)
+        changed = []
+        for instance, data, partial in items:
+            content_hash = None if partial else _get_content_hash(field, data)
+            if getattr(instance, hash_field_name) != content_hash:
+                setattr(instance, hash_field_name, content_hash)
+                changed.append(instance)
+        _bulk_save(field.Meta.model, [], changed, [hash_field_name])
+
+    def _clear_parent_content_hashes(self, instances):
+        """
+        Clears stored content hashes of the rows which `instances` belong to
+        through foreign keys, with one query per model. Their hashes cover
+        the data of `instances`, which is saved apart from them. Models are
+        followed up while they have a field named as `content_hash_field`.
+        """
+        hash_field_name = _get_content_hash_field_name(self)
+        pk_list = [instance.pk for instance in instances]
+        if not pk_list:
+            return
+        visited = {self.Meta.model}
+        level = [(self.Meta.model, 'pk__in')]
+        while level:
+            next_level = []
+            for model_class, lookup in level:
+                for field in model_class._meta.concrete_fields:
+                    parent_model = field.related_model
+                    if not (field.many_to_one or field.one_to_one) or \
+                            parent_model in visited or \
+                            field.remote_field.is_hidden():
+                        continue
+                    try:
+                        parent_model._meta.get_field(hash_field_name)
+                    except FieldDoesNotExist:
+                        continue
+                    visited.add(parent_model)
+                    parent_lookup = '{0}__{1}'.format(
+                        field.related_query_name(), lookup)
+                    parent_model._default_manager.filter(**{
+                        parent_lookup: pk_list,
+                    }).update(**{hash_field_name: None})
+                    next_level.append((parent_model, parent_lookup))
+            level = next_level
+
+    def _get_write_strategy(self, field, count):
+        """
+        Picks how `count` validated children of `field` are written. Lists
+        shorter than `Meta.bulk_min_items` (2 by default) are saved row by
+        row.
+        """
+        if isinstance(field, BatchSaveMixin):
+            if field._can_save_in_batch():
+                return WriteStrategy('batch')
+            return WriteStrategy('per_row', 'custom saving')
+
+        reason = _get_bulk_save_blocker(field)
+        min_items = getattr(self.Meta, 'bulk_min_items', 2)
+        if reason is None and count < min_items:
+            reason = 'fewer than {0} items'.format(min_items)
+        return WriteStrategy('per_row' if reason else 'bulk', reason)
+
+    @property
+    def write_strategies(self):
+        """
+        Write strategies picked for the nested lists of the last save by
+        `<serializer class name>.<field name>`, for debugging.
+        """
+        return getattr(self, '_write_strategies', OrderedDict())
+
+    def _save_nodes_in_batch(self, nodes):
+        """
+        Saves many validated nested serializers of the same class level by
+        level. Returns saved instances or raises `ValidationError` with
+        the errors of every node.
+        """
+        # mixins.py builds its serializers on this module
+        from .mixins import NestedCreateMixin, NestedUpdateMixin
+
+        parents = []
+        for node in nodes:
+            attrs = dict(node.validated_data, **node._save_kwargs)
+            relations, reverse_relations = node._extract_relations(attrs)
+            parents.append((node, attrs, relations, reverse_relations))
+
+        # Create or update direct relations (foreign key, one-to-one)
+        self._raise_batch_errors(
+            self._update_or_create_direct_relations_in_batch([
+                (node, attrs, relations)
+                for node, attrs, relations, _ in parents
+            ]))
+
+        errors = []
+        updated = []
+        for node, attrs, relations, reverse_relations in parents:
+            try:
+                if node.instance is None:
+                    node._write_status = 'created'
+                    if isinstance(node, NestedCreateMixin):
+                        node.instance = super(
+                            NestedCreateMixin, node).create(attrs)
+                    else:
+                        node.instance = serializers.ModelSerializer.create(
+                            node, attrs)
+                else:
+                    node._write_status = node._get_write_status(
+                        node.instance, attrs)
+                    if isinstance(node, NestedUpdateMixin):
+                        updated.append(
+                            (node, node.instance, reverse_relations))
+                        node.instance = super(
+                            NestedUpdateMixin, node).update(
+                                node.instance, attrs)
+                    else:
+                        node.instance = serializers.ModelSerializer.update(
+                            node, node.instance, attrs)
+                if node._write_status != 'unchanged':
+                    _record_saved(
+                        node.Meta.model, [node.instance],
+                        node._write_status == 'created')
+                errors.append({})
+            except ValidationError as exc:
+                errors.append(exc.detail)
+        self._raise_batch_errors(errors)
+
+        self._raise_batch_errors(
+            self._update_or_create_reverse_relations_in_batch([
+                (node, node.instance, reverse_relations)
+                for node, _, _, reverse_relations in parents
+            ]))
+        self._delete_reverse_relations_in_batch(updated)
+
+        for node in nodes:
+            node.prime_relation_caches(node.instance)
+        if _get_content_hash_field_name(nodes[0]) is not None:
+            self._save_content_hashes(nodes[0], [
+                (node.instance, node.initial_data, node.partial)
+                for node in nodes
+            ])
+        return [node.instance for node in nodes]
+
+    def _raise_batch_errors(self, errors):
+        if any(errors):
+            raise BatchValidationError(errors)
+
+    def _delete_reverse_relations_in_batch(self, parents):
+        """
+        Deletes reverse related instances which are missed in data for many
+        parents with one query per field. `parents` is a list of
+        `(serializer, instance, reverse_relations)`.
+        """
+        field_names = OrderedDict()
+        for parent, instance, reverse_relations in parents:
+            field_names.update((name, None) for name in reverse_relations)
+
+        # Reverse `reverse_relations` for correct delete priority
+        for field_name in reversed(list(field_names)):
+            items = [
+                (parent, instance, reverse_relations[field_name])
+                for parent, instance, reverse_relations in parents
+                if field_name in reverse_relations
+            ]
+            related_field, field, field_source = items[0][2]
+            model_class = field.Meta.model
+
+            current_ids = []
+            for parent, instance, relation in items:
+                related_data = parent.get_initial()[field_name]
+                # Expand to array of one item for one-to-one for uniformity
+                if related_field.one_to_one:
+                    related_data = [related_data]
+                current_ids.append(
+                    set(self._extract_related_pks(field, related_data)))
+
+            # M2M relation can be as direct or as reverse. For direct relation
+            # we should use reverse relation name
+            if related_field.many_to_many and \
+                    not isinstance(related_field, ForeignObjectRel):
+                lookup_name = related_field.remote_field.name
+                queryset = model_class.objects.filter(**{
+                    '{0}__in'.format(lookup_name):
+                        [instance for _, instance, _ in items],
+                })
+            elif _is_generic_relation(related_field):
+                lookup_name = related_field.object_id_field_name
+                queryset = model_class.objects.filter(**{
+                    related_field.content_type_field_name:
+                        _get_content_type(items[0][1]),
+                    '{0}__in'.format(lookup_name):
+                        [instance.pk for _, instance, _ in items],
+                })
+            else:
+                lookup_name = related_field.name
+                queryset = model_class.objects.filter(**{
+                    '{0}__in'.format(lookup_name):
+                        [instance for _, instance, _ in items],
+                })
+
+            if not related_field.many_to_many:
+                queryset = queryset.exclude(pk__in=set.union(*current_ids))
+
+            pks_to_delete = defaultdict(list)
+            for pk, parent_pk in queryset.values_list('pk', lookup_name):
+                pks_to_delete[str(parent_pk)].append(pk)
+            # M2M instances kept by another parent can't be excluded in
+            # the query
+            for (parent, instance, relation), ids in zip(items, current_ids):
+                pks_to_delete[str(instance.pk)] = [
+                    pk for pk in pks_to_delete[str(instance.pk)]
+                    if str(pk) not in ids
+                ]
+
+            try:
+                if related_field.many_to_many:
+                    # Remove relations from m2m table
+                    for parent, instance, relation in items:
+                        if pks_to_delete[str(instance.pk)]:
+                            m2m_manager = getattr(instance, field_source)
+                            m2m_manager.remove(
+                                *pks_to_delete[str(instance.pk)])
+                else:
+                    deleted_pks = [
+                        pk for pks in pks_to_delete.values() for pk in pks]
+                    model_class.objects.filter(pk__in=deleted_pks).delete()
+                    _record_deleted(model_class, deleted_pks)
+
+            except ProtectedError as e:
+                instances = e.args[1]
+                items[0][0].fail(
+                    'cannot_delete_protected', instances=", ".join([
+                        str(instance) for instance in instances]))
+
+            for parent, instance, relation in items:
+                write_results = parent._write_results.get(field_name)
+                if isinstance(write_results, list):
+                    write_results.extend(
+                        OrderedDict([('pk', pk), ('status', 'deleted')])
+                        for pk in pks_to_delete[str(instance.pk)]
+                    )
+
+    def _update_or_create_direct_relations_in_batch(self, parents):
+        """
+        Saves direct relations of many parents field by field. `parents` is
+        a list of `(serializer, attrs, relations)`. Returns the errors of
+        every parent.
+        """
+        errors = [{} for _ in parents]
+        field_names = OrderedDict()
+        for parent, attrs, relations in parents:
+            field_names.update((name, None) for name in relations)
+
+        for field_name in field_names:
+            items = []
+            owners = []
+            for index, (parent, attrs, relations) in enumerate(parents):
+                if field_name not in relations or errors[index]:
+                    continue
+                field, field_source = relations[field_name]
+                items.append((
+                    parent,
+                    [parent.get_initial()[field_name]],
+                    parent._get_save_kwargs(field_name),
+                ))
+                owners.append(index)
+
+            if not items:
+                continue
+
+            saved, write_results, item_errors = self._save_related_in_batch(
+                field_name, field, items)
+
+            for index, related_instances, results, detail in zip(
+                    owners, saved, write_results, item_errors):
+                parent, attrs, relations = parents[index]
+                if detail[0]:
+                    errors[index] = {field_name: detail[0]}
+                    continue
+                attrs[relations[field_name][1]] = related_instances[0]
+                parent._write_results[field_name] = results[0]
+
+        return errors
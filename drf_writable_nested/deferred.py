@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+import logging
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connections
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class DeferredJob(object):
+    """
+    Saves reverse relation fields listed in `Meta.deferred_fields` of an
+    already saved instance: the serializer is run as a partial update of
+    the instance with the raw data of these fields only.
+
+    `to_dict()`/`from_dict()` convert the job to plain data for backends
+    which run it in another process. The serializer context isn't passed.
+    """
+    def __init__(self, serializer_class, pk, data, job_id=None):
+        self.id = job_id or uuid.uuid4().hex
+        self.serializer_class = serializer_class
+        self.pk = pk
+        self.data = data
+
+    def __repr__(self):
+        return '<DeferredJob {0} {1} pk={2}>'.format(
+            self.id, self.serializer_class.__name__, self.pk)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'serializer': '{0}.{1}'.format(
+                self.serializer_class.__module__,
+                self.serializer_class.__name__),
+            'pk': self.pk,
+            'data': self.data,
+        }
+
+    @classmethod
+    def from_dict(cls, value):
+        return cls(import_string(value['serializer']), value['pk'],
+                   value['data'], job_id=value['id'])
+
+    def run(self):
+        """
+        Validates and saves the deferred fields, returns the instance.
+        Raises `ValidationError` if the data isn't valid anymore.
+        """
+        model_class = self.serializer_class.Meta.model
+        instance = model_class._default_manager.get(pk=self.pk)
+        serializer = self.serializer_class(
+            instance=instance, data=self.data, partial=True)
+        serializer._is_deferred_job = True
+        serializer.is_valid(raise_exception=True)
+        return serializer.save()
+
+
+class BaseDeferredBackend(object):
+    """
+    Runs deferred jobs, `submit` is called once the transaction which saved
+    the instance is committed.
+    """
+    def submit(self, job):
+        raise NotImplementedError('`submit()` must be implemented.')
+
+
+class ThreadPoolBackend(BaseDeferredBackend):
+    """
+    Runs deferred jobs in a pool of `max_workers` threads of the current
+    process, every thread uses its own database connections. Failed jobs
+    are logged.
+
+    `get_result(job_id, timeout)` waits for a submitted job and returns the
+    saved instance or raises its error, a finished job is forgotten
+    afterwards. Results which nobody asks for are kept for the last
+    `max_results` finished jobs only.
+    """
+    def __init__(self, max_workers=4, max_results=1000):
+        self.max_workers = max_workers
+        self.max_results = max_results
+        self._executor = None
+        self._futures = {}
+        self._finished = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.max_workers)
+            return self._executor
+
+    @staticmethod
+    def _run(job):
+        try:
+            return job.run()
+        finally:
+            connections.close_all()
+
+    def submit(self, job):
+        executor = self._get_executor()
+        # The job is registered before it can finish
+        with self._lock:
+            future = executor.submit(self._run, job)
+            self._futures[job.id] = future
+        future.add_done_callback(
+            lambda future: self._on_done(job, future))
+
+    def _on_done(self, job, future):
+        exc = None if future.cancelled() else future.exception()
+        if exc is not None:
+            logger.error('Deferred job %r failed', job, exc_info=(
+                type(exc), exc, exc.__traceback__))
+        with self._lock:
+            if job.id not in self._futures:
+                # The result is already taken
+                return
+            self._finished[job.id] = None
+            while len(self._finished) > self.max_results:
+                job_id, _ = self._finished.popitem(last=False)
+                self._futures.pop(job_id, None)
+
+    def get_result(self, job_id, timeout=None):
+        with self._lock:
+            future = self._futures[job_id]
+        try:
+            return future.result(timeout)
+        finally:
+            if future.done():
+                with self._lock:
+                    self._futures.pop(job_id, None)
+                    self._finished.pop(job_id, None)
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait)
+
+
+_default_backend = None
+_default_backend_lock = threading.Lock()
+
+
+def get_default_backend():
+    """
+    Backend of serializers without `Meta.deferred_backend`, a shared
+    `ThreadPoolBackend`.
+    """
+    global _default_backend
+    with _default_backend_lock:
+        if _default_backend is None:
+            _default_backend = ThreadPoolBackend()
+        return _default_backend
@@ -0,0 +1,411 @@
+# -*- coding: utf-8 -*-
+import io
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import traceback
+import zlib
+from collections import OrderedDict
+
+import django
+from django.apps import apps
+from django.db import DatabaseError, connections, router, transaction
+from rest_framework.exceptions import ValidationError
+from rest_framework.settings import api_settings
+
+from .mixins import NestedListSerializer
+
+
+class LoadResult(object):
+    """
+    Counters of a bulk load.
+    """
+    def __init__(self):
+        self.loaded = 0
+        self.rejected = 0
+        self.chunks = 0
+
+    def __repr__(self):
+        return '<LoadResult loaded={0} rejected={1} chunks={2}>'.format(
+            self.loaded, self.rejected, self.chunks)
+
+
+class JSONLinesLoader(object):
+    """
+    Streams JSON Lines through a nested serializer.
+
+    Records are read and validated in chunks of `chunk_size`, every chunk is
+    saved in one transaction (together, if the serializer uses
+    `NestedListSerializer`). Only one chunk is kept in memory. Records with
+    an existing pk update the instance, others are created.
+
+    Records which can't be parsed, validated or saved are written to
+    `reject_file` as `{"line": ..., "errors": ..., "record": ...}` and don't
+    stop the load. If saving a chunk fails, the chunk is rolled back and
+    saved record by record to find the failed ones.
+
+    Example of usage:
+    ```
+    with open('users.jsonl') as source, open('rejects.jsonl', 'w') as rejects:
+        result = JSONLinesLoader(UserSerializer, reject_file=rejects).load(
+            source)
+    ```
+    """
+    def __init__(self, serializer_class, chunk_size=500, reject_file=None,
+                 context=None, save_kwargs=None):
+        assert chunk_size > 0, '`chunk_size` must be positive.'
+        self.serializer_class = serializer_class
+        self.model_class = serializer_class.Meta.model
+        self.chunk_size = chunk_size
+        self.reject_file = reject_file
+        self.context = context or {}
+        self.save_kwargs = save_kwargs or {}
+        self.using = router.db_for_write(self.model_class)
+
+    def load(self, source):
+        """
+        Loads all records of `source`: a path or a file-like object.
+        Returns `LoadResult`.
+        """
+        if isinstance(source, str):
+            with io.open(source, encoding='utf-8') as f:
+                return self.load(f)
+
+        return self.load_lines(enumerate(source, 1))
+
+    def load_lines(self, lines, result=None):
+        """
+        Loads `lines`, an iterable of `(line_number, line)`. Returns
+        `LoadResult`.
+        """
+        if result is None:
+            result = LoadResult()
+        chunk = []
+        for line_number, line in lines:
+            if not line.strip():
+                continue
+            chunk.append((line_number, line))
+            if len(chunk) >= self.chunk_size:
+                self.load_chunk(chunk, result)
+                chunk = []
+        if chunk:
+            self.load_chunk(chunk, result)
+        return result
+
+    def load_chunk(self, chunk, result):
+        """
+        Validates and saves `chunk`, a list of `(line_number, line)`.
+        """
+        result.chunks += 1
+        lines = dict(chunk)
+        validated = self.validate(self.parse(chunk, result), result)
+        if not validated:
+            return
+
+        try:
+            with transaction.atomic(using=self.using):
+                self.save([serializer for _, serializer in validated])
+        except (ValidationError, DatabaseError):
+            # Saved instances and `initial_data` are modified by the failed
+            # save, so valid records are parsed and validated again
+            for line_number, _ in validated:
+                self.load_record(line_number, lines[line_number], result)
+        else:
+            result.loaded += len(validated)
+
+    def load_record(self, line_number, line, result):
+        validated = self.validate(
+            self.parse([(line_number, line)], result), result)
+        if not validated:
+            return
+
+        serializer = validated[0][1]
+        try:
+            with transaction.atomic(using=self.using):
+                serializer.save(**self.save_kwargs)
+        except ValidationError as exc:
+            self.reject(line_number, json.loads(line), exc.detail, result)
+        except DatabaseError as exc:
+            self.reject(line_number, json.loads(line), {
+                api_settings.NON_FIELD_ERRORS_KEY: [str(exc)],
+            }, result)
+        else:
+            result.loaded += 1
+
+    def parse(self, chunk, result):
+        records = []
+        for line_number, line in chunk:
+            try:
+                record = json.loads(line)
+            except ValueError as exc:
+                self.reject(line_number, line.rstrip('\n'), {
+                    api_settings.NON_FIELD_ERRORS_KEY: [str(exc)],
+                }, result)
+                continue
+            records.append((line_number, record))
+        return records
+
+    def get_instances(self, records):
+        # Existing instances of the whole chunk are fetched with one query
+        pk_name = self.model_class._meta.pk.attname
+        pks = []
+        for _, record in records:
+            if not isinstance(record, dict):
+                continue
+            pk = record.get(pk_name, record.get('pk'))
+            if pk is not None:
+                pks.append(pk)
+        if not pks:
+            return {}
+
+        return {
+            str(instance.pk): instance
+            for instance in self.model_class._default_manager.filter(
+                pk__in=pks)
+        }
+
+    def validate(self, records, result):
+        pk_name = self.model_class._meta.pk.attname
+        instances = self.get_instances(records)
+        validated = []
+        for line_number, record in records:
+            instance = None
+            if isinstance(record, dict):
+                pk = record.get(pk_name, record.get('pk'))
+                instance = instances.get(str(pk))
+            serializer = self.serializer_class(
+                instance=instance, data=record, context=self.context)
+            if serializer.is_valid():
+                validated.append((line_number, serializer))
+            else:
+                self.reject(line_number, record, serializer.errors, result)
+        return validated
+
+    def save(self, serializers):
+        list_serializer = self.serializer_class(
+            many=True, context=self.context)
+        if not isinstance(list_serializer, NestedListSerializer):
+            for serializer in serializers:
+                serializer.save(**self.save_kwargs)
+            return
+
+        list_serializer.initial_data = [
+            serializer.initial_data for serializer in serializers]
+        list_serializer._validated_data = [
+            serializer.validated_data for serializer in serializers]
+        list_serializer._errors = []
+        # Items are matched with the instances by pk on update
+        list_serializer.instance = [
+            serializer.instance for serializer in serializers
+            if serializer.instance is not None
+        ] or None
+        list_serializer.save(**self.save_kwargs)
+
+    def reject(self, line_number, record, errors, result):
+        result.rejected += 1
+        if self.reject_file is None:
+            return
+
+        self.reject_file.write(json.dumps(OrderedDict([
+            ('line', line_number),
+            ('errors', errors),
+            ('record', record),
+        ])) + '\n')
+
+
+class PartitionResult(LoadResult):
+    """
+    Counters of one partition of a parallel load. `error` is the traceback
+    if the worker failed, records of the committed chunks stay saved.
+    """
+    def __init__(self, partition):
+        super(PartitionResult, self).__init__()
+        self.partition = partition
+        self.error = None
+
+    def __repr__(self):
+        return (
+            '<PartitionResult partition={0} loaded={1} rejected={2} '
+            'chunks={3} failed={4}>'.format(
+                self.partition, self.loaded, self.rejected, self.chunks,
+                self.error is not None))
+
+
+class ParallelLoadResult(LoadResult):
+    """
+    Counters of a parallel load with the result of every partition.
+    """
+    def __init__(self, partitions):
+        super(ParallelLoadResult, self).__init__()
+        self.partitions = partitions
+        for partition in partitions:
+            self.loaded += partition.loaded
+            self.rejected += partition.rejected
+            self.chunks += partition.chunks
+
+    @property
+    def failed(self):
+        return [
+            partition for partition in self.partitions
+            if partition.error is not None
+        ]
+
+
+def _init_worker():
+    if not apps.ready:
+        django.setup()
+
+
+def _read_partition(source):
+    # Lines of a partition file are prefixed with their original number
+    for line in source:
+        line_number, line = line.split('\t', 1)
+        yield int(line_number), line
+
+
+def _load_partition(serializer_class, loader_kwargs, partition, path,
+                    reject_path):
+    # Every worker opens its own connections
+    connections.close_all()
+    result = PartitionResult(partition)
+    try:
+        with io.open(path, encoding='utf-8') as source, \
+                io.open(reject_path, 'w', encoding='utf-8') as reject_file:
+            loader = JSONLinesLoader(
+                serializer_class, reject_file=reject_file, **loader_kwargs)
+            loader.load_lines(_read_partition(source), result)
+    except Exception:
+        result.error = traceback.format_exc()
+    finally:
+        connections.close_all()
+    return result
+
+
+class ParallelJSONLinesLoader(object):
+    """
+    Loads JSON Lines with `JSONLinesLoader` in a pool of `workers`
+    processes, every worker uses its own database connection and
+    transactions.
+
+    Records are partitioned by `partition_key`, a root field name or a
+    callable which gets a record (the pk by default), so records of the same
+    root instance are always loaded by the same worker. Records without the
+    key are distributed evenly. Nested instances shared by roots of
+    different partitions (e.g. m2m targets) can still be written
+    concurrently.
+
+    Example of usage:
+    ```
+    result = ParallelJSONLinesLoader(
+        UserSerializer, workers=4, partition_key='username',
+    ).load('users.jsonl')
+    for partition in result.failed:
+        print(partition.partition, partition.error)
+    ```
+    """
+    def __init__(self, serializer_class, workers=None, partition_key=None,
+                 chunk_size=500, reject_file=None, context=None,
+                 save_kwargs=None, start_method=None):
+        self.serializer_class = serializer_class
+        self.workers = workers or multiprocessing.cpu_count()
+        if partition_key is None:
+            partition_key = serializer_class.Meta.model._meta.pk.attname
+        self.partition_key = partition_key
+        self.reject_file = reject_file
+        self.loader_kwargs = {
+            'chunk_size': chunk_size,
+            'context': context,
+            'save_kwargs': save_kwargs,
+        }
+        self.start_method = start_method
+
+    def get_partition_value(self, record):
+        if callable(self.partition_key):
+            return self.partition_key(record)
+        if not isinstance(record, dict):
+            return None
+        value = record.get(self.partition_key)
+        if value is None and \
+                self.partition_key == \
+                self.serializer_class.Meta.model._meta.pk.attname:
+            value = record.get('pk')
+        return value
+
+    def get_partition(self, line_number, line):
+        try:
+            value = self.get_partition_value(json.loads(line))
+        except ValueError:
+            value = None
+        if value is None:
+            return line_number % self.workers
+        return zlib.crc32(
+            json.dumps(value, sort_keys=True).encode('utf-8')) % self.workers
+
+    def load(self, source):
+        """
+        Loads all records of `source`: a path or a file-like object.
+        Returns `ParallelLoadResult`.
+        """
+        if isinstance(source, str):
+            with io.open(source, encoding='utf-8') as f:
+                return self.load(f)
+
+        using = router.db_for_write(self.serializer_class.Meta.model)
+        if connections[using].vendor == 'sqlite' and \
+                connections[using].is_in_memory_db():
+            raise ValueError(
+                'In-memory SQLite database can\'t be shared by workers.')
+
+        directory = tempfile.mkdtemp(prefix='drf_writable_nested_')
+        try:
+            paths = [
+                os.path.join(directory, '{0}.jsonl'.format(partition))
+                for partition in range(self.workers)
+            ]
+            self.partition(source, paths)
+
+            # Connections can't be shared with forked workers
+            connections.close_all()
+            context = multiprocessing.get_context(self.start_method)
+            pool = context.Pool(self.workers, initializer=_init_worker)
+            try:
+                partitions = pool.starmap(_load_partition, [
+                    (self.serializer_class, self.loader_kwargs, partition,
+                     path, path + '.rejects')
+                    for partition, path in enumerate(paths)
+                ])
+            finally:
+                pool.close()
+                pool.join()
+
+            if self.reject_file is not None:
+                for path in paths:
+                    with io.open(path + '.rejects', encoding='utf-8') as f:
+                        shutil.copyfileobj(f, self.reject_file)
+        finally:
+            shutil.rmtree(directory)
+
+        return ParallelLoadResult(partitions)
+
+    def partition(self, source, paths):
+        files = [io.open(path, 'w', encoding='utf-8') for path in paths]
+        try:
+            for line_number, line in enumerate(source, 1):
+                if not line.strip():
+                    continue
+                if not line.endswith('\n'):
+                    line += '\n'
+                files[self.get_partition(line_number, line)].write(
+                    '{0}\t{1}'.format(line_number, line))
+        finally:
+            for f in files:
+                f.close()
+
+
+def load_jsonl(source, serializer_class, **kwargs):
+    """
+    Shortcut for `JSONLinesLoader(serializer_class, **kwargs).load(source)`.
+    """
+    return JSONLinesLoader(serializer_class, **kwargs).load(source)
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+import io
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.module_loading import import_string
+
+from ...loaders import JSONLinesLoader, ParallelJSONLinesLoader
+
+
+class Command(BaseCommand):
+    help = 'Loads a JSON Lines file through a nested serializer.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'serializer',
+            help='Dotted path to the serializer class.')
+        parser.add_argument(
+            'source',
+            help='Path to the JSON Lines file, "-" to read stdin.')
+        parser.add_argument(
+            '--chunk-size', type=int, default=500,
+            help='Number of records saved in one transaction.')
+        parser.add_argument(
+            '--reject-file',
+            help='Path to the JSON Lines file for rejected records.')
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='Number of worker processes.')
+        parser.add_argument(
+            '--partition-key',
+            help='Root field used to partition records between workers, '
+                 'the pk by default.')
+
+    def handle(self, *args, **options):
+        try:
+            serializer_class = import_string(options['serializer'])
+        except ImportError as exc:
+            raise CommandError(str(exc))
+        if options['chunk_size'] <= 0:
+            raise CommandError('--chunk-size must be positive.')
+        if options['workers'] <= 0:
+            raise CommandError('--workers must be positive.')
+
+        reject_file = None
+        if options['reject_file']:
+            reject_file = io.open(options['reject_file'], 'w',
+                                  encoding='utf-8')
+        source = options['source']
+        if source == '-':
+            source = sys.stdin
+
+        started = time.time()
+        try:
+            if options['workers'] > 1:
+                loader = ParallelJSONLinesLoader(
+                    serializer_class,
+                    workers=options['workers'],
+                    partition_key=options['partition_key'],
+                    chunk_size=options['chunk_size'],
+                    reject_file=reject_file,
+                )
+            else:
+                loader = JSONLinesLoader(
+                    serializer_class,
+                    chunk_size=options['chunk_size'],
+                    reject_file=reject_file,
+                )
+            result = loader.load(source)
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        finally:
+            if reject_file is not None:
+                reject_file.close()
+        elapsed = time.time() - started
+
+        self.stdout.write(
+            'Loaded {0} records, rejected {1} in {2:.2f}s '
+            '({3:.0f} records/s)'.format(
+                result.loaded, result.rejected, elapsed,
+                (result.loaded + result.rejected) / elapsed
+                if elapsed else 0))
+        for partition in getattr(result, 'failed', []):
+            self.stderr.write(
+                'Partition {0} failed after {1} records:\n{2}'.format(
+                    partition.partition, partition.loaded, partition.error))
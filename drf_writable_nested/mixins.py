@@ -1,20 +1,1047 @@
 # -*- coding: utf-8 -*-
+import asyncio
+import copy
+import itertools
+import random
+import time
 from collections import OrderedDict, defaultdict
-
-from django.contrib.contenttypes.fields import GenericRelation
-from django.contrib.contenttypes.models import ContentType
-from django.db.models import ProtectedError, FieldDoesNotExist, ObjectDoesNotExist
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import OperationalError, connections, transaction
+from django.db.models import (
+    Max, Model, ProtectedError, FieldDoesNotExist, ObjectDoesNotExist,
+    PositiveIntegerField, PositiveSmallIntegerField, Q)
 from django.db.models.fields.related import ForeignObjectRel
 from django.utils.translation import ugettext_lazy as _
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
-from rest_framework.fields import empty
+from rest_framework.fields import empty, get_error_detail
+from rest_framework.relations import (
+    ManyRelatedField, PrimaryKeyRelatedField, RelatedField, SlugRelatedField)
+from rest_framework.settings import api_settings
+from rest_framework.utils import html
+from rest_framework.utils.serializer_helpers import ReturnDict
 from rest_framework.validators import UniqueValidator, UniqueTogetherValidator
+
+from .batch import (
+    BatchSaveMixin, _bulk_save, _can_bulk_write, _get_model_bulk_save_blocker)
+from .deferred import DeferredJob, get_default_backend
+from .signals import (
+    _record_deleted,
+    _record_saved,
+    _save_with_bulk_signals,
+)
+from .utils import (
+    _get_content_hash_field_name, _get_content_type,
+    _get_atomic_savepoint, _get_atomic_using, _get_method_owner,
+    _hash_payload, _is_atomic, _is_content_unchanged, _is_generic_relation)
+
 # permit writable nested serializers
 serializers.raise_errors_on_nested_writes = lambda a, b, c: None
 
 
-class BaseNestedModelSerializer(serializers.ModelSerializer):
+class RelatedFieldCache(object):
+    """
+    Resolves the raw values of a `PrimaryKeyRelatedField` or
+    `SlugRelatedField` for a whole nested list with one `IN` query.
+
+    The cache is bound to the field instances of the child serializers and
+    serves their lookups. Values which are missing in the cache fall back to
+    the field's own `to_internal_value`, so "does not exist" and "incorrect
+    type" errors stay exactly the same for each item. So do values of a
+    non-unique slug field which match many rows.
+    """
+    def __init__(self, field, values):
+        queryset = field.get_queryset()
+        self.model_field = self._get_model_field(field, queryset.model)
+        self.instances = {}
+
+        keys = set()
+        for value in values:
+            key = self._to_key(field, value)
+            if key is not None:
+                keys.add(key)
+
+        if keys:
+            lookup = '{0}__in'.format(self.model_field.name)
+            duplicates = set()
+            for instance in queryset.filter(**{lookup: list(keys)}):
+                key = str(getattr(instance, self.model_field.attname))
+                if key in self.instances:
+                    duplicates.add(key)
+                self.instances[key] = instance
+            for key in duplicates:
+                del self.instances[key]
+
+    @staticmethod
+    def _get_model_field(field, model_class):
+        if isinstance(field, SlugRelatedField):
+            return model_class._meta.get_field(field.slug_field)
+        return model_class._meta.pk
+
+    @staticmethod
+    def is_supported(field):
+        if field.read_only or not isinstance(
+                field, (PrimaryKeyRelatedField, SlugRelatedField)):
+            return False
+        # Lookups which span relations can't be served from a flat map
+        return '__' not in getattr(field, 'slug_field', '')
+
+    def _to_key(self, field, value):
+        if value is None or value == '':
+            return None
+        try:
+            if getattr(field, 'pk_field', None) is not None:
+                value = field.pk_field.to_internal_value(value)
+            return str(self.model_field.to_python(value))
+        except (TypeError, ValueError, DjangoValidationError,
+                ValidationError):
+            return None
+
+    def to_internal_value(self, field, data):
+        key = self._to_key(field, data)
+        if key in self.instances:
+            return self.instances[key]
+        return field.__class__.to_internal_value(field, data)
+
+    def bind(self, field):
+        def to_internal_value(data):
+            return self.to_internal_value(field, data)
+        field.to_internal_value = to_internal_value
+
+    @staticmethod
+    def unbind(field):
+        field.__dict__.pop('to_internal_value', None)
+
+
+class IdentityMap(object):
+    """
+    Registry of the instances written during one nested save.
+
+    Instances are keyed by `(model, key)` where the key is a primary key or
+    a `match_on` lookup. Repeated references to the same identity resolve to
+    the same in-memory instance, so it is fetched and saved at most once.
+    A repeated reference has to be a subset of the data which was saved
+    first, otherwise a validation error is raised.
+    """
+    error_message = _(
+        'Conflicting data for {model} with identity {key}.')
+
+    def __init__(self):
+        self._instances = {}
+        self._data = {}
+
+    @staticmethod
+    def _make_key(model_class, key):
+        if isinstance(key, Mapping) and len(key) == 1 and \
+                list(key)[0] in ('pk', model_class._meta.pk.name):
+            # Lookup by primary key shares the identity with plain pk keys
+            key = list(key.values())[0]
+        if isinstance(key, Mapping):
+            key = tuple(sorted(
+                (name, str(getattr(value, 'pk', value)))
+                for name, value in key.items()
+            ))
+        else:
+            key = str(key)
+        return model_class._meta.concrete_model, key
+
+    def get(self, model_class, key, data=None):
+        identity = self._make_key(model_class, key)
+        if identity not in self._instances:
+            return None
+
+        if data is not None:
+            saved_data = self._data[identity]
+            conflicts = [
+                name for name, value in data.items()
+                if name not in saved_data or saved_data[name] != value
+            ]
+            if conflicts:
+                raise ValidationError({
+                    api_settings.NON_FIELD_ERRORS_KEY: [
+                        self.error_message.format(
+                            model=model_class._meta.object_name,
+                            key=identity[1],
+                        ),
+                    ],
+                }, code='conflicting_identity')
+
+        return self._instances[identity]
+
+    def get_many(self, model_class, keys):
+        instances = {}
+        for key in keys:
+            identity = self._make_key(model_class, key)
+            if identity in self._instances:
+                instances[key] = self._instances[identity]
+        return instances
+
+    def add(self, model_class, key, instance, data):
+        identity = self._make_key(model_class, key)
+        self._instances[identity] = instance
+        self._data[identity] = data
+
+
+def _copy_containers(value):
+    # Validated data is modified during save, so each caller gets its own
+    # containers
+    if isinstance(value, Mapping):
+        return OrderedDict(
+            (key, _copy_containers(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return [_copy_containers(item) for item in value]
+    return value
+
+
+class ValidationMemo(object):
+    """
+    Reuses the validation result (or the errors) of identical nested
+    payloads within one request.
+
+    The memo is keyed by the serializer class and a canonical hash of the
+    payload. It is used only for serializers which declare their validators
+    as deterministic with `Meta.deterministic_validation = True`.
+    """
+    def __init__(self):
+        self._results = {}
+
+    @staticmethod
+    def is_enabled(serializer):
+        meta = getattr(serializer, 'Meta', None)
+        return getattr(meta, 'deterministic_validation', False)
+
+    @staticmethod
+    def _make_key(serializer, data):
+        payload_hash = _hash_payload(data)
+        if payload_hash is None:
+            return None
+        instance = getattr(serializer, 'instance', None)
+        return (
+            serializer.__class__,
+            getattr(instance, 'pk', None),
+            serializer.partial,
+            payload_hash,
+        )
+
+    def run_validation(self, serializer, data, validate):
+        """
+        Returns the validated data of `data`, `validate(data)` is called
+        only for a payload which wasn't validated yet.
+        """
+        key = self._make_key(serializer, data)
+        if key is None:
+            return validate(data)
+
+        if key not in self._results:
+            try:
+                validated_data = validate(data)
+            except ValidationError as exc:
+                self._results[key] = (None, exc.detail)
+                raise
+            self._results[key] = (_copy_containers(validated_data), None)
+
+        validated_data, detail = self._results[key]
+        if detail is not None:
+            raise ValidationError(detail)
+        return _copy_containers(validated_data)
+
+
+def _is_async(func):
+    return asyncio.iscoroutinefunction(func) or \
+        asyncio.iscoroutinefunction(getattr(func, '__call__', None))
+
+
+def _run_coroutine(coroutine):
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+    # Validation is called from async code, the loop of this thread is busy
+    with ThreadPoolExecutor(1) as executor:
+        return executor.submit(asyncio.run, coroutine).result()
+
+
+class AsyncValidation(object):
+    """
+    Runs async validators of nested children concurrently.
+
+    Async field validators, `validate_<field>` and `validate` methods and
+    serializer validators of a bound serializer are collected instead of
+    being called, with the key of the validated item. `run()` awaits all of
+    them at once, at most `Meta.async_validation_concurrency` (10 by
+    default) at a time, and returns the errors by key. Async validators
+    can't change the validated value.
+    """
+    default_concurrency = 10
+
+    def __init__(self, serializer):
+        self.concurrency = getattr(
+            getattr(serializer, 'Meta', None), 'async_validation_concurrency',
+            self.default_concurrency)
+        self.key = None
+        self._pending = []
+        self._aliases = OrderedDict()
+        self._first_keys = {}
+        self._validators = []
+
+    @staticmethod
+    def is_enabled(serializer):
+        if _is_async(getattr(serializer, 'validate', None)) or \
+                any(_is_async(validator)
+                    for validator in serializer.validators):
+            return True
+        for field_name, field in serializer.fields.items():
+            if field.read_only:
+                continue
+            if _is_async(getattr(serializer, 'validate_' + field_name, None)) \
+                    or any(_is_async(validator)
+                           for validator in field.validators):
+                return True
+        return False
+
+    def _schedule(self, field_name, validator, *args):
+        self._pending.append((self.key, field_name, validator, args))
+
+    def _wrap_validator(self, field_name, validator):
+        def collect(value):
+            self._schedule(field_name, validator, value)
+        return collect
+
+    def _wrap_method(self, field_name, method):
+        def collect(value):
+            self._schedule(field_name, method, value)
+            return value
+        return collect
+
+    def _bind_validators(self, field_name, field):
+        validators = field.validators
+        if not any(_is_async(validator) for validator in validators):
+            return
+        self._validators.append((field, validators))
+        field.validators = [
+            self._wrap_validator(field_name, validator)
+            if _is_async(validator) else validator
+            for validator in validators
+        ]
+
+    def bind(self, serializer):
+        self._bind_validators(None, serializer)
+        if _is_async(getattr(serializer, 'validate', None)):
+            serializer.validate = self._wrap_method(None, serializer.validate)
+        for field_name, field in serializer.fields.items():
+            if field.read_only:
+                continue
+            self._bind_validators(field_name, field)
+            method_name = 'validate_' + field_name
+            method = getattr(serializer, method_name, None)
+            if _is_async(method):
+                setattr(serializer, method_name,
+                        self._wrap_method(field_name, method))
+
+    def unbind(self, serializer):
+        serializer.__dict__.pop('validate', None)
+        for field_name in serializer.fields:
+            serializer.__dict__.pop('validate_' + field_name, None)
+        for bound_field, validators in self._validators:
+            bound_field.validators = validators
+        self._validators = []
+
+    def add_alias(self, key, memo_key):
+        # Identical payloads are validated once, the item of `key` gets the
+        # errors of the first one
+        self._aliases[key] = self._first_keys.setdefault(memo_key, key)
+
+    @staticmethod
+    def merge_errors(errors, detail):
+        errors = OrderedDict(errors)
+        for key, messages in detail.items():
+            if isinstance(errors.get(key), list) and \
+                    isinstance(messages, list):
+                errors[key] = errors[key] + messages
+            else:
+                errors[key] = messages
+        return errors
+
+    def run(self):
+        """Awaits the collected validators, returns the errors by key"""
+        pending, self._pending = self._pending, []
+        if not pending:
+            return OrderedDict()
+
+        async def run_all():
+            semaphore = asyncio.Semaphore(self.concurrency)
+
+            async def run_one(field_name, validator, args):
+                async with semaphore:
+                    try:
+                        await validator(*args)
+                    except (ValidationError, DjangoValidationError) as exc:
+                        if field_name is None:
+                            return serializers.as_serializer_error(exc)
+                        if isinstance(exc, ValidationError):
+                            return {field_name: exc.detail}
+                        return {field_name: get_error_detail(exc)}
+                return None
+
+            return await asyncio.gather(*[
+                run_one(field_name, validator, args)
+                for _, field_name, validator, args in pending
+            ])
+
+        errors = OrderedDict()
+        for item, detail in zip(pending, _run_coroutine(run_all())):
+            if detail:
+                key = item[0]
+                errors[key] = self.merge_errors(errors.get(key, {}), detail)
+        for key, first_key in self._aliases.items():
+            if key != first_key and first_key in errors:
+                errors[key] = errors[first_key]
+        return errors
+
+
+class RetryPolicy(object):
+    """
+    Retries a nested save which failed with a transient database error,
+    e.g. a deadlock or a serialization failure. Attempts are delayed by an
+    exponential backoff with full jitter: a random delay up to
+    `backoff * 2 ** (attempt - 1)`, at most `max_backoff` seconds.
+    """
+    def __init__(self, max_attempts=3, backoff=0.05, max_backoff=1.0,
+                 retry_on=(OperationalError,)):
+        assert max_attempts >= 1, '`max_attempts` must be positive.'
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.retry_on = tuple(retry_on)
+
+    def should_retry(self, exc, attempt):
+        return attempt < self.max_attempts and \
+            isinstance(exc, self.retry_on)
+
+    def get_delay(self, attempt):
+        return random.uniform(
+            0, min(self.max_backoff, self.backoff * 2 ** (attempt - 1)))
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+
+class PayloadCost(object):
+    """
+    Estimated cost of saving a nested payload: the number of nodes on every
+    level of the tree (the root is level 0) and the projected number of
+    queries for the write strategies of the nested fields.
+    """
+    def __init__(self):
+        self.levels = []
+        self.queries = 0
+
+    @property
+    def nodes(self):
+        return sum(self.levels)
+
+    @property
+    def depth(self):
+        return len(self.levels) - 1
+
+    def get_exceeded_limits(self, limits):
+        """
+        Returns `(name, value, limit)` of every exceeded limit, `limits` is a
+        dict with the `nodes`, `depth` and `queries` limits.
+        """
+        return [
+            (name, getattr(self, name), limits[name])
+            for name in ('nodes', 'depth', 'queries')
+            if limits.get(name) is not None and
+            getattr(self, name) > limits[name]
+        ]
+
+    def __repr__(self):
+        return '<PayloadCost nodes={0} depth={1} queries={2}>'.format(
+            self.nodes, self.depth, self.queries)
+
+
+class NestedDelta(object):
+    """
+    Operations on a nested list sent instead of the whole list: `add` is a
+    list of new children, `update` a list of children with their pk,
+    `remove` a list of pks and `move` a list of `(pk, position)`.
+    """
+    operations = ('add', 'update', 'remove', 'move')
+
+    def __init__(self, add=(), update=(), remove=(), move=()):
+        self.add = list(add)
+        self.update = list(update)
+        self.remove = list(remove)
+        self.move = list(move)
+
+    def __repr__(self):
+        return '<NestedDelta add={0} update={1} remove={2} move={3}>'.format(
+            len(self.add), len(self.update), len(self.remove),
+            len(self.move))
+
+
+def _get_prefetch_cache_name(manager):
+    cache_name = getattr(manager, 'prefetch_cache_name', None)
+    if cache_name is None:
+        cache_name = manager.field.remote_field.get_cache_name()
+    return cache_name
+
+
+def _set_prefetched_objects(instance, field_source, related_instances):
+    manager = getattr(instance, field_source)
+    cache_name = _get_prefetch_cache_name(manager)
+
+    if not hasattr(instance, '_prefetched_objects_cache'):
+        instance._prefetched_objects_cache = {}
+    instance._prefetched_objects_cache.pop(cache_name, None)
+    queryset = manager.get_queryset()
+    queryset._result_cache = list(related_instances)
+    queryset._prefetch_done = True
+    instance._prefetched_objects_cache[cache_name] = queryset
+
+
+def _collect_pks(field, data, pks, children, pk=None):
+    # Fills `pks` with pks of instances referenced in the data of `field`
+    # and `children` with lookups of reverse related rows which are deleted
+    # if they are missing in the data, `pk` is the pk of the instance
+    if isinstance(field, serializers.ListSerializer):
+        if isinstance(data, list):
+            for item in data:
+                _collect_pks(field.child, item, pks, children)
+        return
+    if not isinstance(field, serializers.ModelSerializer) or \
+            not isinstance(data, Mapping):
+        return
+
+    model_class = field.Meta.model
+    pk_field = model_class._meta.pk
+    pk = data.get('pk') or data.get(pk_field.attname) or pk
+    if pk:
+        try:
+            pk = pk_field.to_python(pk)
+        except DjangoValidationError:
+            pk = None
+        else:
+            pks[model_class._meta.concrete_model].add(str(pk))
+    for name, value in data.items():
+        sub_field = field.fields.get(name)
+        if sub_field is None or sub_field.read_only:
+            continue
+        if pk and isinstance(field, NestedUpdateMixin) and \
+                value is not None:
+            _collect_children(model_class, sub_field, pk, children)
+        _collect_pks(sub_field, value, pks, children)
+
+
+def _collect_children(model_class, field, pk, children):
+    # Reverse related rows of the instance with `pk` which the update
+    # deletes unless they are in the data of `field`
+    source = field.source
+    if isinstance(field, serializers.ListSerializer):
+        field = field.child
+    if not isinstance(field, serializers.ModelSerializer):
+        return
+    try:
+        related_field = model_class._meta.get_field(source)
+    except FieldDoesNotExist:
+        if not source.endswith('_set'):
+            return
+        related_field = model_class._meta.get_field(source[:-len('_set')])
+
+    related_model = related_field.related_model._meta.concrete_model
+    if _is_generic_relation(related_field):
+        content_type = _get_content_type(model_class)
+        key = (related_field.object_id_field_name, (
+            (related_field.content_type_field_name, content_type.pk),))
+    elif isinstance(related_field, ForeignObjectRel) and \
+            not related_field.many_to_many:
+        key = (related_field.field.name, ())
+    else:
+        return
+    children[related_model][key].add(pk)
+
+
+def _lock_rows(items):
+    """
+    Locks rows of the instances, of everything referenced by pk in the
+    data of the whole trees and of the reverse related rows which can be
+    deleted, `items` is a list of `(serializer, instance, data)`. Every
+    model is locked with one `select_for_update()` query, models in the
+    order of their labels and rows in the order of pks, so concurrent saves
+    take the locks in the same order. Returns locked instances by `(model,
+    pk)`.
+    """
+    pks = defaultdict(set)
+    children = defaultdict(lambda: defaultdict(set))
+    for serializer, instance, data in items:
+        pk = None
+        if instance is not None:
+            pk = instance.pk
+            pks[instance._meta.concrete_model].add(str(pk))
+        _collect_pks(serializer, data, pks, children, pk)
+
+    row_locks = {}
+    model_classes = set(pks) | set(children)
+    for model_class in sorted(
+            model_classes, key=lambda model: model._meta.label):
+        condition = Q(pk__in=pks[model_class])
+        for (lookup, filters), parent_pks in children[model_class].items():
+            condition |= Q(**dict(filters, **{
+                '{0}__in'.format(lookup): parent_pks}))
+        for instance in model_class._default_manager.select_for_update(
+                ).filter(condition).order_by('pk'):
+            row_locks[(model_class, str(instance.pk))] = instance
+    return row_locks
+
+
+def _get_locked_instance(row_locks, instance):
+    # The save continues from the locked row, `instance` can be stale
+    if instance is None:
+        return None
+    return row_locks.get(
+        (instance._meta.concrete_model, str(instance.pk)), instance)
+
+
+def _is_locking_rows(serializer):
+    return getattr(getattr(serializer, 'Meta', None), 'lock_rows', False)
+
+
+class BaseNestedModelSerializer(BatchSaveMixin):
+    default_error_messages = {
+        'tree_max_depth': _(
+            "Tree depth exceeds the limit of {max_depth}."),
+        'tree_max_nodes': _(
+            "Number of tree nodes exceeds the limit of {max_nodes}."),
+        'delta_unknown_operations': _(
+            "Unknown operations: {operations}."),
+        'delta_not_a_list': _(
+            'Expected a list of items but got type "{input_type}".'),
+        'delta_invalid_item': _(
+            'Expected a dictionary of items but got type "{input_type}".'),
+        'delta_invalid_pk': _(
+            'Incorrect type. Expected pk value, received {data_type}.'),
+        'delta_missing_pk': _("This field is required."),
+        'delta_not_ordered': _(
+            "Children of this field can't be moved, it is not ordered."),
+        'delta_does_not_exist': _(
+            'Invalid pk "{pk}" - object does not exist.'),
+        'delta_duplicate_pk': _('Duplicate pk "{pk}".'),
+        'delta_conflicting_pk': _(
+            'Pk "{pk}" is referenced by more than one operation.'),
+        'delta_duplicate_position': _(
+            "Position {position} is given to more than one child."),
+        'delta_position_taken': _(
+            "Position {position} is taken by a child which isn't moved."),
+        'delta_on_create': _(
+            "Operations can be applied only to an existing instance."),
+        'nested_errors_truncated': _(
+            "Validation stopped after {max_errors} invalid items."),
+        'payload_too_large': _(
+            "Payload exceeds the limit of {limit} {name} ({value})."),
+    }
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        # inject the default into list_serializer_class (if not present)
+        meta = getattr(cls, 'Meta', None)
+        if meta is not None and \
+                getattr(meta, 'list_serializer_class', None) is None:
+            setattr(meta, 'list_serializer_class', NestedListSerializer)
+        return super(BaseNestedModelSerializer, cls).many_init(*args, **kwargs)
+
+    def get_fields(self):
+        fields = super(BaseNestedModelSerializer, self).get_fields()
+        tree_field = self._get_tree_field_name()
+        if tree_field is not None and tree_field not in self._declared_fields:
+            # A serializer can't refer to itself in its class body
+            fields[tree_field] = self.__class__(many=True, required=False)
+        for field_name, field in fields.items():
+            if type(field) is serializers.ListSerializer and \
+                    isinstance(field.child, serializers.ModelSerializer):
+                # Children of plain serializers are validated by the nested
+                # list too
+                fields[field_name] = NestedListSerializer(
+                    *field._args, **copy.deepcopy(field._kwargs))
+        return fields
+
+    def _get_tree_field_name(self):
+        return getattr(getattr(self, 'Meta', None), 'tree_field', None)
+
+    def _is_tree_child(self):
+        parent = getattr(self, 'parent', None)
+        return isinstance(parent, serializers.ListSerializer) and \
+            parent.field_name == self._get_tree_field_name() and \
+            isinstance(parent.parent, self.__class__)
+
+    def _validate_tree_limits(self, data):
+        # Limits are checked before the recursive validation of the tree
+        tree_field = self._get_tree_field_name()
+        if tree_field is None or self._is_tree_child():
+            return
+
+        max_depth = getattr(self.Meta, 'tree_max_depth', 32)
+        max_nodes = getattr(self.Meta, 'tree_max_nodes', 10000)
+        depth = 0
+        nodes = 1
+        level = [data]
+        while level:
+            level = [
+                child for node in level if isinstance(node, Mapping)
+                for child in (node.get(tree_field) or [])
+                if isinstance(node.get(tree_field), list)
+            ]
+            if not level:
+                break
+            depth += 1
+            nodes += len(level)
+            if max_depth is not None and depth > max_depth:
+                raise ValidationError({tree_field: [
+                    self.error_messages['tree_max_depth'].format(
+                        max_depth=max_depth),
+                ]}, code='tree_max_depth')
+            if max_nodes is not None and nodes > max_nodes:
+                raise ValidationError({tree_field: [
+                    self.error_messages['tree_max_nodes'].format(
+                        max_nodes=max_nodes),
+                ]}, code='tree_max_nodes')
+
+    def to_internal_value(self, data):
+        self._validate_tree_limits(data)
+        # Nested lists build the caches of their related fields on validation
+        self._related_field_caches = {}
+        return super(BaseNestedModelSerializer, self).to_internal_value(data)
+
+    def run_validation(self, data=empty):
+        self._admit_payload(data)
+        # The whole subtree of an instance is skipped if its content hash
+        # is the same
+        self._content_unchanged = _is_content_unchanged(
+            self, self.instance, data)
+        if self._content_unchanged:
+            return OrderedDict()
+        return super(BaseNestedModelSerializer, self).run_validation(data)
+
+    def estimate_cost(self, data, limits=None, many=False):
+        """
+        Walks the raw `data` along the nested serializers without validating
+        it and returns `PayloadCost`. Every root costs a query and every
+        nested field a query to fetch existing children, one per write
+        strategy and one to delete missing children, plus a query per child
+        if it's saved row by row. With `many` the data is a list of roots.
+        The walk stops once one of `limits` is exceeded.
+        """
+        items = [data]
+        if many:
+            items = [item for item in data if isinstance(item, Mapping)] \
+                if isinstance(data, list) else []
+        cost = PayloadCost()
+        cost.queries = len(items)
+        level = [(self, items)]
+        while level:
+            cost.levels.append(sum(len(items) for _, items in level))
+            if limits and cost.get_exceeded_limits(limits):
+                break
+
+            next_level = []
+            for serializer, items in level:
+                if not isinstance(serializer, BaseNestedModelSerializer):
+                    continue
+                for field_name, field in serializer.fields.items():
+                    if field.read_only or \
+                            not isinstance(field, serializers.BaseSerializer):
+                        continue
+                    many = isinstance(field, serializers.ListSerializer)
+                    child = field.child if many else field
+                    if not isinstance(child, serializers.ModelSerializer):
+                        continue
+                    children = serializer._get_payload_children(
+                        field_name, many, items)
+                    if not children:
+                        continue
+                    strategy = serializer._get_write_strategy(
+                        child, len(children))
+                    cost.queries += 3
+                    if strategy.name == 'per_row':
+                        cost.queries += len(children)
+                    next_level.append((child, children))
+            level = next_level
+        return cost
+
+    def _get_payload_children(self, field_name, many, items):
+        children = []
+        for item in items:
+            value = item.get(field_name) if isinstance(item, Mapping) \
+                else None
+            if many and isinstance(value, Mapping) and \
+                    field_name in self._get_delta_field_names():
+                value = [
+                    child for op in ('add', 'update')
+                    if isinstance(value.get(op), list)
+                    for child in value[op]
+                ]
+            if many and isinstance(value, list):
+                children.extend(
+                    child for child in value if isinstance(child, Mapping))
+            elif not many and isinstance(value, Mapping):
+                children.append(value)
+        return children
+
+    def _admit_payload(self, data, many=False):
+        # Only the root is estimated before any validation, a root list is
+        # estimated as a whole by `NestedListSerializer`
+        limits = getattr(self.Meta, 'payload_limits', None)
+        if not limits or getattr(self, '_is_nested_level', False) or \
+                data is empty:
+            return
+        parent = getattr(self, 'parent', None)
+        if not many and parent is not None and not (
+                isinstance(parent, serializers.ListSerializer) and
+                not isinstance(parent, NestedListSerializer) and
+                parent.parent is None):
+            return
+
+        self.payload_cost = self.estimate_cost(
+            data, limits=limits, many=many)
+        exceeded = self.payload_cost.get_exceeded_limits(limits)
+        if exceeded:
+            self.handle_exceeded_payload_limits(self.payload_cost, exceeded)
+
+    def handle_exceeded_payload_limits(self, cost, exceeded):
+        """
+        Called before validation if the payload exceeds `Meta.payload_limits`.
+        With `Meta.payload_limit_action = 'fail_fast'` nested lists stop
+        validating at the first invalid child, otherwise (`'reject'`) the
+        payload is rejected.
+        """
+        if getattr(self.Meta, 'payload_limit_action', 'reject') == \
+                'fail_fast':
+            # Items of a root list share the setting
+            self.root._fail_fast = True
+            return
+        raise ValidationError({api_settings.NON_FIELD_ERRORS_KEY: [
+            self.error_messages['payload_too_large'].format(
+                name=name, value=value, limit=limit)
+            for name, value, limit in exceeded
+        ]}, code='payload_too_large')
+
+    def _get_error_budget(self, field_name):
+        if getattr(self.root, '_fail_fast', False):
+            return 1
+        # `Meta.nested_error_budget` is a number of invalid items for all
+        # nested lists or a dict of them by field name
+        budget = getattr(self.Meta, 'nested_error_budget', None)
+        if isinstance(budget, Mapping):
+            return budget.get(field_name)
+        return budget
+
+    def _truncate_item_errors(self, field_name, item_errors, truncated=False):
+        """
+        Returns errors of at most the error budget of `field_name` invalid
+        items by index, with a marker in `non_field_errors` if items were
+        left out or not validated. `item_errors` is a list of item errors.
+        """
+        max_errors = self._get_error_budget(field_name)
+        errors = OrderedDict()
+        for index, detail in enumerate(item_errors):
+            if not detail:
+                continue
+            if len(errors) >= max_errors:
+                truncated = True
+                break
+            errors[index] = detail
+        if truncated:
+            errors[api_settings.NON_FIELD_ERRORS_KEY] = [
+                self.error_messages['nested_errors_truncated'].format(
+                    max_errors=max_errors)]
+        return errors
+
+    def _get_delta_field_names(self):
+        return getattr(getattr(self, 'Meta', None), 'nested_delta_fields', ())
+
+    def _validate_delta(self, field_name, field, data):
+        """
+        Validates operations of a nested list field sent as a mapping and
+        returns `NestedDelta`. Children to add are validated as usual,
+        children to update are validated against their instances on save.
+        """
+        assert isinstance(field, serializers.ListSerializer) and \
+            isinstance(field.child, serializers.ModelSerializer), (
+                '`{0}` is not a nested list field.'.format(field_name))
+
+        unknown = [op for op in data if op not in NestedDelta.operations]
+        if unknown:
+            raise ValidationError([
+                self.error_messages['delta_unknown_operations'].format(
+                    operations=', '.join(sorted(unknown))),
+            ], code='delta_unknown_operations')
+
+        errors = OrderedDict()
+        for op in NestedDelta.operations:
+            items = data.get(op, [])
+            if not isinstance(items, list):
+                errors[op] = [self.error_messages['delta_not_a_list'].format(
+                    input_type=type(items).__name__)]
+                continue
+            op_errors = OrderedDict()
+            for index, item in enumerate(items):
+                detail = self._validate_delta_item(field_name, field, op, item)
+                if detail:
+                    op_errors[index] = detail
+            if op_errors:
+                errors[op] = op_errors
+        if errors:
+            raise ValidationError(errors)
+
+        model_class = field.child.Meta.model
+        delta = NestedDelta(
+            add=data.get('add', []),
+            update=data.get('update', []),
+            remove=[
+                self._normalize_pk(model_class, pk)
+                for pk in data.get('remove', [])
+            ],
+            move=[
+                (self._normalize_pk(
+                    model_class, self._get_related_pk(item, model_class)),
+                 int(item['position']))
+                for item in data.get('move', [])
+            ],
+        )
+        errors = self._validate_delta_references(model_class, delta)
+        if errors:
+            raise ValidationError(errors)
+        return delta
+
+    @staticmethod
+    def _normalize_pk(model_class, pk):
+        # Different representations of a pk, e.g. 1 and "1", are the same
+        try:
+            return str(model_class._meta.pk.to_python(pk))
+        except DjangoValidationError:
+            return str(pk)
+
+    def _validate_delta_references(self, model_class, delta):
+        # Every child can be referenced only once by all operations and
+        # moved children can't share a position
+        pks = OrderedDict([
+            ('update', [
+                self._normalize_pk(
+                    model_class, self._get_related_pk(item, model_class))
+                for item in delta.update
+            ]),
+            ('remove', delta.remove),
+            ('move', [pk for pk, _ in delta.move]),
+        ])
+        errors = OrderedDict()
+        for op, op_pks in pks.items():
+            referenced = set(
+                pk for other_op, other_pks in pks.items() if other_op != op
+                for pk in other_pks)
+            seen = set()
+            op_errors = OrderedDict()
+            for index, pk in enumerate(op_pks):
+                if pk in seen:
+                    message = self.error_messages['delta_duplicate_pk']
+                elif pk in referenced:
+                    message = self.error_messages['delta_conflicting_pk']
+                else:
+                    seen.add(pk)
+                    continue
+                message = message.format(pk=pk)
+                op_errors[index] = [message] if op == 'remove' \
+                    else {'pk': [message]}
+            if op_errors:
+                errors[op] = op_errors
+
+        positions = set()
+        for index, (pk, position) in enumerate(delta.move):
+            if position not in positions:
+                positions.add(position)
+                continue
+            errors.setdefault('move', OrderedDict()).setdefault(
+                index, {})['position'] = [
+                    self.error_messages['delta_duplicate_position'].format(
+                        position=position)]
+        return errors
+
+    def _validate_delta_item(self, field_name, field, op, item):
+        # Returns the errors of one item of `op`
+        if op == 'remove':
+            if isinstance(item, bool) or not isinstance(item, (str, int)):
+                return [self.error_messages['delta_invalid_pk'].format(
+                    data_type=type(item).__name__)]
+            return None
+
+        if not isinstance(item, Mapping):
+            return {api_settings.NON_FIELD_ERRORS_KEY: [
+                self.error_messages['delta_invalid_item'].format(
+                    input_type=type(item).__name__)]}
+        if op == 'add':
+            try:
+                field.child.run_validation(item)
+            except ValidationError as exc:
+                return exc.detail
+            return None
+
+        if self._get_related_pk(item, field.child.Meta.model) is None:
+            return {'pk': [self.error_messages['delta_missing_pk']]}
+        if op == 'move':
+            position_field_name = self._get_position_field_name(field_name)
+            if position_field_name is None:
+                return {api_settings.NON_FIELD_ERRORS_KEY: [
+                    self.error_messages['delta_not_ordered']]}
+            position_field = serializers.IntegerField(
+                min_value=self._get_position_lower_bound(
+                    field.child.Meta.model._meta.get_field(
+                        position_field_name)))
+            try:
+                position_field.run_validation(item.get('position', empty))
+            except ValidationError as exc:
+                return {'position': exc.detail}
+        return None
+
+    def _get_validation_memo(self):
+        # One memo is shared by the whole serializer tree
+        memo = getattr(self, '_shared_validation_memo', None) or \
+            getattr(self.root, '_validation_memo', None)
+        if memo is None:
+            memo = ValidationMemo()
+        self.root._validation_memo = memo
+        return memo
+
+    def _build_related_field_caches(self, field, related_data):
+        # Resolve plain related fields of nested list items with one query
+        # per field instead of one query per item
+        caches = OrderedDict()
+        if field.read_only or \
+                not isinstance(field, serializers.ListSerializer) or \
+                not isinstance(field.child, serializers.ModelSerializer) or \
+                not isinstance(related_data, list):
+            return caches
+
+        for sub_field_name, sub_field in field.child.fields.items():
+            if not RelatedFieldCache.is_supported(sub_field):
+                continue
+            values = [
+                d.get(sub_field_name) for d in related_data
+                if isinstance(d, Mapping)
+            ]
+            caches[sub_field_name] = RelatedFieldCache(sub_field, values)
+
+        return caches
+
+    def _get_related_field_caches(self, field_name, related_data):
+        caches = getattr(self, '_related_field_caches', {})
+        if field_name not in caches:
+            caches[field_name] = self._build_related_field_caches(
+                self.fields[field_name], related_data)
+            self._related_field_caches = caches
+        return caches[field_name]
+
     def _extract_relations(self, validated_data):
         reverse_relations = OrderedDict()
         relations = OrderedDict()
@@ -34,7 +1061,12 @@ class BaseNestedModelSerializer(serializers.ModelSerializer):
                     # Skip field if field is not required
                     continue
 
-                validated_data.pop(field.source)
+                value = validated_data.pop(field.source)
+                if isinstance(value, NestedDelta):
+                    # Operations are applied apart from the whole lists
+                    self._reverse_relation_deltas[field_name] = (
+                        related_field, field.child, field.source, value)
+                    continue
 
                 reverse_relations[field_name] = (
                     related_field, field.child, field.source)
@@ -80,20 +1112,113 @@ class BaseNestedModelSerializer(serializers.ModelSerializer):
             return related_field.field, False
         return related_field, True
 
-    def _get_serializer_for_field(self, field, **kwargs):
+    def _get_serializer_for_field(self, field, partial=None, **kwargs):
+        if not kwargs.get('instance'):
+            partial = False
+        elif partial is None:
+            partial = self.partial
         kwargs.update({
             'context': self.context,
-            'partial': self.partial if kwargs.get('instance') else False,
+            'partial': partial,
         })
-        return field.__class__(**kwargs)
+        serializer = field.__class__(**kwargs)
+        serializer._is_nested_level = True
+        serializer._shared_identity_map = getattr(self, '_identity_map', None)
+        serializer._shared_row_locks = getattr(self, '_row_locks', None)
+        serializer._shared_write_strategies = getattr(
+            self, '_write_strategies', None)
+        serializer._shared_validation_memo = self._get_validation_memo()
+        return serializer
+
+    def _save_serializer_once(self, serializer, pk, save_kwargs):
+        # Repeated references to the same object are saved only once
+        model_class = serializer.Meta.model
+        identity_data = dict(serializer.validated_data, **save_kwargs)
+        if pk:
+            instance = self._identity_map.get(model_class, pk, identity_data)
+            if instance is not None:
+                return instance, OrderedDict([
+                    ('pk', instance.pk), ('status', 'unchanged')])
+
+        status = self._get_write_status(
+            serializer.instance, serializer.validated_data)
+        instance = serializer.save(**save_kwargs)
+        self._identity_map.add(
+            model_class, instance.pk, instance, identity_data)
+
+        if isinstance(serializer, BaseNestedModelSerializer):
+            return instance, serializer.write_result
+        if status != 'unchanged':
+            _record_saved(model_class, [instance], status == 'created')
+        return instance, OrderedDict([('pk', instance.pk), ('status', status)])
+
+    def _get_write_status(self, instance, validated_data):
+        if instance is None:
+            return 'created'
+        if self._get_changed_fields(instance, validated_data):
+            return 'updated'
+        return 'unchanged'
+
+    def _get_changed_fields(self, instance, validated_data):
+        changed_fields = []
+        for attr, value in validated_data.items():
+            try:
+                model_field = instance._meta.get_field(attr)
+            except FieldDoesNotExist:
+                continue
+            # Changes of nested relations are reported by their own nodes
+            if not model_field.concrete or model_field.many_to_many:
+                continue
+            if isinstance(value, Model):
+                value = value.pk
+            if getattr(instance, model_field.attname) != value:
+                changed_fields.append(attr)
+        return changed_fields
+
+    @property
+    def write_result(self):
+        """
+        Compact result of the last save: the tree of nested fields with
+        the pk and the status (`created`, `updated`, `unchanged` or
+        `deleted`) of every saved node.
+        """
+        result = OrderedDict([
+            ('pk', self.instance.pk),
+            ('status', self._write_status),
+        ])
+        result.update(self._write_results)
+        if getattr(self, '_deferred_job', None) is not None:
+            result['deferred_job'] = self._deferred_job.id
+        return result
+
+    @property
+    def data(self):
+        if getattr(self.Meta, 'slim_response', False) and \
+                hasattr(self, '_write_status'):
+            return ReturnDict(self.write_result, serializer=self)
+        data = super(BaseNestedModelSerializer, self).data
+        if getattr(self, '_deferred_job', None) is not None:
+            data['deferred_job'] = self._deferred_job.id
+        return data
 
     def _get_generic_lookup(self, instance, related_field):
         return {
             related_field.content_type_field_name:
-                ContentType.objects.get_for_model(instance),
+                _get_content_type(instance),
             related_field.object_id_field_name: instance.pk,
         }
 
+    def _get_reverse_queryset(self, instance, related_field, field,
+                              field_source):
+        # Children of one reverse relation of `instance`
+        model_class = field.Meta.model
+        if related_field.many_to_many:
+            return getattr(instance, field_source).all()
+        if _is_generic_relation(related_field):
+            return model_class.objects.filter(
+                **self._get_generic_lookup(instance, related_field))
+        return model_class.objects.filter(**{related_field.name: instance})
+
     def _get_related_pk(self, data, model_class):
         pk = data.get('pk') or data.get(model_class._meta.pk.attname)
 
@@ -116,111 +1241,513 @@ class BaseNestedModelSerializer(serializers.ModelSerializer):
         model_class = field.Meta.model
         pk_list = self._extract_related_pks(field, related_data)
 
-        instances = {
-            str(related_instance.pk): related_instance
-            for related_instance in model_class.objects.filter(
-                pk__in=pk_list
-            )
-        }
+        instances = self._identity_map.get_many(model_class, pk_list)
+        pk_list = [pk for pk in pk_list if pk not in instances]
+        row_locks = getattr(self, '_row_locks', None)
+        if row_locks is not None:
+            # Rows are locked before the writes
+            concrete_model = model_class._meta.concrete_model
+            for pk in pk_list:
+                if (concrete_model, pk) in row_locks:
+                    instances[pk] = row_locks[(concrete_model, pk)]
+            pk_list = [pk for pk in pk_list if pk not in instances]
+        if pk_list:
+            queryset = model_class.objects.all()
+            if row_locks is not None:
+                queryset = queryset.select_for_update().order_by('pk')
+            instances.update({
+                str(related_instance.pk): related_instance
+                for related_instance in queryset.filter(pk__in=pk_list)
+            })
 
         return instances
 
     def update_or_create_reverse_relations(self, instance, reverse_relations):
         # Update or create reverse relations:
         # many-to-one, many-to-many, reversed one-to-one
-        for field_name, (related_field, field, field_source) in \
-                reverse_relations.items():
-
-            # Skip processing for empty data or not-specified field.
-            # The field can be defined in validated_data but isn't defined
-            # in initial_data (for example, if multipart form data used)
-            related_data = self.get_initial().get(field_name, None)
-            if related_data is None:
-                continue
+        errors = self._update_or_create_reverse_relations_in_batch(
+            [(self, instance, reverse_relations)])
+        if errors[0]:
+            raise ValidationError(errors[0])
 
-            if related_field.one_to_one:
-                # If an object already exists, fill in the pk so
-                # we don't try to duplicate it
-                pk_name = field.Meta.model._meta.pk.attname
-                if pk_name not in related_data and 'pk' in related_data:
-                    pk_name = 'pk'
-                if pk_name not in related_data:
-                    related_instance = getattr(instance, field_source, None)
-                    if related_instance:
-                        related_data[pk_name] = related_instance.pk
-
-                # Expand to array of one item for one-to-one for uniformity
-                related_data = [related_data]
-
-            instances = self._prefetch_related_instances(field, related_data)
-
-            save_kwargs = self._get_save_kwargs(field_name)
-            if isinstance(related_field, GenericRelation):
-                save_kwargs.update(
-                    self._get_generic_lookup(instance, related_field),
-                )
-            elif not related_field.many_to_many:
-                save_kwargs[related_field.name] = instance
-
-            new_related_instances = []
-            errors = []
-            for data in related_data:
-                obj = instances.get(
-                    self._get_related_pk(data, field.Meta.model)
-                )
-                serializer = self._get_serializer_for_field(
+    def _validate_related_in_batch(self, field_name, field, items, instances,
+                                   partial, saved, write_results, errors):
+        """
+        Validates nested data of one field for many parents before it's
+        saved by `_save_related_in_batch`. Unchanged subtrees are put to
+        `saved` and `write_results`, errors to `errors`. Returns valid
+        children as `(index, position, serializer, pk, save_kwargs)`.
+        """
+        model_class = field.Meta.model
+        children = []
+        async_validation = AsyncValidation(field) \
+            if AsyncValidation.is_enabled(field) else None
+        for index, (parent, related_data, save_kwargs) in enumerate(items):
+            nested_list = parent.fields[field_name]
+            if isinstance(nested_list, NestedListSerializer):
+                # Unchanged children are handled here, they aren't validated
+                nested_list.start_child_validation(
+                    related_data, instances={},
+                    async_validation=async_validation)
+                max_errors = nested_list.get_error_budget()
+            else:
+                nested_list = None
+                max_errors = parent._get_error_budget(field_name)
+            error_count = 0
+            for position, data in enumerate(related_data):
+                if max_errors and error_count >= max_errors:
+                    # The error budget is spent, `None` marks children
+                    # which weren't validated
+                    errors[index][position] = None
+                    continue
+                pk = parent._get_related_pk(data, model_class)
+                instance = instances.get(pk)
+                if _is_content_unchanged(field, instance, data) and \
+                        not self._get_changed_fields(instance, save_kwargs):
+                    # The whole subtree is unchanged
+                    saved[index][position] = instance
+                    write_results[index][position] = OrderedDict([
+                        ('pk', instance.pk), ('status', 'unchanged')])
+                    continue
+                serializer = parent._get_serializer_for_field(
                     field,
-                    instance=obj,
+                    instance=instances.get(pk),
                     data=data,
+                    partial=partial,
                 )
                 try:
-                    serializer.is_valid(raise_exception=True)
-                    related_instance = serializer.save(**save_kwargs)
-                    data['pk'] = related_instance.pk
-                    new_related_instances.append(related_instance)
-                    errors.append({})
+                    if nested_list is None:
+                        validated_data = serializer.run_validation(data)
+                    else:
+                        validated_data = nested_list.run_child_validation(
+                            serializer, data, (index, position))
                 except ValidationError as exc:
-                    errors.append(exc.detail)
+                    serializer._validated_data = {}
+                    serializer._errors = exc.detail
+                    errors[index][position] = exc.detail
+                    error_count += 1
+                    continue
+                serializer._validated_data = validated_data
+                serializer._errors = {}
+                children.append((index, position, serializer, pk, save_kwargs))
+
+        if async_validation is not None:
+            for (index, position), detail in async_validation.run().items():
+                errors[index][position] = AsyncValidation.merge_errors(
+                    errors[index][position], detail)
+        return children
+
+    def _get_position_field_name(self, field_name):
+        nested_ordering = getattr(self.Meta, 'nested_ordering', {})
+        return nested_ordering.get(field_name)
+
+    @staticmethod
+    def _get_position_lower_bound(position_field):
+        if isinstance(position_field, (PositiveIntegerField,
+                                       PositiveSmallIntegerField)):
+            return 0
+        return None
 
-            if any(errors):
-                if related_field.one_to_one:
-                    raise ValidationError({field_name: errors[0]})
-                else:
-                    raise ValidationError({field_name: errors})
+    @classmethod
+    def _can_save_in_batch(cls):
+        # Nested children are saved together with their siblings unless
+        # they customize the saving, are trees, take operations or defer
+        # fields
+        meta = getattr(cls, 'Meta', None)
+        if getattr(meta, 'tree_field', None) or \
+                getattr(meta, 'nested_delta_fields', None) or \
+                getattr(meta, 'deferred_fields', None):
+            return False
+        for name in ('save', 'create', 'update',
+                     'update_or_create_direct_relations',
+                     'update_or_create_reverse_relations',
+                     'delete_reverse_relations_if_need'):
+            if _get_method_owner(cls, name) not in (
+                    serializers.BaseSerializer, serializers.Serializer,
+                    serializers.ModelSerializer, BaseNestedModelSerializer,
+                    NestedCreateMixin, NestedUpdateMixin):
+                return False
+        return True
+
+    def _can_write_tree(self):
+        # Tree nodes are written without their serializers, so it's possible
+        # only for plain nodes
+        if self._get_tree_field_name() is None:
+            return False
+        for name in ('create', 'update'):
+            if _get_method_owner(type(self), name) not in (
+                    serializers.ModelSerializer, NestedCreateMixin,
+                    NestedUpdateMixin):
+                return False
+        for field_name, field in self.fields.items():
+            if field_name == self._get_tree_field_name() or field.read_only:
+                continue
+            if isinstance(field, (serializers.BaseSerializer,
+                                  ManyRelatedField)):
+                return False
+        return True
+
+    def _extract_tree(self, validated_data):
+        if not self._can_write_tree():
+            return None
+        field = self.fields[self._get_tree_field_name()]
+        return validated_data.pop(field.source, None)
+
+    def _save_tree(self, instance, validated_children, delete_missing):
+        """
+        Saves descendants of `instance` breadth-first: every depth level is
+        fetched with one query and saved with one bulk insert and one bulk
+        update. With `delete_missing` subtrees missing in data are deleted
+        with one query.
+        """
+        tree_field = self._get_tree_field_name()
+        field = self.fields[tree_field]
+        parent_field, _ = self._get_related_field(field)
+        model_class = self.Meta.model
+        manager = model_class._default_manager
+        can_bulk_save = _get_model_bulk_save_blocker(model_class) is None
+        save_kwargs = self._get_save_kwargs(tree_field)
+
+        self._write_results[tree_field] = []
+        # Nodes with the tree field in data, their saved children and
+        # results
+        parents = OrderedDict([(
+            str(instance.pk),
+            (instance, [], self._write_results[tree_field]),
+        )])
+        level = [(
+            instance, self.get_initial()[tree_field], validated_children,
+            self._write_results[tree_field],
+        )]
+        seen_pks = set()
+        while level:
+            nodes = [
+                (parent, data, attrs, results)
+                for parent, related_data, children, results in level
+                for data, attrs in zip(related_data, children)
+            ]
+            pks = [
+                self._get_related_pk(data, model_class)
+                for _, data, _, _ in nodes
+            ]
+            instances = {
+                str(obj.pk): obj
+                for obj in manager.filter(pk__in=[pk for pk in pks if pk])
+            } if any(pks) else {}
+
+            new_instances = []
+            updated_instances = []
+            update_fields = set()
+            saved = []
+            for (parent, data, attrs, results), pk in zip(nodes, pks):
+                attrs = dict(attrs, **save_kwargs)
+                children = attrs.pop(field.source, None)
+                attrs[parent_field.name] = parent
+                node = instances.get(pk)
+                status = self._get_write_status(node, attrs)
+                if node is None:
+                    node = model_class(**attrs)
+                    new_instances.append(node)
+                elif status == 'updated':
+                    for attr, value in attrs.items():
+                        setattr(node, attr, value)
+                    updated_instances.append(node)
+                    update_fields.update(attrs)
+                saved.append((parent, node, data, children, results, status))
+
+            if can_bulk_save and all(
+                    _can_bulk_write(model_class, None, {
+                        model_class._meta.pk.name: node.pk})
+                    for node in new_instances):
+                _bulk_save(model_class, new_instances, updated_instances,
+                           update_fields)
+            else:
+                for node in new_instances + updated_instances:
+                    node.save()
+
+            level = []
+            for parent, node, data, children, results, status in saved:
+                data['pk'] = node.pk
+                seen_pks.add(str(node.pk))
+                parents[str(parent.pk)][1].append(node)
+                result = OrderedDict([('pk', node.pk), ('status', status)])
+                results.append(result)
+                if children is not None:
+                    result[tree_field] = []
+                    parents[str(node.pk)] = (node, [], result[tree_field])
+                    level.append((
+                        node, data[tree_field], children, result[tree_field]))
+                elif status == 'created':
+                    _set_prefetched_objects(node, field.source, [])
+
+        # Children of a node are known if the node has the tree field
+        for node, children, results in parents.values():
+            _set_prefetched_objects(node, field.source, children)
+
+        if delete_missing:
+            self._delete_missing_tree_nodes(
+                parents, parent_field, seen_pks)
+
+    def _delete_missing_tree_nodes(self, parents, parent_field, seen_pks):
+        model_class = self.Meta.model
+        removed = list(model_class._default_manager.filter(**{
+            '{0}__in'.format(parent_field.name): [
+                node for node, _, _ in parents.values()],
+        }).exclude(pk__in=seen_pks).values_list('pk', parent_field.attname))
+        if not removed:
+            return
+
+        try:
+            # Deleting a node deletes its whole subtree
+            model_class._default_manager.filter(
+                pk__in=[pk for pk, _ in removed]).delete()
+            _record_deleted(model_class, [pk for pk, _ in removed])
+        except ProtectedError as e:
+            instances = e.args[1]
+            self.fail('cannot_delete_protected', instances=", ".join([
+                str(instance) for instance in instances]))
+
+        for pk, parent_pk in removed:
+            parents[str(parent_pk)][2].append(
+                OrderedDict([('pk', pk), ('status', 'deleted')]))
+
+    def _defer_reverse_relations(self, reverse_relations):
+        """
+        Removes fields of `Meta.deferred_fields` from `reverse_relations`
+        and returns their raw data. The deferred job saves them itself.
+        """
+        deferred_data = OrderedDict()
+        if getattr(self, '_is_deferred_job', False):
+            return deferred_data
+        for field_name in getattr(self.Meta, 'deferred_fields', ()):
+            if field_name in reverse_relations:
+                del reverse_relations[field_name]
+                deferred_data[field_name] = self.initial_data[field_name]
+        return deferred_data
+
+    def schedule_deferred_job(self, instance, deferred_data):
+        """
+        Hands `deferred_data` of the saved `instance` to
+        `Meta.deferred_backend` (a shared `ThreadPoolBackend` by default)
+        once the transaction is committed. The job id is reported by
+        `data` and `write_result` as `deferred_job`.
+        """
+        if not deferred_data:
+            return
+
+        job = DeferredJob(type(self), instance.pk, deferred_data)
+        backend = getattr(self.Meta, 'deferred_backend', None) or \
+            get_default_backend()
+        transaction.on_commit(
+            lambda: backend.submit(job), using=_get_atomic_using(self))
+        self._deferred_job = job
 
-            if related_field.many_to_many:
-                # Add m2m instances to through model via add
-                m2m_manager = getattr(instance, field_source)
-                m2m_manager.add(*new_related_instances)
+    def prime_relation_caches(self, instance):
+        """
+        Fills relation caches of `instance` with the saved nested instances
+        (in payload order), so rendering the response needs no queries.
+        Direct relations are cached by Django when they are assigned.
+        """
+        saved_reverse_relations = getattr(
+            self, '_saved_reverse_relations', {})
+        for related_field, field_source, related_instances in \
+                saved_reverse_relations.values():
+            if related_field.one_to_one:
+                related_field.remote_field.set_cached_value(
+                    instance, related_instances[0])
+                continue
+
+            _set_prefetched_objects(instance, field_source, related_instances)
+
+    def save_reverse_relation_stream(self, field_name, items, instance=None,
+                                     batch_size=1000, delete_missing=None,
+                                     **kwargs):
+        """
+        Saves a huge list of children of one reverse relation field without
+        building the whole list. `items` is an iterable of child dicts, they
+        are validated and saved against the saved parent `instance` in
+        batches of `batch_size`, `kwargs` are passed to children's `save`.
+
+        With `delete_missing` (by default in update mode) children which
+        weren't in `items` are deleted at the end. Batches saved before an
+        error aren't rolled back, use `transaction.atomic()` if needed.
+        Returns the number of children per status.
+
+        Example of usage:
+        ```
+        serializer = ProfileSerializer(instance=profile)
+        serializer.save_reverse_relation_stream(
+            'avatars', ijson.items(request, 'avatars.item'))
+        ```
+        """
+        if instance is None:
+            instance = self.instance
+        assert instance is not None and instance.pk is not None, (
+            'Children can be streamed only to a saved instance.')
+        if delete_missing is None:
+            delete_missing = self.instance is not None
+        assert not delete_missing or isinstance(self, NestedUpdateMixin), (
+            'Deleting missing children requires `NestedUpdateMixin`.')
+
+        field = self.fields[field_name]
+        related_field, direct = self._get_related_field(field)
+        assert isinstance(field, serializers.ListSerializer) and \
+            isinstance(field.child, serializers.ModelSerializer) and \
+            (related_field.many_to_many or not direct), (
+                '`{0}` is not a nested reverse relation field.'.format(
+                    field_name))
+
+        save_kwargs = dict(kwargs)
+        if _is_generic_relation(related_field):
+            save_kwargs.update(
+                self._get_generic_lookup(instance, related_field))
+        elif not related_field.many_to_many:
+            save_kwargs[related_field.name] = instance
+
+        counts = OrderedDict([
+            ('created', 0), ('updated', 0), ('unchanged', 0), ('deleted', 0)])
+        seen_pks = set()
+        offset = 0
+        items = iter(items)
+        try:
+            while True:
+                batch = list(itertools.islice(items, batch_size))
+                if not batch:
+                    break
+                saved = self._save_stream_batch(
+                    field_name, field.child, batch, offset, save_kwargs,
+                    counts)
+                if related_field.many_to_many:
+                    getattr(instance, field.source).add(*saved)
+                seen_pks.update(str(obj.pk) for obj in saved)
+                offset += len(batch)
+
+            if delete_missing:
+                counts['deleted'] = self._delete_missing_from_stream(
+                    instance, related_field, field, seen_pks, batch_size)
+        finally:
+            # Saved children aren't kept, so the relation cache is stale
+            getattr(instance, '_prefetched_objects_cache', {}).pop(
+                _get_prefetch_cache_name(getattr(instance, field.source)),
+                None)
+        return counts
+
+    def _save_stream_batch(self, field_name, field, batch, offset,
+                           save_kwargs, counts):
+        # Caches are kept per batch, so memory doesn't grow with the stream
+        shared_validation_memo = getattr(self, '_shared_validation_memo', None)
+        related_field_caches = getattr(self, '_related_field_caches', {})
+        self._prepare_save({})
+        self._shared_validation_memo = ValidationMemo()
+        self._related_field_caches = {}
+        try:
+            saved, write_results, errors = self._save_related_in_batch(
+                field_name, field, [(self, batch, dict(save_kwargs))])
+        finally:
+            self._shared_validation_memo = shared_validation_memo
+            self._related_field_caches = related_field_caches
+
+        if any(errors[0]):
+            raise ValidationError({field_name: OrderedDict(
+                (offset + index, detail)
+                for index, detail in enumerate(errors[0]) if detail
+            )})
+        for write_result in write_results[0]:
+            counts[write_result['status']] += 1
+        return saved[0]
 
     def update_or_create_direct_relations(self, attrs, relations):
-        for field_name, (field, field_source) in relations.items():
-            obj = None
-            data = self.get_initial()[field_name]
-            model_class = field.Meta.model
-            pk = self._get_related_pk(data, model_class)
-            if pk:
-                obj = model_class.objects.filter(
-                    pk=pk,
-                ).first()
-            serializer = self._get_serializer_for_field(
-                field,
-                instance=obj,
-                data=data,
-            )
+        errors = self._update_or_create_direct_relations_in_batch(
+            [(self, attrs, relations)])
+        if errors[0]:
+            raise ValidationError(errors[0])
 
+    def save(self, **kwargs):
+        """
+        Saves the validated data, retrying with `Meta.retry_policy`. Only a
+        save which owns its transaction is retried, a failed statement
+        breaks an outer transaction. Every retry starts from the instance
+        and the related instances as they are in the database: the data is
+        validated again, so validators and their database lookups run once
+        per attempt.
+        """
+        retry_policy = getattr(self.Meta, 'retry_policy', None)
+        if retry_policy is None or not _is_atomic(self) or \
+                connections[_get_atomic_using(self)].in_atomic_block:
+            return _save_with_bulk_signals(
+                self, self._save_in_transaction, **kwargs)
+
+        # Data is modified during save, e.g. pks of the saved children
+        initial_data = _copy_containers(self.initial_data)
+        attempt = 1
+        while True:
             try:
-                serializer.is_valid(raise_exception=True)
-                attrs[field_source] = serializer.save(
-                    **self._get_save_kwargs(field_name)
-                )
-            except ValidationError as exc:
-                raise ValidationError({field_name: exc.detail})
+                return _save_with_bulk_signals(
+                    self, self._save_in_transaction, **kwargs)
+            except Exception as exc:
+                if not retry_policy.should_retry(exc, attempt):
+                    raise
+            retry_policy.sleep(retry_policy.get_delay(attempt))
+            self._prepare_retry(initial_data)
+            attempt += 1
+
+    def _prepare_retry(self, initial_data):
+        # The failed attempt is rolled back, but the instance was changed in
+        # memory and instances of the validated data can be out of date
+        if self.instance is not None:
+            self.instance.refresh_from_db()
+        self.initial_data = _copy_containers(initial_data)
+        del self._validated_data
+        self.is_valid(raise_exception=True)
+
+    def _save_in_transaction(self, **kwargs):
+        self._prepare_save(kwargs)
+        if getattr(self, '_content_unchanged', False) and not kwargs:
+            self._write_status = 'unchanged'
+            return self.instance
+
+        if not _is_atomic(self):
+            return self._save_nested(**kwargs)
+        using = _get_atomic_using(self)
+        if getattr(self, '_is_nested_level', False) and \
+                connections[using].in_atomic_block and \
+                not _get_atomic_savepoint(self):
+            # Nested levels join the transaction of the root serializer as
+            # is, their errors don't mark it for rollback and errors of the
+            # siblings are still collected
+            return self._save_nested(**kwargs)
+        with transaction.atomic(using=using):
+            return self._save_nested(**kwargs)
+
+    def _save_nested(self, **kwargs):
+        if self._row_locks is None and _is_locking_rows(self):
+            self._row_locks = _lock_rows(
+                [(self, self.instance, self.initial_data)])
+            self.instance = _get_locked_instance(
+                self._row_locks, self.instance)
+        instance = super(BaseNestedModelSerializer, self).save(**kwargs)
+        if _get_content_hash_field_name(self) is not None:
+            self._save_content_hashes(
+                self, [(instance, self.initial_data, self.partial)])
+            if not getattr(self, '_is_nested_level', False):
+                self._clear_parent_content_hashes([instance])
+        return instance
 
-    def save(self, **kwargs):
+    def _prepare_save(self, kwargs):
         self._save_kwargs = defaultdict(dict, kwargs)
-
-        return super(BaseNestedModelSerializer, self).save(**kwargs)
+        # Nested serializers share the identity map of the root serializer
+        self._identity_map = getattr(
+            self, '_shared_identity_map', None) or IdentityMap()
+        # Locked rows of the whole tree, `None` without `Meta.lock_rows`
+        self._row_locks = getattr(self, '_shared_row_locks', None)
+        self._write_results = OrderedDict()
+        # Write strategies of the whole tree
+        self._write_strategies = getattr(
+            self, '_shared_write_strategies', None)
+        if self._write_strategies is None:
+            self._write_strategies = OrderedDict()
+        self._reverse_relation_deltas = OrderedDict()
+        self._deferred_job = None
 
     def _get_save_kwargs(self, field_name):
         save_kwargs = self._save_kwargs[field_name]
@@ -237,7 +1764,15 @@ class NestedCreateMixin(BaseNestedModelSerializer):
     Adds nested create feature
     """
     def create(self, validated_data):
+        tree = self._extract_tree(validated_data)
         relations, reverse_relations = self._extract_relations(validated_data)
+        if self._reverse_relation_deltas:
+            raise ValidationError(OrderedDict(
+                (field_name, [self.error_messages['delta_on_create']])
+                for field_name in self._reverse_relation_deltas
+            ), code='delta_on_create')
+
+        deferred_data = self._defer_reverse_relations(reverse_relations)
 
         # Create or update direct relations (foreign key, one-to-one)
         self.update_or_create_direct_relations(
@@ -246,9 +1781,15 @@ class NestedCreateMixin(BaseNestedModelSerializer):
         )
 
         # Create instance
+        self._write_status = 'created'
         instance = super(NestedCreateMixin, self).create(validated_data)
+        _record_saved(self.Meta.model, [instance], True)
 
         self.update_or_create_reverse_relations(instance, reverse_relations)
+        self.schedule_deferred_job(instance, deferred_data)
+        self.prime_relation_caches(instance)
+        if tree is not None:
+            self._save_tree(instance, tree, delete_missing=False)
 
         return instance
 
@@ -264,7 +1805,9 @@ class NestedUpdateMixin(BaseNestedModelSerializer):
     }
 
     def update(self, instance, validated_data):
+        tree = self._extract_tree(validated_data)
         relations, reverse_relations = self._extract_relations(validated_data)
+        deferred_data = self._defer_reverse_relations(reverse_relations)
 
         # Create or update direct relations (foreign key, one-to-one)
         self.update_or_create_direct_relations(
@@ -273,66 +1816,479 @@ class NestedUpdateMixin(BaseNestedModelSerializer):
         )
 
         # Update instance
+        self._write_status = self._get_write_status(instance, validated_data)
         instance = super(NestedUpdateMixin, self).update(
             instance,
             validated_data,
         )
+        if self._write_status != 'unchanged':
+            _record_saved(self.Meta.model, [instance], False)
         self.update_or_create_reverse_relations(instance, reverse_relations)
         self.delete_reverse_relations_if_need(instance, reverse_relations)
+        self.apply_reverse_relation_deltas(instance)
+        self.schedule_deferred_job(instance, deferred_data)
+        self.prime_relation_caches(instance)
+        if tree is not None:
+            self._save_tree(instance, tree, delete_missing=True)
         return instance
 
     def delete_reverse_relations_if_need(self, instance, reverse_relations):
-        # Reverse `reverse_relations` for correct delete priority
-        reverse_relations = OrderedDict(
-            reversed(list(reverse_relations.items())))
-
-        # Delete instances which is missed in data
-        for field_name, (related_field, field, field_source) in \
-                reverse_relations.items():
-            model_class = field.Meta.model
-
-            related_data = self.get_initial()[field_name]
-            # Expand to array of one item for one-to-one for uniformity
-            if related_field.one_to_one:
-                related_data = [related_data]
-
-            # M2M relation can be as direct or as reverse. For direct relation
-            # we should use reverse relation name
-            if related_field.many_to_many and \
-                    not isinstance(related_field, ForeignObjectRel):
-                related_field_lookup = {
-                    related_field.remote_field.name: instance,
-                }
-            elif isinstance(related_field, GenericRelation):
-                related_field_lookup = \
-                    self._get_generic_lookup(instance, related_field)
-            else:
-                related_field_lookup = {
-                    related_field.name: instance,
-                }
-
-            current_ids = self._extract_related_pks(field, related_data)
+        self._delete_reverse_relations_in_batch(
+            [(self, instance, reverse_relations)])
 
+    def apply_reverse_relation_deltas(self, instance):
+        """
+        Applies operations of nested list fields listed in
+        `Meta.nested_delta_fields`. Only the referenced children are fetched
+        and written, the rest of the collection is never loaded.
+        """
+        errors = OrderedDict()
+        for field_name, (related_field, field, field_source, delta) in \
+                self._reverse_relation_deltas.items():
+            try:
+                self._apply_reverse_relation_delta(
+                    instance, field_name, related_field, field, field_source,
+                    delta)
+            except ValidationError as exc:
+                errors[field_name] = exc.detail
+            finally:
+                # The relation cache doesn't know about the operations
+                getattr(instance, '_prefetched_objects_cache', {}).pop(
+                    _get_prefetch_cache_name(getattr(instance, field_source)),
+                    None)
+        if errors:
+            raise ValidationError(errors)
+
+    def _apply_reverse_relation_delta(self, instance, field_name,
+                                      related_field, field, field_source,
+                                      delta):
+        # Removed children are deleted first, then children are updated,
+        # added and moved
+        model_class = field.Meta.model
+        queryset = self._get_reverse_queryset(
+            instance, related_field, field, field_source)
+        update_pks = [
+            self._get_related_pk(data, model_class) for data in delta.update]
+        move_pks = [pk for pk, _ in delta.move]
+        referenced = set(update_pks + delta.remove + move_pks)
+        if self._row_locks is not None:
+            queryset = queryset.select_for_update().order_by('pk')
+        instances = {
+            str(obj.pk): obj for obj in queryset.filter(pk__in=referenced)
+        } if referenced else {}
+
+        errors = OrderedDict()
+        for op, pks in (('update', update_pks), ('remove', delta.remove),
+                        ('move', move_pks)):
+            op_errors = OrderedDict(
+                (index, [self.error_messages['delta_does_not_exist'].format(
+                    pk=pk)])
+                for index, pk in enumerate(pks) if pk not in instances
+            )
+            if op_errors:
+                errors[op] = op_errors
+        if errors:
+            raise ValidationError(errors)
+
+        position_field_name = self._get_position_field_name(field_name)
+        next_position = None
+        if delta.add and position_field_name is not None:
+            # New children are appended after the current last one
+            last_position = queryset.exclude(pk__in=delta.remove).aggregate(
+                last=Max(position_field_name))['last']
+            next_position = 0 if last_position is None else last_position + 1
+        if delta.move:
+            self._validate_delta_positions(
+                queryset, position_field_name, delta, move_pks,
+                next_position)
+
+        removed_results = []
+        if delta.remove:
             try:
-                pks_to_delete = list(
-                    model_class.objects.filter(
-                        **related_field_lookup
-                    ).exclude(
-                        pk__in=current_ids
-                    ).values_list('pk', flat=True)
-                )
-
                 if related_field.many_to_many:
-                    # Remove relations from m2m table
-                    m2m_manager = getattr(instance, field_source)
-                    m2m_manager.remove(*pks_to_delete)
+                    getattr(instance, field_source).remove(*[
+                        instances[pk] for pk in delta.remove])
                 else:
-                    model_class.objects.filter(pk__in=pks_to_delete).delete()
-
+                    model_class.objects.filter(pk__in=delta.remove).delete()
+                    _record_deleted(model_class, [
+                        instances[pk].pk for pk in delta.remove])
+            except ProtectedError as e:
+                self.fail('cannot_delete_protected', instances=", ".join([
+                    str(obj) for obj in e.args[1]]))
+            removed_results = [
+                OrderedDict([('pk', instances[pk].pk), ('status', 'deleted')])
+                for pk in delta.remove
+            ]
+
+        save_kwargs = dict(self._get_save_kwargs(field_name))
+        if _is_generic_relation(related_field):
+            save_kwargs.update(
+                self._get_generic_lookup(instance, related_field))
+        elif not related_field.many_to_many:
+            save_kwargs[related_field.name] = instance
+        # Children to update are validated as partial updates
+        saved, write_results, item_errors = self._save_related_in_batch(
+            field_name, field, [
+                (self, delta.update, save_kwargs),
+                (self, delta.add, save_kwargs),
+            ], instances=instances, partial=True)
+        for op, detail in zip(('update', 'add'), item_errors):
+            op_errors = OrderedDict(
+                (index, item) for index, item in enumerate(detail) if item)
+            if op_errors:
+                errors[op] = op_errors
+        if errors:
+            raise ValidationError(errors)
+
+        if related_field.many_to_many and saved[1]:
+            getattr(instance, field_source).add(*saved[1])
+        results = OrderedDict(
+            (str(result['pk']), result)
+            for result in write_results[0] + write_results[1])
+
+        moved = []
+        if position_field_name is not None:
+            position_field = model_class._meta.get_field(position_field_name)
+            new_positions = [
+                (obj, next_position + index)
+                for index, obj in enumerate(saved[1])
+            ] if next_position is not None else []
+            new_positions.extend(
+                (instances[pk], position) for pk, position in delta.move)
+            for obj, position in new_positions:
+                result = results.setdefault(str(obj.pk), OrderedDict([
+                    ('pk', obj.pk), ('status', 'unchanged')]))
+                if getattr(obj, position_field.attname) == position:
+                    continue
+                setattr(obj, position_field.attname, position)
+                moved.append(obj)
+                if result['status'] == 'unchanged':
+                    result['status'] = 'updated'
+            _bulk_save(model_class, [], moved, [position_field.name])
+
+        self._write_results[field_name] = \
+            list(results.values()) + removed_results
+
+    def _validate_delta_positions(self, queryset, position_field_name,
+                                  delta, move_pks, next_position):
+        # Children are moved only to free positions or to positions of other
+        # moved children, so no two children end up on the same position
+        targets = [position for _, position in delta.move]
+        taken = set(queryset.exclude(pk__in=move_pks + delta.remove).filter(
+            **{'{0}__in'.format(position_field_name): targets},
+        ).values_list(position_field_name, flat=True))
+        if next_position is not None:
+            taken.update(range(next_position, next_position + len(delta.add)))
+        errors = OrderedDict(
+            (index, {'position': [
+                self.error_messages['delta_position_taken'].format(
+                    position=position)]})
+            for index, position in enumerate(targets) if position in taken
+        )
+        if errors:
+            raise ValidationError({'move': errors})
+
+    def _delete_missing_from_stream(self, instance, related_field, field,
+                                    seen_pks, batch_size):
+        model_class = field.child.Meta.model
+        queryset = self._get_reverse_queryset(
+            instance, related_field, field.child, field.source)
+        pks_to_delete = [
+            pk for pk in queryset.values_list('pk', flat=True).iterator()
+            if str(pk) not in seen_pks
+        ]
+
+        # Chunks keep the number of query parameters bounded
+        for start in range(0, len(pks_to_delete), batch_size):
+            chunk = pks_to_delete[start:start + batch_size]
+            try:
+                if related_field.many_to_many:
+                    getattr(instance, field.source).remove(*chunk)
+                else:
+                    model_class.objects.filter(pk__in=chunk).delete()
+                    _record_deleted(model_class, chunk)
             except ProtectedError as e:
                 instances = e.args[1]
                 self.fail('cannot_delete_protected', instances=", ".join([
                     str(instance) for instance in instances]))
+        return len(pks_to_delete)
+
+
+class NestedListSerializer(serializers.ListSerializer):
+    """
+    Saves many instances of a nested serializer together. Every nested level
+    is processed for all parents at once: one lookup query per child model,
+    bulk inserts and updates for plain child serializers and one delete
+    query per reverse relation. Instances to update are matched by pk,
+    items without a match are created.
+
+    Children of a nested list are validated by `run_child_validation`, also
+    when they are validated again on save.
+    """
+    def run_validation(self, data=empty):
+        parent = self._get_nested_parent()
+        if parent is not None and isinstance(data, Mapping) and \
+                self.field_name in parent._get_delta_field_names():
+            # Operations are validated instead of the whole list
+            return parent._validate_delta(self.field_name, self, data)
+        if getattr(self, 'parent', None) is None and \
+                isinstance(self.child, BaseNestedModelSerializer):
+            # The whole list is estimated before any item is validated
+            self.child._admit_payload(data, many=True)
+        return super(NestedListSerializer, self).run_validation(data)
+
+    @property
+    def payload_cost(self):
+        """The estimate of the list with `Meta.payload_limits` of the child"""
+        return getattr(self.child, 'payload_cost', None)
+
+    def to_internal_value(self, data):
+        if html.is_html_input(data):
+            data = html.parse_html_list(data, default=[])
+        if not isinstance(data, list) or not data:
+            return super(NestedListSerializer, self).to_internal_value(data)
+
+        self.start_child_validation(data)
+        max_errors = self.get_error_budget()
+        validated_data = []
+        errors = []
+        for index, item in enumerate(data):
+            if max_errors and \
+                    sum(1 for detail in errors if detail) >= max_errors:
+                # The rest of the list isn't validated
+                break
+            try:
+                validated_data.append(
+                    self.run_child_validation(self.child, item, index))
+            except ValidationError as exc:
+                errors.append(exc.detail)
+            else:
+                errors.append({})
+        errors = self.finish_child_validation(errors)
+
+        if max_errors and (any(errors) or len(errors) < len(data)):
+            raise ValidationError(self.parent._truncate_item_errors(
+                self.field_name, errors, truncated=len(errors) < len(data)))
+        if any(errors):
+            raise ValidationError(errors)
+        return validated_data
+
+    def _get_nested_parent(self):
+        parent = getattr(self, 'parent', None)
+        if isinstance(parent, BaseNestedModelSerializer):
+            return parent
+        return None
+
+    def get_error_budget(self):
+        """The number of invalid children after which validation stops"""
+        parent = self._get_nested_parent()
+        if parent is None:
+            return None
+        return parent._get_error_budget(self.field_name)
+
+    def start_child_validation(self, related_data, instances=None,
+                               async_validation=None):
+        """
+        Prepares the validation of the children in `related_data`: caches
+        of their related fields, their stored instances (fetched unless
+        `instances` are given) if the child has a content hash and the
+        collection of their async validators, which many lists can share
+        with `async_validation`.
+        """
+        parent = self._get_nested_parent()
+        self._child_caches = OrderedDict()
+        self._validation_memo = None
+        self._stored_instances = {}
+        if parent is not None:
+            self._child_caches = parent._get_related_field_caches(
+                self.field_name, related_data)
+            if ValidationMemo.is_enabled(self.child):
+                self._validation_memo = parent._get_validation_memo()
+            if _get_content_hash_field_name(self.child):
+                self._stored_instances = instances \
+                    if instances is not None else \
+                    self._get_stored_instances(parent, related_data)
+        if async_validation is None and \
+                AsyncValidation.is_enabled(self.child):
+            async_validation = AsyncValidation(self.child)
+        self._async_validation = async_validation
+
+    def run_child_validation(self, serializer, data, key):
+        """
+        Validates one child with `serializer` and returns its validated
+        data. The steps are applied in order:
+
+        1. A child with an unchanged content hash gets its stored values.
+        2. An identical payload gets the result of the validation memo.
+        3. Otherwise the child is validated with the related field caches
+           of the list and its async validators are collected under `key`.
+        """
+        if self._stored_instances and isinstance(data, Mapping):
+            instance = self._stored_instances.get(
+                self.parent._get_related_pk(data, self.child.Meta.model))
+            if _is_content_unchanged(self.child, instance, data):
+                # Children are saved from the initial data, the validated
+                # values are the stored ones
+                return self._get_stored_values(instance, data)
+
+        if self._validation_memo is None:
+            return self._validate_child(serializer, data, key)
+        memo_key = ValidationMemo._make_key(serializer, data)
+        if self._async_validation is not None and memo_key is not None:
+            self._async_validation.add_alias(key, memo_key)
+        return self._validation_memo.run_validation(
+            serializer, data,
+            lambda data: self._validate_child(serializer, data, key))
+
+    def _validate_child(self, serializer, data, key):
+        # Hooks into the fields of the child are in place only while it's
+        # validated
+        async_validation = self._async_validation
+        for sub_field_name, cache in self._child_caches.items():
+            cache.bind(serializer.fields[sub_field_name])
+        if async_validation is not None:
+            async_validation.key = key
+            async_validation.bind(serializer)
+        try:
+            return serializer.run_validation(data)
+        finally:
+            for sub_field_name in self._child_caches:
+                RelatedFieldCache.unbind(serializer.fields[sub_field_name])
+            if async_validation is not None:
+                async_validation.unbind(serializer)
+
+    def finish_child_validation(self, errors):
+        """
+        Awaits the collected async validators and adds their errors to
+        `errors`, a list of child errors by position.
+        """
+        if self._async_validation is None:
+            return errors
+        errors = list(errors)
+        for key, detail in self._async_validation.run().items():
+            if key < len(errors):
+                errors[key] = AsyncValidation.merge_errors(
+                    errors[key], detail)
+        return errors
+
+    def _get_stored_instances(self, parent, related_data):
+        # Stored instances of the whole list are fetched with one query
+        model_class = self.child.Meta.model
+        pk_list = parent._extract_related_pks(self.child, [
+            data for data in related_data if isinstance(data, Mapping)])
+        if not pk_list:
+            return {}
+        sources = self._get_stored_value_sources(self.child)
+        queryset = model_class._default_manager.filter(pk__in=pk_list)
+        select_related = [
+            source for source, sub_field in sources.items()
+            if isinstance(sub_field, RelatedField)]
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        prefetch_related = [
+            source for source, sub_field in sources.items()
+            if isinstance(sub_field, ManyRelatedField)]
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*prefetch_related)
+        return {str(instance.pk): instance for instance in queryset}
+
+    def _get_stored_values(self, instance, data):
+        return OrderedDict(
+            (source, self._get_stored_value(instance, sub_field))
+            for source, sub_field in self._get_stored_value_sources(
+                self.child).items()
+            if sub_field.field_name in data
+        )
+
+    @staticmethod
+    def _get_stored_value_sources(serializer):
+        # Own writable fields of a child which map to model attributes,
+        # its nested serializers are neither validated nor returned
+        return OrderedDict(
+            (sub_field.source, sub_field)
+            for sub_field in serializer._writable_fields
+            if not isinstance(sub_field, serializers.BaseSerializer) and
+            len(sub_field.source_attrs) == 1
+        )
+
+    @staticmethod
+    def _get_stored_value(instance, field):
+        value = getattr(instance, field.source)
+        if isinstance(field, ManyRelatedField):
+            return list(value.all())
+        return value
+
+    def save(self, **kwargs):
+        self._save_kwargs = kwargs
+        return _save_with_bulk_signals(
+            self.child, self._save_in_transaction, **kwargs)
+
+    def _save_in_transaction(self, **kwargs):
+        if not _is_atomic(self.child):
+            return super(NestedListSerializer, self).save(**kwargs)
+        with transaction.atomic(using=_get_atomic_using(self.child)):
+            return super(NestedListSerializer, self).save(**kwargs)
+
+    def create(self, validated_data):
+        return self._save_in_batch(
+            [None] * len(validated_data), validated_data)
+
+    def update(self, instance, validated_data):
+        model_class = self.child.Meta.model
+        instances = {str(obj.pk): obj for obj in instance}
+        return self._save_in_batch([
+            instances.get(self.child._get_related_pk(data, model_class))
+            for data in self.initial_data
+        ], validated_data)
+
+    def _save_in_batch(self, instances, validated_data):
+        identity_map = IdentityMap()
+        self._write_strategies = OrderedDict()
+        nodes = []
+        for instance, data, attrs in zip(
+                instances, self.initial_data, validated_data):
+            node = self.child.__class__(
+                instance=instance,
+                data=data,
+                context=self.context,
+                partial=self.partial,
+            )
+            node._is_nested_level = True
+            node._shared_identity_map = identity_map
+            node._shared_write_strategies = self._write_strategies
+            node._validated_data = attrs
+            node._errors = {}
+            nodes.append(node)
+
+        row_locks = None
+        if _is_locking_rows(self.child):
+            row_locks = _lock_rows([
+                (self.child, node.instance, node.initial_data)
+                for node in nodes
+            ])
+            for node in nodes:
+                node._shared_row_locks = row_locks
+                node.instance = _get_locked_instance(row_locks, node.instance)
+
+        if not self.child._can_save_in_batch():
+            # Custom saving can only be done instance by instance
+            saved = [node.save(**self._save_kwargs) for node in nodes]
+        else:
+            for node in nodes:
+                node._prepare_save(self._save_kwargs)
+            self.child._identity_map = identity_map
+            self.child._row_locks = row_locks
+            self.child._write_strategies = self._write_strategies
+            saved = self.child._save_nodes_in_batch(nodes)
+
+        if _get_content_hash_field_name(self.child) is not None:
+            self.child._clear_parent_content_hashes(saved)
+        return saved
+
+    @property
+    def write_strategies(self):
+        """Write strategies of the nested lists of the last save"""
+        return getattr(self, '_write_strategies', OrderedDict())
 
 
 class UniqueFieldsMixin(serializers.ModelSerializer):
@@ -441,6 +2397,7 @@ class RelatedSaveMixin(serializers.Serializer):
         if self._is_saved:
             # prevent recursion when we save a reverse (which tries to save self as a direct)
             return
+        self._share_identity_map()
         # Create or update direct relations (foreign key, one-to-one)
         reverse_relations = self._extract_reverse_relations(kwargs)
         self._save_direct_relations(kwargs)
@@ -449,6 +2406,14 @@ class RelatedSaveMixin(serializers.Serializer):
         self._save_reverse_relations(reverse_relations, instance=instance)
         return instance
 
+    def _share_identity_map(self):
+        """Nested serializers share the identity map of the root serializer"""
+        self._identity_map = getattr(
+            self, '_shared_identity_map', None) or IdentityMap()
+        for field in self.fields.values():
+            if isinstance(field, serializers.BaseSerializer):
+                field._shared_identity_map = self._identity_map
+
     def _get_reverse_fields(self):
         reverse_fields = OrderedDict()
         if not hasattr(self, 'Meta') or not hasattr(self.Meta, 'model'):
@@ -560,6 +2525,8 @@ class GetOrCreateListSerializer(serializers.ListSerializer):
         )
 
         new_values = []
+        self.child._shared_identity_map = getattr(
+            self, '_shared_identity_map', None)
 
         for item in self._validated_data:
             # integrate save kwargs
@@ -660,6 +2627,7 @@ class GetOrCreateNestedSerializerMixin(RelatedSaveMixin):
         for k, v in kwargs.items():
             self._validated_data[k] = v
 
+        self._share_identity_map()
         # Create or update direct relations (foreign key, one-to-one)
         related_objects = self._extract_reverse_relations(kwargs)
         self._save_direct_relations(kwargs)
@@ -674,6 +2642,12 @@ class GetOrCreateNestedSerializerMixin(RelatedSaveMixin):
             for key in self.match_on:
                 if key not in self.get_fields().keys():
                     match_on[key] = self._validated_data.get(key)
+            # the same object referenced many times is fetched and saved once
+            if None not in match_on.values():
+                match = self._identity_map.get(
+                    self.queryset.model, match_on, self._validated_data)
+                if match is not None:
+                    return match
             match = self.queryset.get(**match_on)
             for k, v in self._validated_data.items():
                 setattr(match, k, v)
@@ -682,6 +2656,10 @@ class GetOrCreateNestedSerializerMixin(RelatedSaveMixin):
         except (TypeError, ValueError):
             self.fail('incorrect_type', data_type=type(self._validated_data).__name__)
         match.save()
+        if None not in match_on.values():
+            self._identity_map.add(
+                self.queryset.model, match_on, match,
+                dict(self._validated_data))
 
         self._save_reverse_relations(related_objects, instance=match)
         return match
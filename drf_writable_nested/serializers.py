@@ -1,8 +1,156 @@
+from django.db.models import FieldDoesNotExist, Prefetch
+from django.db.models.fields.related import ForeignObjectRel
 from rest_framework import serializers
+from rest_framework.relations import (
+    ManyRelatedField, PrimaryKeyRelatedField, RelatedField)
 
 from .mixins import NestedCreateMixin, NestedUpdateMixin
+from .utils import _is_generic_relation
+
+
+def _get_model_field(model_class, source):
+    try:
+        return model_class._meta.get_field(source)
+    except FieldDoesNotExist:
+        # If `related_name` is not set, field name does not include
+        # `_set` -> remove it and check again
+        default_postfix = '_set'
+        if source.endswith(default_postfix):
+            return model_class._meta.get_field(source[:-len(default_postfix)])
+        raise
+
+
+def _get_tree_prefetch_depth(serializer):
+    # Nodes are at most `tree_max_depth` levels below the root, one more
+    # level is fetched to know that the deepest nodes have no children
+    return getattr(serializer.Meta, 'tree_max_depth', 32) + 1
+
+
+def _collect_prefetch_plan(serializer, model_class, prefix,
+                           select_related, prefetch_related,
+                           tree_depth=None):
+    """
+    Fills `select_related` and `prefetch_related` with lookups required to
+    render `serializer` and returns the names of the columns it reads or
+    `None` if they can't be determined. The tree field of a tree serializer
+    refers to the serializer itself, it's prefetched `tree_depth` levels
+    deep.
+    """
+    columns = {model_class._meta.pk.name}
+    can_trim = True
+    tree_field = None
+    if hasattr(serializer, '_get_tree_field_name'):
+        tree_field = serializer._get_tree_field_name()
+        if tree_field is not None and tree_depth is None:
+            tree_depth = _get_tree_prefetch_depth(serializer)
+
+    for field in serializer.fields.values():
+        if field.write_only or field.source == 'pk':
+            continue
+        try:
+            model_field = _get_model_field(model_class, field.source)
+        except FieldDoesNotExist:
+            # Method, property or `source='*'`, we don't know what it reads
+            can_trim = False
+            continue
+
+        lookup = prefix + field.source
+        if not model_field.is_relation:
+            columns.add(model_field.name)
+            continue
+        if model_field.concrete:
+            columns.add(model_field.name)
+
+        nested = field
+        if isinstance(field, serializers.ListSerializer):
+            nested = field.child
+
+        if field.field_name == tree_field:
+            if tree_depth > 0:
+                prefetch_related.append(Prefetch(
+                    lookup,
+                    queryset=_get_prefetch_queryset(
+                        nested, model_field, tree_depth - 1),
+                ))
+        elif isinstance(nested, serializers.ModelSerializer):
+            if model_field.many_to_one or model_field.one_to_one:
+                select_related.append(lookup)
+                _collect_prefetch_plan(
+                    nested, model_field.related_model, lookup + '__',
+                    select_related, prefetch_related)
+            else:
+                prefetch_related.append(Prefetch(
+                    lookup,
+                    queryset=_get_prefetch_queryset(nested, model_field),
+                ))
+        elif isinstance(field, ManyRelatedField):
+            prefetch_related.append(lookup)
+        elif isinstance(field, PrimaryKeyRelatedField) and \
+                model_field.concrete:
+            # DRF reads the pk from the FK column without a query
+            continue
+        elif isinstance(field, RelatedField):
+            select_related.append(lookup)
+
+    return columns if can_trim else None
+
+
+def _get_prefetch_queryset(serializer, model_field, tree_depth=None):
+    related_model = model_field.related_model
+    select_related = []
+    prefetch_related = []
+    columns = _collect_prefetch_plan(
+        serializer, related_model, '', select_related, prefetch_related,
+        tree_depth)
+
+    queryset = related_model._default_manager.all()
+    if select_related:
+        queryset = queryset.select_related(*select_related)
+    if prefetch_related:
+        queryset = queryset.prefetch_related(*prefetch_related)
+
+    if columns is not None:
+        # Columns used to match prefetched instances with their parents
+        if _is_generic_relation(model_field):
+            columns.update({
+                model_field.content_type_field_name,
+                model_field.object_id_field_name,
+            })
+        elif isinstance(model_field, ForeignObjectRel) and \
+                not model_field.many_to_many:
+            columns.add(model_field.field.name)
+        queryset = queryset.only(*columns)
+
+    return queryset
 
 
 class WritableNestedModelSerializer(NestedCreateMixin, NestedUpdateMixin,
                                     serializers.ModelSerializer):
-    pass
+    def get_optimized_queryset(self, queryset=None):
+        """
+        Returns `queryset` with `select_related`/`prefetch_related` calls
+        derived from the nested fields, so rendering a list of instances
+        costs one query per relation instead of one per row and relation.
+
+        Example of usage:
+        ```
+        class UserViewSet(viewsets.ModelViewSet):
+            serializer_class = UserSerializer
+
+            def get_queryset(self):
+                return UserSerializer().get_optimized_queryset()
+        ```
+        """
+        if queryset is None:
+            queryset = self.Meta.model._default_manager.all()
+
+        select_related = []
+        prefetch_related = []
+        _collect_prefetch_plan(
+            self, queryset.model, '', select_related, prefetch_related)
+
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*prefetch_related)
+        return queryset
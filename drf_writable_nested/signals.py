@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+import threading
+from collections import OrderedDict
+
+from django.dispatch import Signal
+
+# Sent once per model after a nested save with `Meta.send_nested_bulk_saved`,
+# `sender` is the model class
+nested_bulk_saved = Signal(
+    providing_args=['created', 'updated', 'deleted_pks'])
+
+
+class BulkSignalLog(object):
+    """
+    Instances written during one nested save with
+    `Meta.send_nested_bulk_saved`, both by bulk queries, which don't send
+    model signals, and row by row. `send()` fires `nested_bulk_saved` once
+    per model.
+    """
+    def __init__(self):
+        self._models = OrderedDict()
+
+    def _get_entry(self, model_class):
+        model_class = model_class._meta.concrete_model
+        if model_class not in self._models:
+            self._models[model_class] = (
+                OrderedDict(), OrderedDict(), OrderedDict())
+        return self._models[model_class]
+
+    @staticmethod
+    def _get_key(instance):
+        # Instances created by `bulk_create` may have no pk
+        return instance.pk if instance.pk is not None else id(instance)
+
+    def add_saved(self, model_class, instances, created):
+        created_instances, updated_instances = \
+            self._get_entry(model_class)[:2]
+        for instance in instances:
+            key = self._get_key(instance)
+            if key in created_instances:
+                continue
+            if created:
+                updated_instances.pop(key, None)
+                created_instances[key] = instance
+            else:
+                updated_instances[key] = instance
+
+    def add_deleted(self, model_class, pks):
+        deleted_pks = self._get_entry(model_class)[2]
+        for pk in pks:
+            deleted_pks[str(pk)] = pk
+
+    def send(self):
+        for model_class, (created, updated, deleted_pks) in \
+                self._models.items():
+            if not (created or updated or deleted_pks):
+                continue
+            nested_bulk_saved.send(
+                sender=model_class,
+                created=list(created.values()),
+                updated=list(updated.values()),
+                deleted_pks=list(deleted_pks.values()),
+            )
+
+
+# The log of the nested save running in the current thread
+_signal_logs = threading.local()
+
+
+def _get_signal_log():
+    return getattr(_signal_logs, 'log', None)
+
+
+def _save_with_bulk_signals(serializer, save, **kwargs):
+    """
+    Calls `save` with a log of writes and fires `nested_bulk_saved`
+    afterwards if `Meta.send_nested_bulk_saved` is set. While the log is
+    active, save signal receivers don't prevent bulk writes of nested
+    children. Rows saved one by one still send their own model signals.
+    Nested levels join the log of the root serializer.
+    """
+    if _get_signal_log() is not None or \
+            not getattr(serializer.Meta, 'send_nested_bulk_saved', False):
+        return save(**kwargs)
+
+    log = BulkSignalLog()
+    _signal_logs.log = log
+    try:
+        instance = save(**kwargs)
+    finally:
+        _signal_logs.log = None
+    log.send()
+    return instance
+
+
+def _record_deleted(model_class, pks):
+    log = _get_signal_log()
+    if log is not None:
+        log.add_deleted(model_class, pks)
+
+
+def _record_saved(model_class, instances, created):
+    log = _get_signal_log()
+    if log is not None:
+        log.add_saved(model_class, instances, created)
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import json
+from collections.abc import Mapping
+
+from django.db import router
+from rest_framework import serializers
+
+
+def _is_generic_relation(field):
+    # contenttypes is imported lazily: its models can't be imported before
+    # the app registry is ready, e.g. while loading INSTALLED_APPS
+    from django.contrib.contenttypes.fields import GenericRelation
+    return isinstance(field, GenericRelation)
+
+
+def _get_content_type(instance):
+    from django.contrib.contenttypes.models import ContentType
+    return ContentType.objects.get_for_model(instance)
+
+
+def _is_atomic(serializer):
+    return getattr(getattr(serializer, 'Meta', None), 'atomic', True)
+
+
+def _get_atomic_using(serializer):
+    using = getattr(serializer.Meta, 'atomic_using', None)
+    return using or router.db_for_write(serializer.Meta.model)
+
+
+def _get_atomic_savepoint(serializer):
+    return getattr(serializer.Meta, 'atomic_savepoint', False)
+
+
+def _get_content_hash_field_name(serializer):
+    return getattr(getattr(serializer, 'Meta', None), 'content_hash_field',
+                   None)
+
+
+def _canonicalize(field, data):
+    # Writable data of `field` with pks under the `pk` key
+    if isinstance(field, serializers.ListSerializer):
+        if not isinstance(data, list):
+            return data
+        return [_canonicalize(field.child, item) for item in data]
+    if not isinstance(field, serializers.Serializer) or \
+            not isinstance(data, Mapping):
+        return data
+
+    pk_names = {'pk'}
+    if isinstance(field, serializers.ModelSerializer):
+        pk_names.add(field.Meta.model._meta.pk.attname)
+    canonical = {}
+    for name, value in data.items():
+        if name in pk_names:
+            if value is not None:
+                canonical['pk'] = str(value)
+            continue
+        sub_field = field.fields.get(name)
+        if sub_field is None or sub_field.read_only:
+            continue
+        canonical[name] = _canonicalize(sub_field, value)
+    return canonical
+
+
+def _hash_payload(payload):
+    """
+    Returns a SHA-1 of the canonical JSON of `payload` or `None` if it
+    isn't serializable.
+    """
+    try:
+        payload = json.dumps(payload, sort_keys=True, separators=(',', ':'))
+    except (TypeError, ValueError):
+        # Files and other opaque values can't be hashed reliably
+        return None
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def _get_content_hash(serializer, data):
+    """
+    Returns a hash of the writable data of a nested node with the data and
+    pks of its nested children, but without its own pk, or `None` if the
+    data can't be hashed.
+    """
+    canonical = _canonicalize(serializer, data)
+    if not isinstance(canonical, Mapping):
+        return None
+    canonical.pop('pk', None)
+    canonical.pop(_get_content_hash_field_name(serializer), None)
+    return _hash_payload(canonical)
+
+
+def _is_content_unchanged(serializer, instance, data):
+    field_name = _get_content_hash_field_name(serializer)
+    if field_name is None or instance is None:
+        return False
+    stored_hash = getattr(instance, field_name)
+    return stored_hash is not None and \
+        stored_hash == _get_content_hash(serializer, data)
+
+
+def _get_method_owner(klass, name):
+    for base in klass.__mro__:
+        if name in base.__dict__:
+            return base
+    return None
@@ -1,3 +1,7 @@
+import os
+import tempfile
+
+
 def pytest_configure():
     from django.conf import settings
 
@@ -14,7 +18,22 @@ def pytest_configure():
             'default': {
                 'ENGINE': 'django.db.backends.sqlite3',
                 'NAME': ':memory:'
-            }
+            },
+            # Tests of worker threads and processes need a database file
+            # shared by their connections
+            'shared': {
+                'ENGINE': 'django.db.backends.sqlite3',
+                'NAME': ':memory:',
+                'OPTIONS': {
+                    'timeout': 30,
+                },
+                'TEST': {
+                    'DEPENDENCIES': [],
+                    'NAME': os.path.join(
+                        tempfile.gettempdir(),
+                        'drf_writable_nested_{0}.sqlite3'.format(os.getpid())),
+                },
+            },
         },
         SITE_ID=1,
         SECRET_KEY='not very secret in tests',
@@ -38,6 +57,7 @@ def pytest_configure():
             'django.contrib.staticfiles',
             'rest_framework',
             'rest_framework.authtoken',
+            'drf_writable_nested',
             'tests',
         ),
         PASSWORD_HASHERS=(
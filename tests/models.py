@@ -135,3 +135,43 @@ class ManyToManyChild(models.Model):
 
 class ManyToManyParent(models.Model):
     children = models.ManyToManyField(ManyToManyChild, related_name='parents')
+
+
+class Category(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4,
+                          editable=False)
+    name = models.CharField(max_length=100)
+    parent = models.ForeignKey('self', null=True, on_delete=models.CASCADE,
+                               related_name='children')
+
+
+class Playlist(models.Model):
+    name = models.CharField(max_length=100)
+
+
+class Track(models.Model):
+    playlist = models.ForeignKey(Playlist, on_delete=models.CASCADE,
+                                 related_name='tracks')
+    title = models.CharField(max_length=100)
+    position = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ('position',)
+
+
+class Article(models.Model):
+    title = models.CharField(max_length=100)
+    content_hash = models.CharField(max_length=40, null=True, blank=True)
+
+
+class ArticleSection(models.Model):
+    article = models.ForeignKey(Article, on_delete=models.CASCADE,
+                                related_name='sections')
+    title = models.CharField(max_length=100)
+    content_hash = models.CharField(max_length=40, null=True, blank=True)
+
+
+class ArticleParagraph(models.Model):
+    section = models.ForeignKey(
+        ArticleSection, on_delete=models.CASCADE, related_name='paragraphs')
+    text = models.TextField()
@@ -297,3 +297,102 @@ class ReverseManyToManyChildSerializer(WritableNestedModelSerializer):
     class Meta:
         model = models.ManyToManyChild
         fields = ('id', 'parents',)
+
+
+# Plain related fields inside nested lists
+
+class TeamMemberSerializer(serializers.ModelSerializer):
+    # Plain PrimaryKeyRelatedField built by ModelSerializer
+    avatar_image = serializers.SlugRelatedField(
+        source='user_avatar', slug_field='image',
+        queryset=models.Avatar.objects.all(), required=False)
+
+    class Meta:
+        model = models.User
+        fields = ('pk', 'username', 'user_avatar', 'avatar_image')
+        extra_kwargs = {'user_avatar': {'required': False}}
+
+
+class TeamWithMembersSerializer(WritableNestedModelSerializer):
+    members = TeamMemberSerializer(many=True)
+
+    class Meta:
+        model = models.Team
+        fields = ('pk', 'name', 'members')
+
+
+class DeterministicTagSerializer(serializers.ModelSerializer):
+    validated_tags = []
+
+    class Meta:
+        model = models.Tag
+        fields = ('pk', 'tag',)
+        deterministic_validation = True
+
+    def validate_tag(self, value):
+        self.validated_tags.append(value)
+        if value == 'invalid':
+            raise ValidationError('Invalid tag')
+        return value
+
+
+class MemoizedTaggedItemSerializer(WritableNestedModelSerializer):
+    tags = DeterministicTagSerializer(many=True)
+
+    class Meta:
+        model = models.TaggedItem
+        fields = ('pk', 'tags',)
+
+
+class SlimUserSerializer(UserSerializer):
+    class Meta(UserSerializer.Meta):
+        slim_response = True
+
+
+class CategorySerializer(WritableNestedModelSerializer):
+    class Meta:
+        model = models.Category
+        fields = ('pk', 'name', 'children',)
+        tree_field = 'children'
+        tree_max_depth = 3
+        tree_max_nodes = 20
+
+
+class TrackSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = models.Track
+        fields = ('pk', 'title',)
+
+
+class PlaylistSerializer(WritableNestedModelSerializer):
+    tracks = TrackSerializer(many=True)
+
+    class Meta:
+        model = models.Playlist
+        fields = ('pk', 'name', 'tracks',)
+        nested_ordering = {'tracks': 'position'}
+        nested_delta_fields = ('tracks',)
+
+
+class ArticleParagraphSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = models.ArticleParagraph
+        fields = ('pk', 'text',)
+
+
+class ArticleSectionSerializer(WritableNestedModelSerializer):
+    paragraphs = ArticleParagraphSerializer(many=True)
+
+    class Meta:
+        model = models.ArticleSection
+        fields = ('pk', 'title', 'paragraphs',)
+        content_hash_field = 'content_hash'
+
+
+class ArticleSerializer(WritableNestedModelSerializer):
+    sections = ArticleSectionSerializer(many=True)
+
+    class Meta:
+        model = models.Article
+        fields = ('pk', 'title', 'sections',)
+        content_hash_field = 'content_hash'
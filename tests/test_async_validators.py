@@ -0,0 +1,107 @@
+import asyncio
+
+from django.test import TestCase
+from rest_framework import serializers as drf_serializers
+
+from . import (
+    models,
+    serializers,
+)
+
+
+class AsyncAvatarSerializer(serializers.AvatarSerializer):
+    active = 0
+    max_active = 0
+    calls = 0
+
+    class Meta(serializers.AvatarSerializer.Meta):
+        async_validation_concurrency = 3
+
+    async def validate_image(self, value):
+        cls = AsyncAvatarSerializer
+        cls.calls += 1
+        cls.active += 1
+        cls.max_active = max(cls.max_active, cls.active)
+        try:
+            await asyncio.sleep(0.01)
+        finally:
+            cls.active -= 1
+        if value.startswith('bad'):
+            raise drf_serializers.ValidationError('Bad image.')
+        return value
+
+    async def validate(self, attrs):
+        await asyncio.sleep(0)
+        if attrs['image'] == 'forbidden.png':
+            raise drf_serializers.ValidationError('Forbidden.')
+        return attrs
+
+
+class AsyncProfileSerializer(serializers.ProfileSerializer):
+    avatars = AsyncAvatarSerializer(many=True)
+
+
+class AsyncUserSerializer(serializers.UserSerializer):
+    profile = AsyncProfileSerializer(required=False, allow_null=True)
+
+
+def get_user_data(images):
+    return {
+        'username': 'test',
+        'profile': {
+            'access_key': {'key': 'key'},
+            'sites': [],
+            'avatars': [{'image': image} for image in images],
+            'message_set': [],
+        },
+    }
+
+
+class AsyncValidatorsTest(TestCase):
+    def setUp(self):
+        AsyncAvatarSerializer.max_active = 0
+        AsyncAvatarSerializer.calls = 0
+
+    def test_concurrency_is_bounded(self):
+        serializer = AsyncUserSerializer(data=get_user_data([
+            'image-{}.png'.format(i) for i in range(10)]))
+        self.assertTrue(serializer.is_valid())
+
+        self.assertEqual(AsyncAvatarSerializer.calls, 10)
+        self.assertEqual(AsyncAvatarSerializer.max_active, 3)
+
+    def test_errors_by_index(self):
+        serializer = AsyncUserSerializer(data=get_user_data([
+            'image-1.png', 'bad.png', None, 'forbidden.png', 'bad-2.png']))
+        self.assertFalse(serializer.is_valid())
+
+        self.assertEqual(serializer.errors, {'profile': {'avatars': [
+            {},
+            {'image': ['Bad image.']},
+            {'image': ['This field may not be null.']},
+            {'non_field_errors': ['Forbidden.']},
+            {'image': ['Bad image.']},
+        ]}})
+
+    def test_save(self):
+        serializer = AsyncUserSerializer(data=get_user_data([
+            'image-1.png', 'image-2.png']))
+        serializer.is_valid(raise_exception=True)
+        user = serializer.save()
+
+        self.assertEqual(
+            sorted(user.profile.avatars.values_list('image', flat=True)),
+            ['image-1.png', 'image-2.png'])
+        self.assertEqual(
+            models.Avatar.objects.count(), 2)
+
+    def test_validation_from_async_code(self):
+        async def validate():
+            serializer = AsyncUserSerializer(data=get_user_data([
+                'image-1.png', 'bad.png']))
+            return serializer.is_valid(), serializer.errors
+
+        is_valid, errors = asyncio.run(validate())
+        self.assertFalse(is_valid)
+        self.assertEqual(
+            errors['profile']['avatars'][1], {'image': ['Bad image.']})
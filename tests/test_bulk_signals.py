@@ -0,0 +1,163 @@
+from django.db.models.signals import m2m_changed, post_save
+from django.test import TestCase
+from rest_framework.exceptions import ValidationError
+
+from drf_writable_nested.batch import WriteStrategy
+from drf_writable_nested.signals import nested_bulk_saved
+
+from . import (
+    models,
+    serializers,
+)
+
+
+class SignalFreeUserSerializer(serializers.UserSerializer):
+    class Meta(serializers.UserSerializer.Meta):
+        send_nested_bulk_saved = True
+
+
+class SignalFreeForeignKeyChildSerializer(
+        serializers.ReverseForeignKeyChildSerializer):
+    class Meta(serializers.ReverseForeignKeyChildSerializer.Meta):
+        send_nested_bulk_saved = True
+
+
+class BulkSignalsTest(TestCase):
+    def setUp(self):
+        self.saved = []
+        self.bulk_saved = {}
+
+        def on_save(sender, instance, **kwargs):
+            self.saved.append(instance)
+
+        def on_bulk_save(sender, created, updated, deleted_pks, **kwargs):
+            self.bulk_saved[sender] = (created, updated, deleted_pks)
+
+        post_save.connect(on_save, sender=models.Message)
+        nested_bulk_saved.connect(on_bulk_save)
+        self.addCleanup(post_save.disconnect, on_save, sender=models.Message)
+        self.addCleanup(nested_bulk_saved.disconnect, on_bulk_save)
+
+    def get_initial_data(self):
+        return {
+            'username': 'test',
+            'profile': {
+                'access_key': {'key': 'key'},
+                'sites': [{'url': 'http://google.com'}],
+                'avatars': [{'image': 'image-1.png'}],
+                'message_set': [
+                    {'message': 'Message 1'},
+                    {'message': 'Message 2'},
+                ],
+            },
+        }
+
+    def test_create(self):
+        serializer = SignalFreeUserSerializer(data=self.get_initial_data())
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        # Receivers don't prevent bulk writes, which send no signals
+        self.assertEqual(self.saved, [])
+        self.assertEqual(
+            serializer.write_strategies['ProfileSerializer.message_set'],
+            WriteStrategy('bulk'))
+        created, updated, deleted_pks = self.bulk_saved[models.Message]
+        self.assertEqual(
+            sorted(message.message for message in created),
+            ['Message 1', 'Message 2'])
+        self.assertEqual((updated, deleted_pks), ([], []))
+        # Rows saved one by one send their signals as usual and are
+        # reported too
+        user = serializer.instance
+        self.assertEqual(self.bulk_saved[models.User], ([user], [], []))
+        self.assertNotIn('send', vars(post_save))
+
+    def test_rows_saved_one_by_one_are_reported(self):
+        serializer = SignalFreeUserSerializer(data=self.get_initial_data())
+        serializer.is_valid(raise_exception=True)
+        user = serializer.save()
+
+        # The profile has nested relations of its own
+        created, updated, deleted_pks = self.bulk_saved[models.Profile]
+        self.assertEqual(created, [user.profile])
+        self.assertEqual((updated, deleted_pks), ([], []))
+        created = self.bulk_saved[models.AccessKey][0]
+        self.assertEqual(created, [user.profile.access_key])
+
+        data = serializers.UserSerializer(user).data
+        data['username'] = 'new'
+        self.bulk_saved.clear()
+        serializer = SignalFreeUserSerializer(instance=user, data=data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        # Unchanged rows aren't reported
+        self.assertEqual(self.bulk_saved[models.User], ([], [user], []))
+        self.assertNotIn(models.Profile, self.bulk_saved)
+
+    def test_update(self):
+        serializer = SignalFreeUserSerializer(data=self.get_initial_data())
+        serializer.is_valid(raise_exception=True)
+        user = serializer.save()
+        first, second = user.profile.message_set.order_by('message')
+        data = serializers.UserSerializer(user).data
+        data['profile']['message_set'] = [
+            {'pk': str(first.pk), 'message': 'New message'},
+            {'message': 'Message 3'},
+        ]
+        self.bulk_saved.clear()
+
+        serializer = SignalFreeUserSerializer(instance=user, data=data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        self.assertEqual(self.saved, [])
+        created, updated, deleted_pks = self.bulk_saved[models.Message]
+        self.assertEqual(
+            [message.message for message in created], ['Message 3'])
+        self.assertEqual([message.pk for message in updated], [first.pk])
+        self.assertEqual(deleted_pks, [second.pk])
+
+    def test_m2m_changed_is_sent(self):
+        actions = []
+
+        def on_m2m_changed(sender, action, pk_set, **kwargs):
+            actions.append((action, pk_set))
+
+        m2m_changed.connect(
+            on_m2m_changed, sender=models.Profile.sites.through)
+        self.addCleanup(
+            m2m_changed.disconnect, on_m2m_changed,
+            sender=models.Profile.sites.through)
+        serializer = SignalFreeUserSerializer(data=self.get_initial_data())
+        serializer.is_valid(raise_exception=True)
+        user = serializer.save()
+
+        site = user.profile.sites.get()
+        self.assertEqual(actions, [
+            ('pre_add', {site.pk}), ('post_add', {site.pk})])
+        self.assertEqual(self.bulk_saved[models.Site], ([site], [], []))
+
+    def test_signals_are_sent_without_the_option(self):
+        serializer = serializers.UserSerializer(data=self.get_initial_data())
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        self.assertEqual(len(self.saved), 2)
+        self.assertEqual(self.bulk_saved, {})
+
+    def test_failed_save(self):
+        serializer = SignalFreeForeignKeyChildSerializer(data={
+            'parents': [{}, {'raise_error': True}],
+        })
+        serializer.is_valid(raise_exception=True)
+        with self.assertRaises(ValidationError):
+            serializer.save()
+
+        self.assertEqual(self.bulk_saved, {})
+        # Signals of the following saves are sent again
+        serializer = serializers.UserSerializer(data=self.get_initial_data())
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        self.assertEqual(len(self.saved), 2)
@@ -0,0 +1,140 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from . import (
+    models,
+    serializers,
+)
+
+
+class ContentHashTest(TestCase):
+    def create_article(self):
+        serializer = serializers.ArticleSerializer(data={
+            'title': 'article',
+            'sections': [
+                {
+                    'title': 'section {}'.format(i),
+                    'paragraphs': [
+                        {'text': 'paragraph {}.{}'.format(i, j)}
+                        for j in range(3)
+                    ],
+                }
+                for i in range(3)
+            ],
+        })
+        serializer.is_valid(raise_exception=True)
+        return serializer.save()
+
+    def get_data(self, article):
+        return serializers.ArticleSerializer(
+            models.Article.objects.get(pk=article.pk)).data
+
+    def test_hashes_are_stored(self):
+        article = self.create_article()
+        self.assertIsNotNone(article.content_hash)
+        self.assertEqual(
+            models.Article.objects.get().content_hash, article.content_hash)
+        self.assertFalse(models.ArticleSection.objects.filter(
+            content_hash__isnull=True).exists())
+
+    def test_unchanged_document(self):
+        article = self.create_article()
+        data = self.get_data(article)
+
+        serializer = serializers.ArticleSerializer(
+            instance=article, data=data)
+        with self.assertNumQueries(0):
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+        self.assertEqual(serializer.write_result['status'], 'unchanged')
+
+    def test_unchanged_subtrees_are_skipped(self):
+        article = self.create_article()
+        data = self.get_data(article)
+        data['sections'][1]['paragraphs'][0]['text'] = 'changed'
+        unchanged_pks = [
+            data['sections'][0]['pk'], data['sections'][2]['pk']]
+        old_hash = models.ArticleSection.objects.get(
+            pk=data['sections'][1]['pk']).content_hash
+
+        serializer = serializers.ArticleSerializer(
+            instance=article, data=data)
+        with CaptureQueriesContext(connection) as ctx:
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+
+        paragraph_queries = [
+            query['sql'] for query in ctx.captured_queries
+            if 'tests_articleparagraph' in query['sql']
+        ]
+        # Paragraphs of unchanged sections are neither read nor written
+        for sql in paragraph_queries:
+            for pk in unchanged_pks:
+                self.assertNotIn('"section_id" = {}'.format(pk), sql)
+                self.assertNotIn('"section_id" IN ({})'.format(pk), sql)
+        self.assertEqual(
+            [result['status']
+             for result in serializer.write_result['sections']],
+            ['unchanged', 'unchanged', 'unchanged'])
+        self.assertEqual(
+            [result['status'] for result in
+             serializer.write_result['sections'][1]['paragraphs']],
+            ['updated', 'unchanged', 'unchanged'])
+        self.assertEqual(
+            models.ArticleParagraph.objects.filter(text='changed').count(), 1)
+        self.assertNotEqual(
+            models.ArticleSection.objects.get(
+                pk=data['sections'][1]['pk']).content_hash, old_hash)
+
+        # The stored hashes match the new content
+        serializer = serializers.ArticleSerializer(
+            instance=article, data=self.get_data(article))
+        with self.assertNumQueries(0):
+            serializer.is_valid(raise_exception=True)
+
+    def test_partial_update_clears_hash(self):
+        article = self.create_article()
+        serializer = serializers.ArticleSerializer(
+            instance=article, data={'title': 'new'}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        self.assertIsNone(models.Article.objects.get().content_hash)
+
+    def test_saving_a_section_clears_article_hash(self):
+        article = self.create_article()
+        data = self.get_data(article)
+        section = models.ArticleSection.objects.get(
+            pk=data['sections'][0]['pk'])
+
+        serializer = serializers.ArticleSectionSerializer(
+            instance=section, data={'title': 'renamed'}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        self.assertIsNone(models.Article.objects.get().content_hash)
+
+        # The original document is saved again
+        serializer = serializers.ArticleSerializer(
+            instance=models.Article.objects.get(), data=data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        self.assertEqual(
+            serializer.write_result['sections'][0]['status'], 'updated')
+        self.assertEqual(
+            models.ArticleSection.objects.get(pk=section.pk).title,
+            'section 0')
+        self.assertIsNotNone(models.Article.objects.get().content_hash)
+
+    def test_unchanged_children_have_validated_values(self):
+        article = self.create_article()
+        data = self.get_data(article)
+        data['title'] = 'changed'
+
+        serializer = serializers.ArticleSerializer(
+            instance=article, data=data)
+        serializer.is_valid(raise_exception=True)
+        self.assertEqual(
+            [dict(section) for section in
+             serializer.validated_data['sections']],
+            [{'title': 'section {}'.format(i)} for i in range(3)])
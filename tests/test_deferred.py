@@ -0,0 +1,136 @@
+from django.db import transaction
+from django.test import TransactionTestCase
+from rest_framework.exceptions import ValidationError
+
+from drf_writable_nested.deferred import (
+    BaseDeferredBackend, DeferredJob, ThreadPoolBackend)
+
+from . import (
+    models,
+    serializers,
+)
+from .utils import shared_database
+
+
+backend = ThreadPoolBackend(max_workers=1)
+
+
+class RecordingBackend(BaseDeferredBackend):
+    def __init__(self):
+        self.jobs = []
+
+    def submit(self, job):
+        self.jobs.append(job)
+
+
+recording_backend = RecordingBackend()
+
+
+class DeferredChildSerializer(serializers.ReverseForeignKeyChildSerializer):
+    class Meta(serializers.ReverseForeignKeyChildSerializer.Meta):
+        deferred_fields = ('parents',)
+        deferred_backend = backend
+
+
+class RecordingChildSerializer(DeferredChildSerializer):
+    class Meta(DeferredChildSerializer.Meta):
+        deferred_backend = recording_backend
+
+
+@shared_database
+class DeferredFieldsTest(TransactionTestCase):
+    databases = {'shared'}
+
+    def setUp(self):
+        recording_backend.jobs = []
+
+    def test_create(self):
+        serializer = DeferredChildSerializer(data={'parents': [{}, {}]})
+        serializer.is_valid(raise_exception=True)
+        child = serializer.save()
+
+        job_id = serializer.data['deferred_job']
+        self.assertEqual(serializer.write_result['deferred_job'], job_id)
+        self.assertEqual(backend.get_result(job_id, timeout=10), child)
+        self.assertEqual(child.parents.count(), 2)
+
+    def test_update(self):
+        child = models.ForeignKeyChild.objects.create()
+        parent = models.ForeignKeyParent.objects.create(child=child)
+        models.ForeignKeyParent.objects.create(child=child)
+
+        serializer = DeferredChildSerializer(instance=child, data={
+            'parents': [{'id': parent.pk}, {}],
+        })
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        backend.get_result(serializer.data['deferred_job'], timeout=10)
+        parents = list(child.parents.order_by('pk'))
+        self.assertEqual(len(parents), 2)
+        self.assertEqual(parents[0], parent)
+
+    def test_submitted_on_commit(self):
+        serializer = RecordingChildSerializer(data={'parents': [{}]})
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic(using='shared'):
+            serializer.save()
+            self.assertEqual(recording_backend.jobs, [])
+
+        job, = recording_backend.jobs
+        self.assertEqual(job.id, serializer.data['deferred_job'])
+        self.assertEqual(models.ForeignKeyParent.objects.count(), 0)
+
+        job = DeferredJob.from_dict(job.to_dict())
+        self.assertIs(job.serializer_class, RecordingChildSerializer)
+        job.run()
+        self.assertEqual(models.ForeignKeyParent.objects.count(), 1)
+
+    def test_rolled_back(self):
+        serializer = RecordingChildSerializer(data={'parents': [{}]})
+        serializer.is_valid(raise_exception=True)
+        with self.assertRaises(RuntimeError), \
+                transaction.atomic(using='shared'):
+            serializer.save()
+            raise RuntimeError
+
+        self.assertEqual(recording_backend.jobs, [])
+
+    def test_failed_job(self):
+        serializer = DeferredChildSerializer(data={
+            'parents': [{}, {'raise_error': True}],
+        })
+        serializer.is_valid(raise_exception=True)
+        with self.assertLogs('drf_writable_nested.deferred', 'ERROR') as logs:
+            serializer.save()
+            job_id = serializer.data['deferred_job']
+            with self.assertRaises(ValidationError) as ctx:
+                backend.get_result(job_id, timeout=10)
+            # Done callbacks run after the result is set
+            backend.shutdown()
+        self.assertIn('Deferred job <DeferredJob {0}'.format(job_id),
+                      logs.output[0])
+        self.assertEqual(ctx.exception.detail, {
+            'parents': [{}, {'raise_error': ['should be False']}],
+        })
+        # The job is saved in one transaction
+        self.assertEqual(models.ForeignKeyParent.objects.count(), 0)
+        self.assertEqual(models.ForeignKeyChild.objects.count(), 1)
+
+    def test_unclaimed_results_are_bounded(self):
+        limited_backend = ThreadPoolBackend(max_workers=1, max_results=2)
+        self.addCleanup(limited_backend.shutdown)
+        child = models.ForeignKeyChild.objects.create()
+        jobs = [
+            DeferredJob(DeferredChildSerializer, child.pk, {'parents': []})
+            for i in range(4)
+        ]
+        for job in jobs:
+            limited_backend.submit(job)
+        limited_backend.shutdown()
+
+        # Results of the oldest jobs which nobody asked for are dropped
+        with self.assertRaises(KeyError):
+            limited_backend.get_result(jobs[0].id)
+        self.assertEqual(limited_backend.get_result(jobs[3].id), child)
+        self.assertEqual(list(limited_backend._futures), [jobs[2].id])
@@ -0,0 +1,97 @@
+from django.test import TestCase
+from rest_framework import serializers as drf_serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.fields import empty
+
+from . import serializers
+
+
+class CountingAvatarSerializer(serializers.AvatarSerializer):
+    calls = 0
+    instance_calls = 0
+
+    def run_validation(self, data=empty):
+        CountingAvatarSerializer.calls += 1
+        if self.instance is not None:
+            CountingAvatarSerializer.instance_calls += 1
+        return super(CountingAvatarSerializer, self).run_validation(data)
+
+    def validate(self, attrs):
+        # Fails only when an existing avatar is validated on save
+        if self.instance is not None and attrs['image'] == 'locked.png':
+            raise drf_serializers.ValidationError('Locked.')
+        return attrs
+
+
+class BudgetProfileSerializer(serializers.ProfileSerializer):
+    avatars = CountingAvatarSerializer(many=True)
+
+    class Meta(serializers.ProfileSerializer.Meta):
+        nested_error_budget = {'avatars': 2}
+
+
+class BudgetUserSerializer(serializers.UserSerializer):
+    profile = BudgetProfileSerializer(required=False, allow_null=True)
+
+
+def get_user_data(images):
+    return {
+        'username': 'test',
+        'profile': {
+            'access_key': {'key': 'key'},
+            'sites': [],
+            'avatars': [{'image': image} for image in images],
+            'message_set': [],
+        },
+    }
+
+
+class ErrorBudgetTest(TestCase):
+    def setUp(self):
+        CountingAvatarSerializer.calls = 0
+        CountingAvatarSerializer.instance_calls = 0
+
+    def test_validation_stops(self):
+        serializer = BudgetUserSerializer(
+            data=get_user_data(['image.png'] * 3 + [None] * 1000))
+        self.assertFalse(serializer.is_valid())
+
+        self.assertEqual(CountingAvatarSerializer.calls, 5)
+        self.assertEqual(serializer.errors, {'profile': {'avatars': {
+            3: {'image': ['This field may not be null.']},
+            4: {'image': ['This field may not be null.']},
+            'non_field_errors': ['Validation stopped after 2 invalid items.'],
+        }}})
+
+    def test_errors_within_budget(self):
+        serializer = BudgetUserSerializer(
+            data=get_user_data(['image.png', None, 'image.png', None]))
+        self.assertFalse(serializer.is_valid())
+
+        self.assertEqual(CountingAvatarSerializer.calls, 4)
+        self.assertEqual(serializer.errors, {'profile': {'avatars': {
+            1: {'image': ['This field may not be null.']},
+            3: {'image': ['This field may not be null.']},
+        }}})
+
+    def test_errors_on_save(self):
+        serializer = BudgetUserSerializer(
+            data=get_user_data(['image-{}.png'.format(i) for i in range(4)]))
+        serializer.is_valid(raise_exception=True)
+        user = serializer.save()
+
+        data = serializers.UserSerializer(user).data
+        for avatar in data['profile']['avatars']:
+            avatar['image'] = 'locked.png'
+        serializer = BudgetUserSerializer(instance=user, data=data)
+        serializer.is_valid(raise_exception=True)
+        with self.assertRaises(ValidationError) as ctx:
+            serializer.save()
+
+        # Children after the spent budget aren't validated
+        self.assertEqual(CountingAvatarSerializer.instance_calls, 2)
+        self.assertEqual(ctx.exception.detail, {'profile': {'avatars': {
+            0: {'non_field_errors': ['Locked.']},
+            1: {'non_field_errors': ['Locked.']},
+            'non_field_errors': ['Validation stopped after 2 invalid items.'],
+        }}})
@@ -0,0 +1,243 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase
+
+from drf_writable_nested.loaders import (
+    JSONLinesLoader, ParallelJSONLinesLoader, load_jsonl)
+
+from . import (
+    models,
+    serializers,
+)
+from .utils import shared_database
+
+
+def get_user_data(username):
+    return {
+        'username': username,
+        'profile': {
+            'access_key': {
+                'key': 'key',
+            },
+            'sites': [
+                {
+                    'url': 'http://google.com',
+                },
+            ],
+            'avatars': [
+                {
+                    'image': 'image-1.png',
+                },
+            ],
+            'message_set': [
+                {
+                    'message': 'Message 1'
+                },
+            ]
+        },
+    }
+
+
+def to_jsonl(records):
+    return io.StringIO(''.join(
+        (record if isinstance(record, str) else json.dumps(record)) + '\n'
+        for record in records
+    ))
+
+
+class CrashingUserSerializer(serializers.UserSerializer):
+    def create(self, validated_data):
+        if validated_data['username'] == 'crash':
+            raise RuntimeError('crash')
+        return super(CrashingUserSerializer, self).create(validated_data)
+
+
+class JSONLinesLoaderTest(TestCase):
+    def test_load(self):
+        source = to_jsonl([
+            get_user_data('user-{}'.format(i)) for i in range(5)])
+        result = load_jsonl(source, serializers.UserSerializer, chunk_size=2)
+
+        self.assertEqual(result.loaded, 5)
+        self.assertEqual(result.rejected, 0)
+        self.assertEqual(result.chunks, 3)
+        self.assertEqual(models.User.objects.count(), 5)
+        self.assertEqual(models.Avatar.objects.count(), 5)
+        self.assertEqual(models.Message.objects.count(), 5)
+        for user in models.User.objects.all():
+            self.assertEqual(user.profile.sites.count(), 1)
+
+    def test_rejects(self):
+        invalid = get_user_data('invalid')
+        invalid['profile']['avatars'][0]['image'] = None
+        rejects = io.StringIO()
+        result = load_jsonl(to_jsonl([
+            get_user_data('user-1'),
+            '{not json',
+            invalid,
+            get_user_data('user-2'),
+        ]), serializers.UserSerializer, reject_file=rejects)
+
+        self.assertEqual(result.loaded, 2)
+        self.assertEqual(result.rejected, 2)
+        self.assertEqual(
+            sorted(models.User.objects.values_list('username', flat=True)),
+            ['user-1', 'user-2'])
+
+        rejects = [json.loads(line) for line in rejects.getvalue().split(
+            '\n') if line]
+        self.assertEqual([reject['line'] for reject in rejects], [2, 3])
+        self.assertEqual(rejects[0]['record'], '{not json')
+        self.assertEqual(rejects[1]['record'], invalid)
+        self.assertEqual(rejects[1]['errors'], {
+            'profile': {
+                'avatars': [
+                    {'image': ['This field may not be null.']},
+                ],
+            },
+        })
+
+    def test_failed_save_rolls_back_only_failed_record(self):
+        rejects = io.StringIO()
+        result = load_jsonl(to_jsonl([
+            {'parents': [{}]},
+            {'parents': [{}, {'raise_error': True}]},
+            {'parents': [{}, {}]},
+        ]), serializers.ReverseForeignKeyChildSerializer,
+            reject_file=rejects)
+
+        self.assertEqual(result.loaded, 2)
+        self.assertEqual(result.rejected, 1)
+        self.assertEqual(models.ForeignKeyChild.objects.count(), 2)
+        self.assertEqual(models.ForeignKeyParent.objects.count(), 3)
+        reject = json.loads(rejects.getvalue())
+        self.assertEqual(reject['line'], 2)
+        self.assertEqual(reject['errors'], {
+            'parents': [{}, {'raise_error': ['should be False']}],
+        })
+
+    def test_update_existing(self):
+        load_jsonl(to_jsonl([get_user_data('user')]),
+                   serializers.UserSerializer)
+        user = models.User.objects.get()
+        data = get_user_data('user-new')
+        data['pk'] = user.pk
+
+        with self.assertNumQueries(1):
+            instances = JSONLinesLoader(
+                serializers.UserSerializer).get_instances([(1, data)])
+        self.assertEqual(instances, {str(user.pk): user})
+
+        result = load_jsonl(to_jsonl([data]), serializers.UserSerializer)
+        self.assertEqual(result.loaded, 1)
+        self.assertEqual(models.User.objects.get().username, 'user-new')
+
+
+class LoadNestedJSONLinesCommandTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_command(self):
+        source = os.path.join(self.directory, 'users.jsonl')
+        reject_file = os.path.join(self.directory, 'rejects.jsonl')
+        with io.open(source, 'w', encoding='utf-8') as f:
+            f.write(to_jsonl([
+                get_user_data('user-1'),
+                {'username': None},
+            ]).getvalue())
+
+        stdout = io.StringIO()
+        call_command(
+            'load_nested_jsonl', 'tests.serializers.UserSerializer', source,
+            '--chunk-size', '10', '--reject-file', reject_file,
+            stdout=stdout)
+
+        self.assertIn('Loaded 1 records, rejected 1', stdout.getvalue())
+        self.assertEqual(models.User.objects.get().username, 'user-1')
+        with io.open(reject_file, encoding='utf-8') as f:
+            self.assertEqual(json.loads(f.read())['line'], 2)
+
+
+@shared_database
+class LoadNestedJSONLinesParallelCommandTest(TransactionTestCase):
+    databases = {'shared'}
+
+    def test_command(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        source = os.path.join(directory, 'users.jsonl')
+        with io.open(source, 'w', encoding='utf-8') as f:
+            f.write(to_jsonl([
+                get_user_data('user-{}'.format(i)) for i in range(4)
+            ]).getvalue())
+
+        stdout = io.StringIO()
+        call_command(
+            'load_nested_jsonl', 'tests.serializers.UserSerializer', source,
+            '--workers', '2', '--partition-key', 'username', stdout=stdout)
+
+        self.assertIn('Loaded 4 records, rejected 0', stdout.getvalue())
+        self.assertEqual(models.User.objects.count(), 4)
+
+
+@shared_database
+class ParallelJSONLinesLoaderTest(TransactionTestCase):
+    databases = {'shared'}
+
+    def test_load(self):
+        invalid = get_user_data('invalid')
+        invalid['profile']['avatars'][0]['image'] = None
+        records = [
+            get_user_data('user-{}'.format(i)) for i in range(20)]
+        records.insert(5, invalid)
+        rejects = io.StringIO()
+
+        result = ParallelJSONLinesLoader(
+            serializers.UserSerializer, workers=3, partition_key='username',
+            chunk_size=4, reject_file=rejects,
+        ).load(to_jsonl(records))
+
+        self.assertEqual(result.loaded, 20)
+        self.assertEqual(result.rejected, 1)
+        self.assertEqual(result.failed, [])
+        self.assertEqual(len(result.partitions), 3)
+        self.assertEqual(models.User.objects.count(), 20)
+        self.assertEqual(models.Avatar.objects.count(), 20)
+        self.assertEqual(json.loads(rejects.getvalue())['line'], 6)
+
+    def test_partition(self):
+        loader = ParallelJSONLinesLoader(
+            serializers.UserSerializer, workers=4)
+        line = json.dumps({'pk': 10, 'username': 'user'})
+        partition = loader.get_partition(1, line)
+        self.assertEqual(loader.get_partition(2, line), partition)
+        self.assertEqual(loader.get_partition(
+            3, json.dumps({'id': 10, 'username': 'other'})), partition)
+        # Records without the key are distributed by line number
+        self.assertEqual(loader.get_partition(5, '{"username": "new"}'), 1)
+        self.assertEqual(loader.get_partition(6, '{not json'), 2)
+
+    def test_failed_partition(self):
+        result = ParallelJSONLinesLoader(
+            CrashingUserSerializer, workers=2, chunk_size=1,
+            partition_key=lambda record: record['username'],
+        ).load(to_jsonl([
+            get_user_data('user-1'),
+            get_user_data('crash'),
+            get_user_data('user-2'),
+        ]))
+
+        failed = result.failed
+        self.assertEqual(len(failed), 1)
+        self.assertIn('RuntimeError: crash', failed[0].error)
+        # Chunks committed before the failure stay saved
+        self.assertGreaterEqual(result.loaded, 1)
+        self.assertEqual(models.User.objects.count(), result.loaded)
@@ -0,0 +1,193 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.exceptions import ValidationError
+
+from drf_writable_nested.mixins import NestedListSerializer
+
+from . import (
+    models,
+    serializers,
+)
+
+
+def get_queries(ctx, prefix):
+    return [
+        query['sql'] for query in ctx.captured_queries
+        if query['sql'].startswith(prefix)
+    ]
+
+
+class NestedListSerializerTest(TestCase):
+    def get_initial_data(self, username):
+        return {
+            'username': username,
+            'profile': {
+                'access_key': {
+                    'key': 'key-{}'.format(username),
+                },
+                'sites': [
+                    {
+                        'url': 'http://google.com',
+                    },
+                ],
+                'avatars': [
+                    {
+                        'image': 'image-1.png',
+                    },
+                    {
+                        'image': 'image-2.png',
+                    },
+                ],
+                'message_set': [
+                    {
+                        'message': 'Message 1'
+                    },
+                    {
+                        'message': 'Message 2'
+                    },
+                ]
+            },
+        }
+
+    def create_users(self, count):
+        serializer = serializers.UserSerializer(data=[
+            self.get_initial_data('user-{}'.format(i)) for i in range(count)
+        ], many=True)
+        serializer.is_valid(raise_exception=True)
+        return serializer.save()
+
+    def test_default_list_serializer(self):
+        serializer = serializers.UserSerializer(many=True)
+        self.assertIsInstance(serializer, NestedListSerializer)
+
+    def test_nested_list_of_plain_children(self):
+        serializer = serializers.UserSerializer(
+            data=self.get_initial_data('user'))
+        avatars = serializer.fields['profile'].fields['avatars']
+        self.assertIsInstance(avatars, NestedListSerializer)
+        self.assertIs(avatars.child.parent, avatars)
+
+        serializer.is_valid(raise_exception=True)
+        # Validation leaves no hooks on the list or its child
+        self.assertNotIn('to_internal_value', vars(avatars))
+        self.assertNotIn('run_validation', vars(avatars.child))
+        for field in avatars.child.fields.values():
+            self.assertNotIn('to_internal_value', vars(field))
+
+    def test_create_many(self):
+        serializer = serializers.UserSerializer(data=[
+            self.get_initial_data('user-{}'.format(i)) for i in range(3)
+        ], many=True)
+        serializer.is_valid(raise_exception=True)
+        with CaptureQueriesContext(connection) as ctx:
+            users = serializer.save()
+
+        with self.assertNumQueries(0):
+            data = serializer.data
+        self.assertEqual(len(data), 3)
+
+        self.assertEqual(
+            [user.username for user in users],
+            ['user-0', 'user-1', 'user-2'])
+        for user in users:
+            user.refresh_from_db()
+            self.assertEqual(
+                user.profile.access_key.key, 'key-{}'.format(user.username))
+            self.assertEqual(user.profile.avatars.count(), 2)
+            self.assertEqual(user.profile.message_set.count(), 2)
+            self.assertEqual(user.profile.sites.count(), 1)
+        # Messages have pks before insert, so all of them are inserted
+        # with one query
+        self.assertEqual(
+            len(get_queries(ctx, 'INSERT INTO "tests_message"')), 1)
+
+    def test_update_many(self):
+        users = self.create_users(3)
+        data = serializers.UserSerializer(users, many=True).data
+        for item in data:
+            item['username'] = item['username'] + '-new'
+            item['profile']['avatars'] = item['profile']['avatars'][:1]
+            item['profile']['avatars'][0]['image'] = 'new-image.png'
+        data.append(self.get_initial_data('user-3'))
+
+        serializer = serializers.UserSerializer(
+            instance=models.User.objects.all(), data=data, many=True)
+        serializer.is_valid(raise_exception=True)
+        with CaptureQueriesContext(connection) as ctx:
+            users = serializer.save()
+
+        self.assertEqual(
+            [user.username for user in users],
+            ['user-0-new', 'user-1-new', 'user-2-new', 'user-3'])
+        self.assertEqual(models.User.objects.count(), 4)
+        self.assertEqual(models.Avatar.objects.count(), 5)
+        self.assertEqual(
+            models.Avatar.objects.filter(image='new-image.png').count(), 3)
+        # Avatars of all parents are fetched, updated and deleted together:
+        # lookup, pks to delete and the instances collected by `delete()`
+        self.assertEqual(len(get_queries(ctx, 'SELECT "tests_avatar"')), 3)
+        self.assertEqual(len(get_queries(ctx, 'UPDATE "tests_avatar"')), 1)
+        self.assertEqual(
+            len(get_queries(ctx, 'DELETE FROM "tests_avatar"')), 1)
+
+    def test_errors_of_many(self):
+        data = [self.get_initial_data('user-{}'.format(i)) for i in range(2)]
+        data[1]['profile']['avatars'][1]['image'] = None
+        serializer = serializers.UserSerializer(data=data, many=True)
+        with self.assertRaises(ValidationError):
+            serializer.is_valid(raise_exception=True)
+
+        serializer = serializers.ReverseForeignKeyChildSerializer(data=[
+            {'parents': [{}]},
+            {'parents': [{}, {'raise_error': True}]},
+        ], many=True)
+        serializer.is_valid(raise_exception=True)
+        with self.assertRaises(ValidationError) as ctx:
+            serializer.save()
+
+        self.assertEqual(ctx.exception.detail, [
+            {},
+            {'parents': [{}, {'raise_error': ['should be False']}]},
+        ])
+
+    def test_update_generic_relation_of_many(self):
+        serializer = serializers.TaggedItemSerializer(data=[
+            {'tags': [{'tag': 'a{}'.format(i)}, {'tag': 'b{}'.format(i)}]}
+            for i in range(3)
+        ], many=True)
+        serializer.is_valid(raise_exception=True)
+        items = serializer.save()
+
+        data = []
+        for item in items:
+            tags = list(item.tags.order_by('pk'))
+            data.append({'pk': item.pk, 'tags': [
+                {'pk': tags[0].pk, 'tag': tags[0].tag},
+                {'pk': tags[1].pk, 'tag': tags[1].tag + '-new'},
+            ]})
+        data[0]['tags'] = data[0]['tags'][:1]
+
+        serializer = serializers.TaggedItemSerializer(
+            instance=models.TaggedItem.objects.all(), data=data, many=True)
+        serializer.is_valid(raise_exception=True)
+        with CaptureQueriesContext(connection) as ctx:
+            serializer.save()
+
+        self.assertEqual(models.TaggedItem.objects.count(), 3)
+        self.assertEqual(
+            sorted(models.Tag.objects.values_list('tag', flat=True)),
+            ['a0', 'a1', 'a2', 'b1-new', 'b2-new'])
+        # One update of the changed column only
+        updates = get_queries(ctx, 'UPDATE "tests_tag"')
+        self.assertEqual(len(updates), 1)
+        self.assertNotIn('content_type_id', updates[0])
+        self.assertNotIn('object_id', updates[0])
+        # Removed tags of all items are found with one query by
+        # `(content_type, object_id__in)`
+        scans = get_queries(ctx, 'SELECT "tests_tag"."id", '
+                                 '"tests_tag"."object_id"')
+        self.assertEqual(len(scans), 1)
+        self.assertIn('"tests_tag"."content_type_id" =', scans[0])
+        self.assertIn('"tests_tag"."object_id" IN', scans[0])
+        self.assertEqual(len(get_queries(ctx, 'DELETE FROM "tests_tag"')), 1)
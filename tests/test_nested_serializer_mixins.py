@@ -5,6 +5,7 @@ from django.contrib.auth import get_user_model
 from django.db import models
 from django.test import TestCase
 from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
 
 from drf_writable_nested import mixins
 
@@ -181,6 +182,43 @@ class WritableNestedModelSerializerTest(TestCase):
         serializer.save()
 
 
+class ParentManyMatchOnNameSerializer(mixins.RelatedSaveMixin,
+                                      serializers.ModelSerializer):
+    class Meta:
+        model = ParentMany
+        fields = '__all__'
+    children = ChildSerializer(many=True, match_on=['name'])
+
+
+class IdentityMapTest(TestCase):
+
+    def test_repeated_match_saved_once(self):
+        data = {
+            "children": [
+                {"name": "test"},
+                {"name": "test"},
+                {"name": "other"},
+            ]
+        }
+
+        serializer = ParentManyMatchOnNameSerializer(data=data)
+        serializer.is_valid(raise_exception=True)
+        parent = serializer.save()
+
+        self.assertEqual(2, Child.objects.count())
+        self.assertEqual(2, parent.children.count())
+
+    def test_identity_map_conflicting_data(self):
+        identity_map = mixins.IdentityMap()
+        child = Child(pk=1, name='test')
+        identity_map.add(Child, {'pk': 1}, child, {'name': 'test'})
+
+        self.assertIs(child, identity_map.get(Child, '1', {'name': 'test'}))
+        self.assertIs(child, identity_map.get(Child, 1, {}))
+        with self.assertRaises(ValidationError):
+            identity_map.get(Child, 1, {'name': 'other'})
+
+
 ###################
 # 3-Layer Relation
 ###################
@@ -0,0 +1,106 @@
+from django.test import TestCase
+
+from . import serializers
+
+
+class LimitedUserSerializer(serializers.UserSerializer):
+    class Meta(serializers.UserSerializer.Meta):
+        payload_limits = {'nodes': 20, 'depth': 2}
+
+
+class TinyPayloadUserSerializer(serializers.UserSerializer):
+    class Meta(serializers.UserSerializer.Meta):
+        payload_limits = {'nodes': 3}
+
+
+class FailFastUserSerializer(serializers.UserSerializer):
+    class Meta(serializers.UserSerializer.Meta):
+        payload_limits = {'nodes': 5}
+        payload_limit_action = 'fail_fast'
+
+
+def get_user_data(avatars=2):
+    return {
+        'username': 'test',
+        'profile': {
+            'access_key': {'key': 'key'},
+            'sites': [{'url': 'http://google.com'}],
+            'avatars': [
+                {'image': 'image-{}.png'.format(i)} for i in range(avatars)],
+            'message_set': [{'message': 'Message 1'}],
+        },
+    }
+
+
+class PayloadCostTest(TestCase):
+    def test_estimate(self):
+        cost = serializers.UserSerializer().estimate_cost(get_user_data())
+
+        self.assertEqual(cost.levels, [1, 1, 5])
+        self.assertEqual(cost.nodes, 7)
+        self.assertEqual(cost.depth, 2)
+        # The root, 3 queries per nested field and a query per single
+        # child, which is saved by its serializer
+        self.assertEqual(cost.queries, 1 + 3 * 5 + 3)
+
+    def test_estimate_tree(self):
+        cost = serializers.CategorySerializer().estimate_cost({
+            'name': 'root',
+            'children': [
+                {'name': 'a', 'children': [{'name': 'a1'}, {'name': 'a2'}]},
+                {'name': 'b', 'children': [{'name': 'b1'}]},
+            ],
+        })
+        self.assertEqual(cost.levels, [1, 2, 3])
+
+    def test_within_limits(self):
+        serializer = LimitedUserSerializer(data=get_user_data())
+        self.assertTrue(serializer.is_valid())
+        self.assertEqual(serializer.payload_cost.nodes, 7)
+
+    def test_rejected(self):
+        serializer = LimitedUserSerializer(data=get_user_data(avatars=1000))
+        with self.assertNumQueries(0):
+            self.assertFalse(serializer.is_valid())
+
+        self.assertEqual(serializer.errors, {'non_field_errors': [
+            'Payload exceeds the limit of 20 nodes (1005).',
+        ]})
+
+    def test_rejected_many(self):
+        # Every root is within the limit, the list as a whole is not
+        serializer = TinyPayloadUserSerializer(data=[
+            {'username': 'user-{}'.format(i)} for i in range(50)
+        ], many=True)
+        with self.assertNumQueries(0):
+            self.assertFalse(serializer.is_valid())
+
+        self.assertEqual(serializer.errors, {'non_field_errors': [
+            'Payload exceeds the limit of 3 nodes (50).',
+        ]})
+
+    def test_estimate_many(self):
+        serializer = LimitedUserSerializer(
+            data=[get_user_data(), {'username': 'other'}], many=True)
+        self.assertTrue(serializer.is_valid())
+
+        self.assertEqual(serializer.payload_cost.levels, [2, 1, 5])
+        self.assertEqual(serializer.payload_cost.queries, 2 + 3 * 5 + 3)
+
+    def test_fail_fast(self):
+        data = get_user_data(avatars=10)
+        for avatar in data['profile']['avatars'][2:]:
+            avatar['image'] = None
+        serializer = FailFastUserSerializer(data=data)
+        self.assertFalse(serializer.is_valid())
+
+        self.assertEqual(serializer.errors['profile']['avatars'], {
+            2: {'image': ['This field may not be null.']},
+            'non_field_errors': ['Validation stopped after 1 invalid items.'],
+        })
+
+    def test_valid_payload_isnt_downgraded(self):
+        serializer = FailFastUserSerializer(data=get_user_data(avatars=10))
+        serializer.is_valid(raise_exception=True)
+        user = serializer.save()
+        self.assertEqual(user.profile.avatars.count(), 10)
@@ -0,0 +1,162 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.exceptions import ValidationError
+
+from . import (
+    models,
+    serializers,
+)
+
+
+def get_queries(ctx, prefix):
+    return [
+        query['sql'] for query in ctx.captured_queries
+        if query['sql'].startswith(prefix)
+    ]
+
+
+class TreeSerializerTest(TestCase):
+    def get_initial_data(self):
+        return {
+            'name': 'root',
+            'children': [
+                {
+                    'name': 'a',
+                    'children': [
+                        {'name': 'a1'},
+                        {'name': 'a2', 'children': [{'name': 'a2x'}]},
+                    ],
+                },
+                {
+                    'name': 'b',
+                    'children': [{'name': 'b1'}],
+                },
+            ],
+        }
+
+    def create_tree(self):
+        serializer = serializers.CategorySerializer(
+            data=self.get_initial_data())
+        serializer.is_valid(raise_exception=True)
+        return serializer.save()
+
+    def test_create(self):
+        serializer = serializers.CategorySerializer(
+            data=self.get_initial_data())
+        serializer.is_valid(raise_exception=True)
+        with CaptureQueriesContext(connection) as ctx:
+            root = serializer.save()
+
+        # The root and one bulk insert per level
+        self.assertEqual(
+            len(get_queries(ctx, 'INSERT INTO "tests_category"')), 4)
+        self.assertEqual(models.Category.objects.count(), 7)
+        a2 = models.Category.objects.get(name='a2')
+        self.assertEqual(a2.parent.name, 'a')
+        self.assertEqual(a2.parent.parent, root)
+        self.assertEqual(
+            list(a2.children.values_list('name', flat=True)), ['a2x'])
+
+        with self.assertNumQueries(0):
+            data = serializer.data
+        self.assertEqual(
+            [child['name'] for child in data['children']], ['a', 'b'])
+        self.assertEqual(
+            data['children'][0]['children'][1]['children'][0]['name'], 'a2x')
+
+    def test_optimized_queryset(self):
+        self.create_tree()
+        queryset = serializers.CategorySerializer().get_optimized_queryset(
+            models.Category.objects.filter(parent=None))
+
+        # The roots plus one query per level up to `tree_max_depth` and
+        # one more for the children of the deepest nodes
+        with self.assertNumQueries(5):
+            data = serializers.CategorySerializer(queryset, many=True).data
+        a, b = data[0]['children']
+        self.assertEqual(
+            [child['name'] for child in a['children']], ['a1', 'a2'])
+        self.assertEqual(a['children'][1]['children'][0]['name'], 'a2x')
+        self.assertEqual(b['children'][0]['name'], 'b1')
+
+    def test_update(self):
+        root = self.create_tree()
+        data = serializers.CategorySerializer(
+            models.Category.objects.get(pk=root.pk)).data
+        a, b = data['children']
+        a2 = a['children'][1]
+        # Rename `a`, move `a2` under `b`, remove `a1` and `b1`
+        a['name'] = 'a-new'
+        a['children'] = []
+        b['children'] = [a2, {'name': 'b2'}]
+
+        serializer = serializers.CategorySerializer(instance=root, data=data)
+        serializer.is_valid(raise_exception=True)
+        with CaptureQueriesContext(connection) as ctx:
+            serializer.save()
+
+        # The root and one bulk update per level with changed nodes, removed
+        # subtrees are deleted together
+        self.assertEqual(len(get_queries(ctx, 'UPDATE "tests_category"')), 3)
+        self.assertEqual(
+            len(get_queries(ctx, 'INSERT INTO "tests_category"')), 1)
+        self.assertEqual(
+            len(get_queries(ctx, 'DELETE FROM "tests_category"')), 1)
+        self.assertEqual(
+            sorted(models.Category.objects.values_list('name', flat=True)),
+            ['a-new', 'a2', 'a2x', 'b', 'b2', 'root'])
+        self.assertEqual(
+            models.Category.objects.get(name='a2').parent.name, 'b')
+        self.assertEqual(
+            models.Category.objects.get(name='a2x').parent.name, 'a2')
+
+        results = serializer.write_result['children']
+        self.assertEqual(
+            [result['status'] for result in results], ['updated', 'unchanged'])
+        self.assertEqual(
+            [result['status'] for result in results[0]['children']],
+            ['deleted'])
+        self.assertEqual(
+            [result['status'] for result in results[1]['children']],
+            ['updated', 'created', 'deleted'])
+
+    def test_omitted_children_are_kept(self):
+        root = self.create_tree()
+        serializer = serializers.CategorySerializer(instance=root, data={
+            'name': 'root',
+            'children': [
+                {'pk': str(child.pk), 'name': child.name}
+                for child in root.children.all()
+            ],
+        })
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        self.assertEqual(models.Category.objects.count(), 7)
+
+    def test_limits(self):
+        data = {'name': 'root', 'children': [
+            {'name': '1', 'children': [
+                {'name': '2', 'children': [
+                    {'name': '3', 'children': [
+                        {'name': '4'},
+                    ]},
+                ]},
+            ]},
+        ]}
+        serializer = serializers.CategorySerializer(data=data)
+        with self.assertRaises(ValidationError) as ctx:
+            serializer.is_valid(raise_exception=True)
+        self.assertEqual(ctx.exception.detail, {
+            'children': ['Tree depth exceeds the limit of 3.'],
+        })
+
+        serializer = serializers.CategorySerializer(data={
+            'name': 'root',
+            'children': [{'name': str(i)} for i in range(20)],
+        })
+        self.assertFalse(serializer.is_valid())
+        self.assertEqual(serializer.errors, {
+            'children': ['Number of tree nodes exceeds the limit of 20.'],
+        })
@@ -1,8 +1,18 @@
 import uuid
+from unittest import mock
+
 from rest_framework.exceptions import ValidationError
-from django.test import TestCase
+from django.core.exceptions import MultipleObjectsReturned
+from django.test import TestCase, TransactionTestCase
 from django.http.request import QueryDict
-from django.db import transaction
+from django.db import OperationalError, connection, transaction
+from django.db.models import QuerySet
+from django.db.models.signals import post_save
+from django.test.utils import CaptureQueriesContext
+
+from drf_writable_nested import RetryPolicy, WritableNestedModelSerializer
+from drf_writable_nested.batch import WriteStrategy
+from drf_writable_nested.mixins import RelatedFieldCache
 
 from .utils import get_sample_file
 
@@ -894,3 +904,918 @@ class WritableNestedModelSerializerTest(TestCase):
 
         self.assertTrue(models.Document.objects.filter(pk=doc.pk).exists())
         self.assertEqual(doc.page.title, 'some page')
+
+    def test_nested_list_related_fields_resolved_in_batch(self):
+        avatars = [
+            models.Avatar.objects.create(
+                image='image-{}.png'.format(i),
+                profile=models.Profile.objects.create(
+                    user=models.User.objects.create(username='owner')),
+            )
+            for i in range(3)
+        ]
+        data = {
+            'name': 'team',
+            'members': [
+                {'username': 'user-{}'.format(i), 'user_avatar': avatar.pk}
+                for i, avatar in enumerate(avatars * 2)
+            ],
+        }
+        serializer = serializers.TeamWithMembersSerializer(data=data)
+        with CaptureQueriesContext(connection) as ctx:
+            serializer.is_valid(raise_exception=True)
+            team = serializer.save()
+
+        avatar_selects = [
+            query for query in ctx.captured_queries
+            if query['sql'].startswith('SELECT') and
+            'FROM "tests_avatar"' in query['sql']
+        ]
+        # One lookup during validation which is reused on save
+        self.assertEqual(len(avatar_selects), 1)
+        self.assertEqual(team.members.count(), 6)
+        self.assertSetEqual(
+            set(team.members.values_list('user_avatar', flat=True)),
+            {avatar.pk for avatar in avatars})
+
+    def test_nested_list_related_fields_keep_item_errors(self):
+        avatar = models.Avatar.objects.create(
+            image='image.png',
+            profile=models.Profile.objects.create(
+                user=models.User.objects.create(username='owner')),
+        )
+        serializer = serializers.TeamWithMembersSerializer(data={
+            'name': 'team',
+            'members': [
+                {'username': 'first', 'user_avatar': avatar.pk},
+                {'username': 'second', 'user_avatar': avatar.pk + 100},
+                {'username': 'third', 'user_avatar': 'wrong'},
+                {'username': 'fourth', 'avatar_image': 'missing.png'},
+            ],
+        })
+        self.assertFalse(serializer.is_valid())
+        errors = serializer.errors['members']
+        self.assertEqual(errors[0], {})
+        self.assertEqual(errors[1]['user_avatar'][0].code, 'does_not_exist')
+        self.assertEqual(errors[2]['user_avatar'][0].code, 'incorrect_type')
+        self.assertEqual(errors[3]['avatar_image'][0].code, 'does_not_exist')
+
+    def test_nested_list_related_fields_ambiguous_slug(self):
+        profile = models.Profile.objects.create(
+            user=models.User.objects.create(username='owner'))
+        unique = models.Avatar.objects.create(
+            image='unique.png', profile=profile)
+        for _ in range(2):
+            models.Avatar.objects.create(image='shared.png', profile=profile)
+        field = serializers.TeamMemberSerializer().fields['avatar_image']
+        cache = RelatedFieldCache(field, ['unique.png', 'shared.png'])
+
+        self.assertEqual(
+            cache.to_internal_value(field, 'unique.png'), unique)
+        # The slug matches many rows, the field's own lookup decides
+        with self.assertRaises(MultipleObjectsReturned):
+            cache.to_internal_value(field, 'shared.png')
+
+    def test_update_same_related_object_saved_once(self):
+        site = models.Site.objects.create(url='http://google.com')
+        profile = models.Profile.objects.create(
+            user=models.User.objects.create(username='test'))
+        data = {
+            'access_key': None,
+            'sites': [
+                {'pk': site.pk, 'url': 'http://new.com'},
+                {'pk': site.pk, 'url': 'http://new.com'},
+                {'pk': site.pk},
+            ],
+            'avatars': [],
+            'message_set': [],
+        }
+        serializer = serializers.ProfileSerializer(
+            instance=profile, data=data, partial=True)
+        serializer.is_valid(raise_exception=True)
+        with CaptureQueriesContext(connection) as ctx:
+            profile = serializer.save()
+
+        site_updates = [
+            query for query in ctx.captured_queries
+            if query['sql'].startswith('UPDATE "tests_site"')
+        ]
+        self.assertEqual(len(site_updates), 1)
+        self.assertEqual(
+            list(profile.sites.values_list('url', flat=True)),
+            ['http://new.com'])
+
+    def test_update_same_related_object_with_conflicting_data(self):
+        site = models.Site.objects.create(url='http://google.com')
+        profile = models.Profile.objects.create(
+            user=models.User.objects.create(username='test'))
+        serializer = serializers.ProfileSerializer(instance=profile, data={
+            'access_key': None,
+            'sites': [
+                {'pk': site.pk, 'url': 'http://first.com'},
+                {'pk': site.pk, 'url': 'http://second.com'},
+            ],
+            'avatars': [],
+            'message_set': [],
+        })
+        serializer.is_valid(raise_exception=True)
+        with self.assertRaises(ValidationError) as ctx:
+            serializer.save()
+
+        errors = ctx.exception.detail['sites']
+        self.assertEqual(errors[0], {})
+        self.assertEqual(
+            errors[1]['non_field_errors'][0].code, 'conflicting_identity')
+
+    def test_identical_sub_payloads_validated_once(self):
+        serializers.DeterministicTagSerializer.validated_tags = []
+        serializer = serializers.MemoizedTaggedItemSerializer(data={
+            'tags': [{'tag': 'same'} for _ in range(5)] + [{'tag': 'other'}],
+        })
+        serializer.is_valid(raise_exception=True)
+        item = serializer.save()
+
+        self.assertEqual(
+            serializers.DeterministicTagSerializer.validated_tags,
+            ['same', 'other'])
+        self.assertEqual(item.tags.count(), 6)
+        self.assertEqual(item.tags.filter(tag='same').count(), 5)
+
+    def test_identical_sub_payloads_reuse_errors(self):
+        serializers.DeterministicTagSerializer.validated_tags = []
+        serializer = serializers.MemoizedTaggedItemSerializer(data={
+            'tags': [{'tag': 'invalid'}, {'tag': 'valid'}, {'tag': 'invalid'}],
+        })
+        self.assertFalse(serializer.is_valid())
+        self.assertEqual(
+            serializers.DeterministicTagSerializer.validated_tags,
+            ['invalid', 'valid'])
+        errors = serializer.errors['tags']
+        self.assertEqual(errors[0], {'tag': ['Invalid tag']})
+        self.assertEqual(errors[1], {})
+        self.assertEqual(errors[2], {'tag': ['Invalid tag']})
+
+    def test_optimized_queryset_renders_without_n_plus_one(self):
+        for i in range(3):
+            data = self.get_initial_data()
+            data['username'] = 'user-{}'.format(i)
+            serializer = serializers.UserSerializer(data=data)
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+
+        expected = serializers.UserSerializer(
+            models.User.objects.order_by('pk'), many=True).data
+        queryset = serializers.UserSerializer().get_optimized_queryset(
+            models.User.objects.order_by('pk'))
+        # One query for users with profiles, access keys and avatars
+        # plus one per prefetched relation: sites, avatars and messages
+        with self.assertNumQueries(4):
+            data = serializers.UserSerializer(queryset, many=True).data
+        self.assertEqual(data, expected)
+
+    def test_optimized_queryset_with_generic_relation(self):
+        for i in range(3):
+            serializer = serializers.TaggedItemSerializer(data={
+                'tags': [{'tag': 'first'}, {'tag': 'second'}],
+            })
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+
+        queryset = serializers.TaggedItemSerializer().get_optimized_queryset()
+        with self.assertNumQueries(2):
+            data = serializers.TaggedItemSerializer(queryset, many=True).data
+        self.assertEqual(
+            [[tag['tag'] for tag in item['tags']] for item in data],
+            [['first', 'second']] * 3)
+
+    def test_create_response_needs_no_queries(self):
+        serializer = serializers.UserSerializer(data=self.get_initial_data())
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        with self.assertNumQueries(0):
+            data = serializer.data
+        self.assertEqual(
+            [site['url'] for site in data['profile']['sites']],
+            ['http://google.com', 'http://yahoo.com'])
+        self.assertEqual(
+            [avatar['image'] for avatar in data['profile']['avatars']],
+            ['image-1.png', 'image-2.png'])
+        self.assertEqual(len(data['profile']['message_set']), 3)
+
+    def test_update_response_needs_no_queries(self):
+        serializer = serializers.UserSerializer(data=self.get_initial_data())
+        serializer.is_valid(raise_exception=True)
+        user = serializer.save()
+        avatar = user.profile.avatars.earliest('pk')
+
+        serializer = serializers.UserSerializer(instance=user, data={
+            'username': 'new',
+            'profile': {
+                'access_key': None,
+                'sites': [{'url': 'http://new-site.com'}],
+                'avatars': [
+                    {'image': 'new-image.png'},
+                    {'pk': avatar.pk, 'image': 'old-image.png'},
+                ],
+                'message_set': [],
+            },
+        })
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        with self.assertNumQueries(0):
+            data = serializer.data
+        self.assertEqual(
+            [site['url'] for site in data['profile']['sites']],
+            ['http://new-site.com'])
+        self.assertEqual(
+            [avatar['image'] for avatar in data['profile']['avatars']],
+            ['new-image.png', 'old-image.png'])
+        self.assertEqual(data['profile']['message_set'], [])
+
+    def test_create_generic_relation_response_needs_no_queries(self):
+        serializer = serializers.TaggedItemSerializer(data={
+            'tags': [{'tag': 'first'}, {'tag': 'second'}],
+        })
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        with self.assertNumQueries(0):
+            data = serializer.data
+        self.assertEqual(
+            [tag['tag'] for tag in data['tags']], ['first', 'second'])
+
+    def test_slim_response(self):
+        serializer = serializers.SlimUserSerializer(
+            data=self.get_initial_data())
+        serializer.is_valid(raise_exception=True)
+        user = serializer.save()
+        profile = user.profile
+        avatars = list(profile.avatars.order_by('pk'))
+
+        self.assertEqual(serializer.data['pk'], user.pk)
+        self.assertEqual(serializer.data['status'], 'created')
+        self.assertEqual(serializer.data['profile']['pk'], profile.pk)
+        self.assertEqual(
+            serializer.data['profile']['avatars'],
+            [{'pk': avatar.pk, 'status': 'created'} for avatar in avatars])
+
+        serializer = serializers.SlimUserSerializer(instance=user, data={
+            'username': 'test',
+            'profile': {
+                'access_key': None,
+                'sites': [],
+                'avatars': [
+                    {'pk': avatars[0].pk, 'image': avatars[0].image},
+                    {'pk': avatars[1].pk, 'image': 'new-image.png'},
+                    {'image': 'image-3.png'},
+                ],
+                'message_set': [],
+            },
+        })
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        new_avatar = profile.avatars.latest('pk')
+
+        self.assertEqual(serializer.data['status'], 'unchanged')
+        self.assertEqual(serializer.data['profile']['status'], 'updated')
+        self.assertEqual(serializer.data['profile']['avatars'], [
+            {'pk': avatars[0].pk, 'status': 'unchanged'},
+            {'pk': avatars[1].pk, 'status': 'updated'},
+            {'pk': new_avatar.pk, 'status': 'created'},
+        ])
+        self.assertEqual(
+            [message['status']
+             for message in serializer.data['profile']['message_set']],
+            ['deleted'] * 3)
+
+    def test_stream_reverse_relation(self):
+        serializer = serializers.UserSerializer(data=self.get_initial_data())
+        serializer.is_valid(raise_exception=True)
+        user = serializer.save()
+        profile = user.profile
+        avatars = list(profile.avatars.order_by('pk'))
+
+        def iter_avatars():
+            yield {'pk': avatars[0].pk, 'image': avatars[0].image}
+            yield {'pk': avatars[1].pk, 'image': 'new-image.png'}
+            for i in range(5):
+                yield {'image': 'image-{}.png'.format(i + 3)}
+
+        serializer = serializers.ProfileSerializer(instance=profile)
+        # Every batch of 3 avatars costs one lookup query
+        with CaptureQueriesContext(connection) as ctx:
+            counts = serializer.save_reverse_relation_stream(
+                'avatars', iter_avatars(), batch_size=3)
+
+        self.assertEqual(counts, {
+            'created': 5, 'updated': 1, 'unchanged': 1, 'deleted': 0})
+        self.assertEqual(len([
+            query for query in ctx.captured_queries
+            if query['sql'].startswith('SELECT "tests_avatar"."id"')
+        ]), 2)
+        self.assertEqual(profile.avatars.count(), 7)
+        self.assertEqual(
+            models.Avatar.objects.get(pk=avatars[1].pk).image,
+            'new-image.png')
+
+    def test_stream_reverse_relation_deletes_missing(self):
+        serializer = serializers.UserSerializer(data=self.get_initial_data())
+        serializer.is_valid(raise_exception=True)
+        user = serializer.save()
+        profile = user.profile
+        avatar = profile.avatars.order_by('pk').first()
+        sites = list(profile.sites.all())
+
+        serializer = serializers.ProfileSerializer(instance=profile)
+        counts = serializer.save_reverse_relation_stream('avatars', iter([
+            {'pk': avatar.pk, 'image': avatar.image},
+            {'image': 'new-image.png'},
+        ]), batch_size=1)
+        self.assertEqual(counts['deleted'], 1)
+        self.assertEqual(
+            sorted(profile.avatars.values_list('image', flat=True)),
+            [avatar.image, 'new-image.png'])
+
+        counts = serializer.save_reverse_relation_stream('sites', iter([
+            {'url': 'http://yahoo.com'},
+        ]))
+        self.assertEqual(counts, {
+            'created': 1, 'updated': 0, 'unchanged': 0, 'deleted': 2})
+        self.assertEqual(
+            list(profile.sites.values_list('url', flat=True)),
+            ['http://yahoo.com'])
+        # Removed from the relation only
+        self.assertEqual(models.Site.objects.filter(
+            pk__in=[site.pk for site in sites]).count(), 2)
+
+        # Create mode keeps children which weren't streamed
+        serializer = serializers.ProfileSerializer()
+        counts = serializer.save_reverse_relation_stream(
+            'avatars', iter([{'image': 'image-3.png'}]), instance=profile)
+        self.assertEqual(counts['deleted'], 0)
+        self.assertEqual(profile.avatars.count(), 3)
+
+    def test_stream_reverse_relation_errors(self):
+        serializer = serializers.UserSerializer(data=self.get_initial_data())
+        serializer.is_valid(raise_exception=True)
+        profile = serializer.save().profile
+
+        serializer = serializers.ProfileSerializer(instance=profile)
+        with self.assertRaises(ValidationError) as ctx:
+            serializer.save_reverse_relation_stream('avatars', iter([
+                {'image': 'image-3.png'},
+                {'image': 'image-4.png'},
+                {'image': 'image-5.png'},
+                {'image': None},
+            ]), batch_size=2)
+
+        self.assertEqual(ctx.exception.detail, {
+            'avatars': {3: {'image': ['This field may not be null.']}},
+        })
+        # The first batch is already saved
+        self.assertEqual(profile.avatars.count(), 4)
+
+    def test_nested_ordering(self):
+        serializer = serializers.PlaylistSerializer(data={
+            'name': 'playlist',
+            'tracks': [{'title': str(i)} for i in range(50)],
+        })
+        serializer.is_valid(raise_exception=True)
+        playlist = serializer.save()
+        self.assertEqual(
+            list(playlist.tracks.values_list('position', flat=True)),
+            list(range(50)))
+
+        # Move one track
+        data = serializers.PlaylistSerializer(
+            models.Playlist.objects.get(pk=playlist.pk)).data
+        tracks = data['tracks']
+        tracks.insert(20, tracks.pop(10))
+        serializer = serializers.PlaylistSerializer(
+            instance=playlist, data=data)
+        serializer.is_valid(raise_exception=True)
+        with CaptureQueriesContext(connection) as ctx:
+            serializer.save()
+
+        updates = [
+            query['sql'] for query in ctx.captured_queries
+            if query['sql'].startswith('UPDATE "tests_track"')
+        ]
+        # Only the moved track and the tracks between are written
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(updates[0].count('WHEN'), 11)
+        self.assertEqual(
+            list(playlist.tracks.values_list('title', flat=True)),
+            [track['title'] for track in tracks])
+        self.assertEqual(
+            [result['status']
+             for result in serializer.write_result['tracks']].count(
+                'updated'), 11)
+
+    def test_nested_ordering_with_new_and_removed(self):
+        serializer = serializers.PlaylistSerializer(data={
+            'name': 'playlist',
+            'tracks': [{'title': 'a'}, {'title': 'b'}, {'title': 'c'}],
+        })
+        serializer.is_valid(raise_exception=True)
+        playlist = serializer.save()
+        a, b, c = playlist.tracks.all()
+
+        serializer = serializers.PlaylistSerializer(instance=playlist, data={
+            'name': 'playlist',
+            'tracks': [
+                {'pk': c.pk, 'title': 'c'},
+                {'title': 'new'},
+                {'pk': a.pk, 'title': 'a'},
+            ],
+        })
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        self.assertEqual(
+            list(playlist.tracks.values_list('title', flat=True)),
+            ['c', 'new', 'a'])
+
+    def create_playlist(self, titles):
+        serializer = serializers.PlaylistSerializer(data={
+            'name': 'playlist',
+            'tracks': [{'title': title} for title in titles],
+        })
+        serializer.is_valid(raise_exception=True)
+        return serializer.save()
+
+    def test_nested_delta(self):
+        playlist = self.create_playlist(str(i) for i in range(10))
+        tracks = list(playlist.tracks.all())
+        other = self.create_playlist(['other'])
+
+        serializer = serializers.PlaylistSerializer(
+            instance=playlist, partial=True, data={
+                'tracks': {
+                    'add': [{'title': 'new'}],
+                    'update': [{'pk': tracks[2].pk, 'title': '2-new'}],
+                    'remove': [tracks[3].pk, str(tracks[4].pk)],
+                    'move': [{'pk': tracks[9].pk, 'position': 3}],
+                },
+            })
+        serializer.is_valid(raise_exception=True)
+        with CaptureQueriesContext(connection) as ctx:
+            serializer.save()
+
+        selects = [
+            query['sql'] for query in ctx.captured_queries
+            if query['sql'].startswith('SELECT') and
+            'tests_track' in query['sql']
+        ]
+        # Only referenced tracks and the last position are read
+        self.assertTrue(all(
+            ' IN (' in sql or 'MAX(' in sql for sql in selects), selects)
+        self.assertEqual(
+            list(playlist.tracks.values_list('title', 'position')), [
+                ('0', 0), ('1', 1), ('2-new', 2), ('9', 3), ('5', 5),
+                ('6', 6), ('7', 7), ('8', 8), ('new', 10),
+            ])
+        self.assertEqual(other.tracks.get().title, 'other')
+        self.assertEqual(
+            [(result['pk'], result['status'])
+             for result in serializer.write_result['tracks']], [
+                (tracks[2].pk, 'updated'),
+                (playlist.tracks.get(title='new').pk, 'created'),
+                (tracks[9].pk, 'updated'),
+                (tracks[3].pk, 'deleted'),
+                (tracks[4].pk, 'deleted'),
+            ])
+        self.assertEqual(len(serializer.data['tracks']), 9)
+
+    def test_nested_delta_errors(self):
+        playlist = self.create_playlist(['a'])
+        track = playlist.tracks.get()
+        other = self.create_playlist(['other']).tracks.get()
+
+        serializer = serializers.PlaylistSerializer(
+            instance=playlist, partial=True,
+            data={'tracks': {'replace': []}})
+        self.assertFalse(serializer.is_valid())
+        self.assertEqual(serializer.errors, {
+            'tracks': ['Unknown operations: replace.'],
+        })
+
+        serializer = serializers.PlaylistSerializer(
+            instance=playlist, partial=True, data={'tracks': {
+                'add': [{'title': 'new'}, {'title': ''}],
+                'update': [{'title': 'no pk'}],
+                'remove': [None],
+                'move': [{'pk': track.pk, 'position': -1}],
+            }})
+        self.assertFalse(serializer.is_valid())
+        self.assertEqual(serializer.errors, {'tracks': {
+            'add': {1: {'title': ['This field may not be blank.']}},
+            'update': {0: {'pk': ['This field is required.']}},
+            'remove': {
+                0: ['Incorrect type. Expected pk value, received NoneType.'],
+            },
+            'move': {0: {
+                'position': [
+                    'Ensure this value is greater than or equal to 0.'],
+            }},
+        }})
+
+        # Children of other parents can't be referenced
+        serializer = serializers.PlaylistSerializer(
+            instance=playlist, partial=True, data={'tracks': {
+                'add': [{'title': 'new'}],
+                'remove': [other.pk],
+            }})
+        serializer.is_valid(raise_exception=True)
+        with self.assertRaises(ValidationError) as ctx:
+            serializer.save()
+        self.assertEqual(ctx.exception.detail, {'tracks': {
+            'remove': {0: [
+                'Invalid pk "{0}" - object does not exist.'.format(other.pk)],
+            },
+        }})
+        self.assertEqual(
+            list(playlist.tracks.values_list('title', flat=True)), ['a'])
+        self.assertTrue(models.Track.objects.filter(pk=other.pk).exists())
+
+        serializer = serializers.PlaylistSerializer(data={
+            'name': 'new', 'tracks': {'add': [{'title': 'a'}]}})
+        serializer.is_valid(raise_exception=True)
+        with self.assertRaises(ValidationError) as ctx:
+            serializer.save()
+        self.assertEqual(ctx.exception.detail, {
+            'tracks': [
+                'Operations can be applied only to an existing instance.'],
+        })
+
+    def test_nested_delta_references_children_once(self):
+        playlist = self.create_playlist(['a', 'b'])
+        a, b = playlist.tracks.all()
+
+        serializer = serializers.PlaylistSerializer(
+            instance=playlist, partial=True, data={'tracks': {
+                'update': [{'pk': a.pk, 'title': 'zombie'}],
+                'remove': [a.pk, b.pk, str(b.pk)],
+                'move': [{'pk': str(a.pk), 'position': 5}],
+            }})
+        self.assertFalse(serializer.is_valid())
+        conflicting = 'Pk "{0}" is referenced by more than one operation.'
+        self.assertEqual(serializer.errors, {'tracks': {
+            'update': {0: {'pk': [conflicting.format(a.pk)]}},
+            'remove': {
+                0: [conflicting.format(a.pk)],
+                2: ['Duplicate pk "{0}".'.format(b.pk)],
+            },
+            'move': {0: {'pk': [conflicting.format(a.pk)]}},
+        }})
+        self.assertEqual(
+            list(playlist.tracks.values_list('title', flat=True)), ['a', 'b'])
+
+    def test_nested_delta_move_to_taken_position(self):
+        playlist = self.create_playlist(['a', 'b', 'c'])
+        a, b, c = playlist.tracks.all()
+
+        serializer = serializers.PlaylistSerializer(
+            instance=playlist, partial=True, data={'tracks': {
+                'add': [{'title': 'd'}],
+                'move': [
+                    {'pk': c.pk, 'position': 0},
+                    {'pk': b.pk, 'position': 3},
+                    {'pk': a.pk, 'position': 3},
+                ],
+            }})
+        self.assertFalse(serializer.is_valid())
+        self.assertEqual(serializer.errors, {'tracks': {'move': {
+            2: {'position': ['Position 3 is given to more than one child.']},
+        }}})
+
+        serializer = serializers.PlaylistSerializer(
+            instance=playlist, partial=True, data={'tracks': {
+                'add': [{'title': 'd'}],
+                'move': [
+                    {'pk': c.pk, 'position': 0},
+                    {'pk': b.pk, 'position': 3},
+                ],
+            }})
+        serializer.is_valid(raise_exception=True)
+        with self.assertRaises(ValidationError) as ctx:
+            serializer.save()
+        self.assertEqual(ctx.exception.detail, {'tracks': {'move': {
+            0: {'position': [
+                "Position 0 is taken by a child which isn't moved."]},
+            1: {'position': [
+                "Position 3 is taken by a child which isn't moved."]},
+        }}})
+        self.assertEqual(
+            list(playlist.tracks.values_list('title', flat=True)),
+            ['a', 'b', 'c'])
+
+        # Moved children can swap their positions
+        serializer = serializers.PlaylistSerializer(
+            instance=playlist, partial=True, data={'tracks': {
+                'remove': [b.pk],
+                'move': [
+                    {'pk': c.pk, 'position': 0},
+                    {'pk': a.pk, 'position': 1},
+                ],
+            }})
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        self.assertEqual(
+            list(playlist.tracks.values_list('title', 'position')),
+            [('c', 0), ('a', 1)])
+
+    def test_save_is_atomic(self):
+        serializer = serializers.ReverseForeignKeyChildSerializer(data={
+            'parents': [{}, {'raise_error': True}],
+        })
+        serializer.is_valid(raise_exception=True)
+        with self.assertRaises(ValidationError):
+            serializer.save()
+
+        # The child and the first parent are rolled back
+        self.assertEqual(models.ForeignKeyChild.objects.count(), 0)
+        self.assertEqual(models.ForeignKeyParent.objects.count(), 0)
+
+    def test_failed_nested_level_keeps_collecting_errors(self):
+        # Nested levels are saved by their own `save()` in the transaction
+        # of the root
+        class ParentSerializer(WritableNestedModelSerializer):
+            class Meta:
+                model = models.ForeignKeyParent
+                fields = ('id',)
+
+            def create(self, validated_data):
+                super(ParentSerializer, self).create(validated_data)
+                raise ValidationError({'id': ['failed']})
+
+        class ChildSerializer(serializers.ReverseForeignKeyChildSerializer):
+            parents = ParentSerializer(many=True)
+
+        serializer = ChildSerializer(data={'parents': [{}, {}]})
+        serializer.is_valid(raise_exception=True)
+        with self.assertRaises(ValidationError) as ctx:
+            serializer.save()
+
+        # The first failure doesn't break the transaction, the root rolls
+        # it back once
+        self.assertEqual(ctx.exception.detail, {
+            'parents': [{'id': ['failed']}, {'id': ['failed']}],
+        })
+        self.assertEqual(models.ForeignKeyChild.objects.count(), 0)
+        self.assertEqual(models.ForeignKeyParent.objects.count(), 0)
+
+    def test_save_without_transaction(self):
+        class NonAtomicSerializer(
+                serializers.ReverseForeignKeyChildSerializer):
+            class Meta(serializers.ReverseForeignKeyChildSerializer.Meta):
+                atomic = False
+
+        serializer = NonAtomicSerializer(data={
+            'parents': [{}, {'raise_error': True}],
+        })
+        serializer.is_valid(raise_exception=True)
+        with self.assertRaises(ValidationError):
+            serializer.save()
+
+        self.assertEqual(models.ForeignKeyChild.objects.count(), 1)
+        self.assertEqual(models.ForeignKeyParent.objects.count(), 1)
+
+    def test_nested_levels_dont_create_savepoints(self):
+        # A custom `create` makes the profile saved by its own `save()`
+        class ProfileSerializer(serializers.ProfileSerializer):
+            def create(self, validated_data):
+                return super(ProfileSerializer, self).create(validated_data)
+
+        class UserSerializer(serializers.UserSerializer):
+            profile = ProfileSerializer(required=False, allow_null=True)
+
+        serializer = UserSerializer(data=self.get_initial_data())
+        serializer.is_valid(raise_exception=True)
+        with CaptureQueriesContext(connection) as ctx:
+            serializer.save()
+
+        savepoints = [
+            query['sql'] for query in ctx.captured_queries
+            if query['sql'].startswith('SAVEPOINT')
+        ]
+        # Only the root serializer creates a savepoint inside the test
+        # transaction
+        self.assertEqual(len(savepoints), 1)
+
+    def test_lock_rows(self):
+        class LockingUserSerializer(serializers.UserSerializer):
+            class Meta(serializers.UserSerializer.Meta):
+                lock_rows = True
+
+        serializer = serializers.UserSerializer(data=self.get_initial_data())
+        serializer.is_valid(raise_exception=True)
+        user = serializer.save()
+        data = serializers.UserSerializer(user).data
+        data['profile']['avatars'][0]['image'] = 'new-image.png'
+        data['profile']['avatars'].append({'image': 'image-3.png'})
+
+        locked = []
+        select_for_update = QuerySet.select_for_update
+
+        def record_select_for_update(queryset, *args, **kwargs):
+            locked.append(queryset.model)
+            return select_for_update(queryset, *args, **kwargs)
+
+        serializer = LockingUserSerializer(instance=user, data=data)
+        serializer.is_valid(raise_exception=True)
+        with mock.patch.object(QuerySet, 'select_for_update',
+                               record_select_for_update), \
+                CaptureQueriesContext(connection) as ctx:
+            serializer.save()
+
+        # One query per model in the order of labels, rows ordered by pk
+        self.assertEqual(locked, [
+            models.AccessKey, models.Avatar, models.Message, models.Profile,
+            models.Site, models.User,
+        ])
+        self.assertEqual(len([
+            query for query in ctx.captured_queries
+            if 'ORDER BY "tests_avatar"."id" ASC' in query['sql']
+        ]), 1)
+        self.assertEqual(
+            sorted(user.profile.avatars.values_list('image', flat=True)),
+            ['image-2.png', 'image-3.png', 'new-image.png'])
+
+    def test_lock_rows_of_deleted_children(self):
+        class LockingUserSerializer(serializers.UserSerializer):
+            class Meta(serializers.UserSerializer.Meta):
+                lock_rows = True
+
+        user = self.save_user().instance
+        data = serializers.UserSerializer(user).data
+        # The first avatar is deleted, the username is changed concurrently
+        removed = data['profile']['avatars'].pop(0)
+        models.User.objects.filter(pk=user.pk).update(username='concurrent')
+        del data['username']
+
+        serializer = LockingUserSerializer(
+            instance=user, data=data, partial=True)
+        serializer.is_valid(raise_exception=True)
+        with CaptureQueriesContext(connection) as ctx:
+            saved_user = serializer.save()
+
+        avatar_locks = [
+            query['sql'] for query in ctx.captured_queries
+            if 'ORDER BY "tests_avatar"."id" ASC' in query['sql']
+        ]
+        self.assertEqual(len(avatar_locks), 1)
+        self.assertIn('"tests_avatar"."profile_id" IN', avatar_locks[0])
+        self.assertFalse(
+            models.Avatar.objects.filter(pk=removed['pk']).exists())
+        # The save continues from the locked row
+        self.assertEqual(saved_user.username, 'concurrent')
+        self.assertEqual(
+            models.User.objects.get(pk=user.pk).username, 'concurrent')
+
+    def save_user(self):
+        serializer = serializers.UserSerializer(data=self.get_initial_data())
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return serializer
+
+    def test_write_strategies(self):
+        strategies = self.save_user().write_strategies
+        self.assertEqual(
+            strategies['UserSerializer.profile'], WriteStrategy('batch'))
+        self.assertEqual(
+            strategies['ProfileSerializer.avatars'], WriteStrategy('bulk'))
+        # A single item is saved by its serializer
+        self.assertEqual(
+            strategies['ProfileSerializer.access_key'],
+            WriteStrategy('per_row', 'fewer than 2 items'))
+
+        def receiver(**kwargs):
+            pass
+
+        post_save.connect(receiver, sender=models.Avatar)
+        try:
+            strategies = self.save_user().write_strategies
+        finally:
+            post_save.disconnect(receiver, sender=models.Avatar)
+        self.assertEqual(
+            strategies['ProfileSerializer.avatars'],
+            WriteStrategy('per_row', 'save signal receivers'))
+        self.assertEqual(
+            strategies['ProfileSerializer.message_set'],
+            WriteStrategy('bulk'))
+
+        with mock.patch(
+                'drf_writable_nested.batch._get_model_bulk_save_blocker',
+                ) as get_blocker:
+            strategies = self.save_user().write_strategies
+        # The decision is cached
+        get_blocker.assert_not_called()
+        self.assertEqual(
+            strategies['ProfileSerializer.avatars'], WriteStrategy('bulk'))
+
+
+class RecordingRetryPolicy(RetryPolicy):
+    def __init__(self, *args, **kwargs):
+        super(RecordingRetryPolicy, self).__init__(*args, **kwargs)
+        self.delays = []
+
+    def sleep(self, seconds):
+        self.delays.append(seconds)
+
+
+class FlakyUserSerializer(serializers.UserSerializer):
+    failures = 0
+    validations = 0
+
+    class Meta(serializers.UserSerializer.Meta):
+        retry_policy = None
+
+    def to_internal_value(self, data):
+        self.validations += 1
+        return super(FlakyUserSerializer, self).to_internal_value(data)
+
+    def update_or_create_reverse_relations(self, instance, reverse_relations):
+        # Fails after the user is written
+        if self.failures:
+            self.failures -= 1
+            raise OperationalError('deadlock detected')
+        super(FlakyUserSerializer, self).update_or_create_reverse_relations(
+            instance, reverse_relations)
+
+
+class RetryPolicyTest(TransactionTestCase):
+    def get_serializer(self, failures, **policy_kwargs):
+        policy = RecordingRetryPolicy(**policy_kwargs)
+
+        class RetryingUserSerializer(FlakyUserSerializer):
+            class Meta(FlakyUserSerializer.Meta):
+                retry_policy = policy
+
+        serializer = RetryingUserSerializer(
+            data=WritableNestedModelSerializerTest.get_initial_data(self))
+        serializer.failures = failures
+        serializer.is_valid(raise_exception=True)
+        return serializer, policy
+
+    def test_retry(self):
+        serializer, policy = self.get_serializer(
+            2, max_attempts=3, backoff=0.1, max_backoff=0.15)
+        user = serializer.save()
+
+        # The data is validated again before every retry
+        self.assertEqual(serializer.validations, 3)
+        self.assertEqual(len(policy.delays), 2)
+        self.assertTrue(0 <= policy.delays[0] <= 0.1)
+        self.assertTrue(0 <= policy.delays[1] <= 0.15)
+        self.assertEqual(models.User.objects.get().pk, user.pk)
+        self.assertEqual(models.Profile.objects.count(), 1)
+        self.assertEqual(models.Avatar.objects.count(), 2)
+        self.assertEqual(models.Message.objects.count(), 3)
+        self.assertEqual(
+            serializer.data['profile']['access_key']['key'], 'key')
+
+    def test_retry_starts_from_the_database(self):
+        class ConcurrentRetryPolicy(RetryPolicy):
+            def sleep(self, seconds):
+                # The user is changed while the save waits to retry
+                models.User.objects.update(username='concurrent')
+
+        class RetryingUserSerializer(FlakyUserSerializer):
+            class Meta(FlakyUserSerializer.Meta):
+                retry_policy = ConcurrentRetryPolicy(max_attempts=2)
+
+        user = models.User.objects.create(username='test')
+        serializer = RetryingUserSerializer(instance=user, data={
+            'profile': {'sites': [], 'avatars': [], 'message_set': [],
+                        'access_key': None},
+        }, partial=True)
+        serializer.failures = 1
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        self.assertEqual(models.User.objects.get().username, 'concurrent')
+        self.assertEqual(models.Profile.objects.get().user, user)
+
+    def test_attempts_are_limited(self):
+        serializer, policy = self.get_serializer(3, max_attempts=3)
+        with self.assertRaises(OperationalError):
+            serializer.save()
+
+        self.assertEqual(len(policy.delays), 2)
+        self.assertEqual(models.User.objects.count(), 0)
+
+    def test_other_errors_are_not_retried(self):
+        serializer, policy = self.get_serializer(1, retry_on=(ValueError,))
+        with self.assertRaises(OperationalError):
+            serializer.save()
+        self.assertEqual(policy.delays, [])
+
+    def test_outer_transaction_is_not_retried(self):
+        serializer, policy = self.get_serializer(1)
+        with self.assertRaises(OperationalError), transaction.atomic():
+            serializer.save()
+        self.assertEqual(policy.delays, [])
+        self.assertEqual(models.User.objects.count(), 0)
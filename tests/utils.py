@@ -1,6 +1,7 @@
 import tempfile
 
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
 
 
 def get_sample_file(name, content=b'*'):
@@ -8,3 +9,16 @@ def get_sample_file(name, content=b'*'):
         tf.file.write(content)
         tf.file.seek(0)
         return SimpleUploadedFile(name, tf.file.read())
+
+
+class SharedDatabaseRouter(object):
+    """Routes the queries to the file-backed database"""
+    def db_for_read(self, model, **hints):
+        return 'shared'
+
+    def db_for_write(self, model, **hints):
+        return 'shared'
+
+
+shared_database = override_settings(
+    DATABASE_ROUTERS=['tests.utils.SharedDatabaseRouter'])